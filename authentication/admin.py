@@ -1,3 +1,72 @@
-from django.contrib import admin
+import csv
+import io
 
-# Register your models here.
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError
+from django.shortcuts import redirect, render
+from django.urls import path
+
+from authentication.bulk_import import UserImporter, iter_rows, detect_format, rows_per_second
+
+User = get_user_model()
+
+
+class UserImportForm(forms.Form):
+    file = forms.FileField(label="Arquivo (CSV, JSON Lines ou JSON)")
+    send_welcome = forms.BooleanField(required=False, label="Enviar e-mails de boas-vindas")
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserImportAdmin(UserAdmin):
+    """Admin de usuários com importação em massa (authentication.bulk_import)."""
+    change_list_template = 'admin/user_change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_users_view), name='auth_user_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_users_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = UserImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            importer = UserImporter(send_welcome=form.cleaned_data['send_welcome'])
+            try:
+                # Lido linha a linha direto do upload (memória ou arquivo temporário)
+                stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+                stats = importer.run(iter_rows(stream, detect_format(upload.name)))
+            except (ValueError, UnicodeDecodeError, csv.Error) as e:
+                messages.error(request, f"Falha na importação: {e}")
+            except IntegrityError as e:
+                # Conflito com um cadastro feito durante a importação; os blocos anteriores ficam gravados
+                form.add_error(
+                    None,
+                    f"Conflito ao gravar usuários ({e}). {importer.stats['created']} usuário(s) já "
+                    f"importados; envie o arquivo novamente para importar o restante."
+                )
+            else:
+                messages.success(
+                    request,
+                    f"{stats['created']} usuário(s) importados, {stats['skipped']} ignorados "
+                    f"em {stats['elapsed']:.1f}s ({rows_per_second(stats):.0f} linhas/s)."
+                )
+                return redirect('admin:auth_user_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'form': form,
+            'opts': self.model._meta,
+            'title': "Importar usuários",
+        }
+        return render(request, 'admin/import_users.html', context)
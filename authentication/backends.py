@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from authentication.lookup import get_user_by_email
+
+User = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    Autenticação por e-mail (authenticate(email=..., password=...)) usando a
+    busca indexada por LOWER(email). Chamadas com username seguem para o
+    ModelBackend (ex.: login do admin).
+    """
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = get_user_by_email(email)
+        if user is None:
+            # Roda o hasher mesmo assim para não revelar, pelo tempo de resposta, se o e-mail existe
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from core.tiered_cache import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Filtro de Bloom em memória: sem falsos negativos, falsos positivos na taxa configurada."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenBlacklistStore:
+    """
+    Blacklist de refresh tokens com um filtro de Bloom local na frente.
+
+    O caminho comum (token não revogado) é resolvido pelo Bloom, sem I/O.
+    Um "talvez" do Bloom é confirmado no cache (chave por jti com TTL até a
+    expiração do token) e, se a chave não estiver lá, na tabela
+    BlacklistedToken, que continua sendo a fonte da verdade. Revogações
+    feitas em outros processos incrementam uma versão no cache; o Bloom é
+    reconstruído a partir do banco quando ela muda, consultada no máximo a
+    cada AUTH_BLACKLIST_SYNC_INTERVAL segundos.
+
+    Essa versão só chega aos outros processos por um cache compartilhado.
+    Se AUTH_BLACKLIST_CACHE_ALIAS for local ao processo, o Bloom não é usado
+    e toda verificação consulta BlacklistedToken, como o simplejwt faz.
+    """
+
+    VERSION_KEY = 'jwt-blacklist:version'
+
+    def __init__(self, alias=None):
+        alias = alias or settings.AUTH_BLACKLIST_CACHE_ALIAS
+        self.cache = caches[alias]
+        self.shared = is_shared_cache(self.cache)
+        if not self.shared:
+            logger.info(
+                f"[JWT BLACKLIST] Cache '{alias}' é local ao processo; revogações são verificadas no banco."
+            )
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._version = None
+        self._synced_at = 0.0
+
+    @staticmethod
+    def _key(jti):
+        return f"jwt-blacklist:{jti}"
+
+    def _new_bloom(self):
+        return BloomFilter(settings.AUTH_BLACKLIST_BLOOM_CAPACITY, settings.AUTH_BLACKLIST_BLOOM_ERROR_RATE)
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._bloom is not None and now - self._synced_at < settings.AUTH_BLACKLIST_SYNC_INTERVAL:
+            return
+        with self._lock:
+            if self._bloom is not None and now - self._synced_at < settings.AUTH_BLACKLIST_SYNC_INTERVAL:
+                return
+            # Lida antes da reconstrução: revogações durante o rebuild forçam outro
+            version = self.cache.get(self.VERSION_KEY)
+            if self._bloom is None or version != self._version:
+                bloom = self._new_bloom()
+                jtis = BlacklistedToken.objects.filter(
+                    token__expires_at__gt=timezone.now()
+                ).values_list('token__jti', flat=True)
+                count = 0
+                for jti in jtis.iterator():
+                    bloom.add(jti)
+                    count += 1
+                self._bloom, self._version = bloom, version
+                logger.info(f"[JWT BLACKLIST] Filtro reconstruído com {count} token(s) revogado(s).")
+            self._synced_at = now
+
+    def add(self, jti, expires_at):
+        """Registra um token revogado (chamado ao gravar um BlacklistedToken)."""
+        ttl = int((expires_at - timezone.now()).total_seconds())
+        if ttl <= 0:
+            return
+        self.cache.set(self._key(jti), 1, timeout=ttl)
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+        self.cache.add(self.VERSION_KEY, 0, timeout=None)
+        try:
+            version = self.cache.incr(self.VERSION_KEY)
+        except ValueError:
+            version = 1
+            self.cache.set(self.VERSION_KEY, version, timeout=None)
+        with self._lock:
+            # Única revogação desde a última sincronização e já aplicada ao
+            # Bloom local: não há o que reconstruir
+            if self._bloom is not None and version == (self._version or 0) + 1:
+                self._version = version
+
+    def is_blacklisted(self, jti):
+        if not self.shared:
+            # Sem cache compartilhado, revogações de outros processos nunca chegariam ao Bloom local
+            return BlacklistedToken.objects.filter(token__jti=jti).exists()
+        self._sync()
+        if jti not in self._bloom:
+            return False
+        if self.cache.get(self._key(jti)) is not None:
+            return True
+        # Falso positivo do Bloom ou chave expulsa do cache: o banco decide
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+token_blacklist = TokenBlacklistStore()
@@ -0,0 +1,228 @@
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from authentication.hashing_pool import init_hashing_process, hash_passwords
+from authentication.lookup import EmailKey
+from authentication.roles import role_resolver, DEFAULT_ROLE
+from services.utils.emails.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+USER_FIELDS = ('email', 'first_name', 'last_name', 'password')
+
+
+def iter_rows(stream, fmt):
+    """
+    Lê usuários de um arquivo linha a linha.
+
+    `fmt` é 'csv' (com cabeçalho), 'jsonl' (um objeto por linha) ou 'json'
+    (lista de objetos, carregada de uma vez).
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'json':
+        yield from json.load(stream)
+    else:
+        raise ValueError(f"Formato inválido: {fmt}. Use csv, jsonl ou json.")
+
+
+def _text(value):
+    """Valor de um campo como texto: JSON pode trazer números, booleanos ou null."""
+    return '' if value is None else str(value).strip()
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    return {'ndjson': 'jsonl'}.get(extension, extension)
+
+
+class PasswordHasher:
+    """
+    Hash de senhas em paralelo num pool de processos (PBKDF2 é CPU-bound).
+
+    Cada lote é dividido entre os processos; hash_async() devolve os futures
+    para que o lote seguinte seja hasheado enquanto o anterior é gravado. Os
+    processos são criados com spawn: fork de um servidor web com threads
+    ativas (admin) pode herdar locks travados.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_hashing_process,
+            )
+        return self
+
+    def __exit__(self, *exc):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def hash_async(self, passwords):
+        if self._executor is None:
+            return [_Done(hash_passwords(passwords))]
+        size = max(1, -(-len(passwords) // self.workers))
+        return [
+            self._executor.submit(hash_passwords, passwords[start:start + size])
+            for start in range(0, len(passwords), size)
+        ]
+
+
+class _Done:
+    """Future já resolvido (execução sem pool)."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+class UserImporter:
+    """
+    Importação em massa de usuários.
+
+    Para cada bloco de `chunk_size` linhas: descarta e-mails repetidos ou já
+    cadastrados, como e-mail ou como username (uma consulta por bloco),
+    hasheia as senhas no pool de processos, grava os usuários com
+    bulk_create e associa o grupo padrão com um único bulk_create na tabela
+    de associação. Opcionalmente agenda e-mails de boas-vindas via
+    EmailService.send_many (envio em lote).
+
+    Cada bloco é gravado numa transação própria: se um bloco falhar (ex.:
+    IntegrityError por um cadastro concorrente), os anteriores continuam
+    gravados e `stats['created']` conta só esses.
+    """
+
+    def __init__(self, chunk_size=1000, workers=None, send_welcome=False, progress=None):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.send_welcome = send_welcome
+        self.progress = progress
+        self.stats = {'processed': 0, 'created': 0, 'skipped': 0, 'elapsed': 0.0}
+        self._seen = set()
+
+    def _prepare(self, rows):
+        """Normaliza o bloco e remove linhas inválidas, sem e-mail, repetidas ou já existentes."""
+        prepared = []
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            email = _text(row.get('email')).lower()
+            if not email or email in self._seen:
+                continue
+            self._seen.add(email)
+            prepared.append({field: _text(row.get(field)) for field in USER_FIELDS} | {'email': email})
+        emails = [row['email'] for row in prepared]
+        # O username dos importados é o e-mail: um username igual também impede a criação
+        existing = set()
+        for email_lower, username in (
+            User.objects.annotate(email_lower=EmailKey('email'))
+            .filter(Q(email_lower__in=emails) | Q(username__in=emails))
+            .values_list('email_lower', 'username')
+        ):
+            existing.update((email_lower, username))
+        return [row for row in prepared if row['email'] not in existing]
+
+    def _insert(self, rows, hashed_passwords):
+        users = [
+            User(
+                username=row['email'],
+                email=row['email'],
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                password=hashed,
+            )
+            for row, hashed in zip(rows, hashed_passwords)
+        ]
+        with transaction.atomic():
+            created = User.objects.bulk_create(users)
+            if any(user.pk is None for user in created):
+                # Bancos sem RETURNING (ex.: MySQL) não preenchem o pk no bulk_create
+                ids = dict(
+                    User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'pk')
+                )
+                for user in created:
+                    user.pk = ids[user.username]
+
+            group_id = role_resolver.default_group_id()
+            User.groups.through.objects.bulk_create(
+                [User.groups.through(user_id=user.pk, group_id=group_id) for user in created]
+            )
+
+            if self.send_welcome and created:
+                EmailService(
+                    subject="Bem-vindo(a)!",
+                    template_name="emails/boas_vindas.html",
+                    context={"painel_url": getattr(settings, 'SITE_URL', "http://127.0.0.1")},
+                ).send_many(
+                    [user.email for user in created],
+                    per_recipient_context={
+                        user.email: {"user_name": user.first_name or user.email} for user in created
+                    },
+                )
+
+        for user in created:
+            role_resolver.prime(user.pk, DEFAULT_ROLE)
+        return len(created)
+
+    def _report(self, start):
+        self.stats['elapsed'] = time.monotonic() - start
+        if self.progress:
+            self.progress(self.stats)
+
+    def run(self, rows):
+        """Importa as linhas (qualquer iterável de dicts); retorna as estatísticas."""
+        start = time.monotonic()
+        rows = iter(rows)
+        pending = None  # (linhas, futures do hash) do bloco anterior
+        with PasswordHasher(self.workers) as hasher:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                current = None
+                if chunk:
+                    prepared = self._prepare(chunk)
+                    self.stats['processed'] += len(chunk)
+                    self.stats['skipped'] += len(chunk) - len(prepared)
+                    current = (prepared, hasher.hash_async([row['password'] for row in prepared]))
+                # O hash do bloco atual roda no pool enquanto o anterior é gravado
+                if pending is not None:
+                    prepared, futures = pending
+                    hashed = [value for future in futures for value in future.result()]
+                    self.stats['created'] += self._insert(prepared, hashed)
+                    self._report(start)
+                if current is None:
+                    break
+                pending = current
+        self.stats['elapsed'] = time.monotonic() - start
+        logger.info(
+            f"[USER IMPORT] {self.stats['created']} usuário(s) criados, {self.stats['skipped']} ignorados "
+            f"em {self.stats['elapsed']:.1f}s."
+        )
+        return self.stats
+
+
+def rows_per_second(stats):
+    return stats['processed'] / stats['elapsed'] if stats['elapsed'] else 0.0
@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import OtpCode, ResetPasswordToken
+
+
+def _consume(queryset):
+    """
+    Trava a linha ainda válida (junto com o usuário, no mesmo SELECT) e a apaga.
+
+    Executa exatamente duas queries: SELECT ... FOR UPDATE e DELETE. Com
+    savepoint=False reaproveita a transação do chamador, se houver; chamadas
+    concorrentes esperam o lock e, após o commit da primeira, não encontram
+    mais a linha. Retorna o usuário dono ou None.
+    """
+    with transaction.atomic(savepoint=False):
+        row = (
+            queryset.select_related('user')
+            .select_for_update(of=('self',))
+            .filter(expires_at__gt=timezone.now())
+            .first()
+        )
+        if row is None:
+            return None
+        queryset.model.objects.filter(pk=row.pk).delete()
+        return row.user
+
+
+def consume_otp(code):
+    """Valida e consome um código OTP; retorna o usuário ou None se inválido/expirado."""
+    return _consume(OtpCode.objects.filter(code=code, is_used=False))
+
+
+def consume_reset_token(token):
+    """Valida e consome um token de redefinição; retorna o usuário ou None se inválido/expirado."""
+    return _consume(ResetPasswordToken.objects.filter(token=token))
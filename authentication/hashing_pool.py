@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class HashingPoolSaturated(Exception):
+    """Todas as vagas do pool (execução + fila) estão ocupadas."""
+
+
+class HashingPool:
+    """
+    Pool limitado de threads para o trabalho caro de autenticação (PBKDF2).
+
+    Views assíncronas enviam o trabalho para cá em vez de bloquear o event
+    loop ou a thread única que o ASGI usa para código síncrono. No máximo
+    AUTH_HASHING_CONCURRENCY tarefas rodam ao mesmo tempo e até
+    AUTH_HASHING_QUEUE_DEPTH aguardam; além disso run() recusa com
+    HashingPoolSaturated, e a view responde 503. O hashlib libera o GIL
+    durante o PBKDF2, por isso threads bastam.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None):
+        self.max_workers = max_workers or settings.AUTH_HASHING_CONCURRENCY or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else settings.AUTH_HASHING_QUEUE_DEPTH
+        self._lock = threading.Lock()
+        self._executor = None
+        self.inflight = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='auth-hash')
+        return self._executor
+
+    @staticmethod
+    def _call(func, *args, **kwargs):
+        # Threads do pool não passam pelos sinais de request: fecham as conexões como uma request faria
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    async def run(self, func, *args, **kwargs):
+        """Executa func no pool; levanta HashingPoolSaturated se a fila estiver cheia."""
+        with self._lock:
+            if self.inflight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                logger.warning(f"[AUTH POOL] Pool saturado ({self.inflight} em andamento); requisição recusada.")
+                raise HashingPoolSaturated()
+            self.inflight += 1
+        try:
+            # copy_context: a thread herda o estado da request (ex.: fixação no primário)
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(),
+                functools.partial(contextvars.copy_context().run, self._call, func, *args, **kwargs)
+            )
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def stats(self):
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'inflight': self.inflight,
+            'rejected': self.rejected,
+        }
+
+
+hashing_pool = HashingPool()
+
+
+def init_hashing_process():
+    """Inicializador de processos filhos (spawn) que só fazem hashing de senhas."""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+
+def hash_passwords(passwords):
+    """Hash de uma lista de senhas; vazias geram senha inutilizável. Executado nos processos filhos."""
+    from django.contrib.auth.hashers import make_password
+
+    return [make_password(password or None) for password in passwords]
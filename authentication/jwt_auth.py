@@ -0,0 +1,46 @@
+import copy
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from authentication.local_cache import LocalTTLCache
+
+# Snapshots de usuários autenticados por id; invalidados em authentication.signals
+user_cache = LocalTTLCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que evita o SELECT em auth_user a cada requisição.
+
+    O usuário carregado do banco fica num LRU local com TTL curto
+    (AUTH_USER_CACHE_TTL) e é descartado ao salvar ou remover o usuário,
+    o que cobre troca de senha e desativação. Cada requisição recebe uma
+    cópia rasa do snapshot, e as verificações de usuário ativo e de token
+    revogado por troca de senha são refeitas sobre ele.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        # A claim pode vir como texto; a chave é sempre str(pk), como na invalidação
+        key = str(user_id)
+        user = user_cache.get(key) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        else:
+            self._check_user(user, validated_token)
+        return copy.copy(user)
+
+    @staticmethod
+    def _check_user(user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db.models import CharField, Func
+
+User = get_user_model()
+
+
+class EmailKey(Func):
+    """
+    NULLIF(LOWER(email), '') com o literal escrito no SQL (não como parâmetro),
+    para coincidir com a expressão do índice e o planner usá-lo.
+    """
+    template = "NULLIF(LOWER(%(expressions)s), '')"
+    output_field = CharField()
+
+
+def normalize_email(email):
+    """E-mail na forma canônica usada nas buscas: sem espaços e em minúsculas."""
+    return (email or '').strip().lower()
+
+
+def users_by_email(*emails):
+    """
+    Usuários cujo e-mail, em minúsculas, está entre os informados.
+
+    A condição é NULLIF(LOWER(email), '') = ..., a mesma expressão do índice
+    único auth_user_email_lower_uniq (migração 0004), portanto a busca usa o
+    índice em vez de varrer auth_user.
+    """
+    normalized = [normalize_email(email) for email in emails]
+    queryset = User.objects.annotate(email_lower=EmailKey('email'))
+    if len(normalized) == 1:
+        return queryset.filter(email_lower=normalized[0])
+    return queryset.filter(email_lower__in=normalized)
+
+
+def get_user_by_email(email):
+    """Retorna o usuário com o e-mail informado ou None."""
+    return users_by_email(email).first()
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.lookup import users_by_email
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a latência da busca de usuário por e-mail (email=... sem índice vs. "
+        "authentication.lookup com índice em LOWER(email)) numa tabela semeada. "
+        "Tudo roda numa transação desfeita ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help="Usuários semeados.")
+        parser.add_argument('--lookups', type=int, default=200, help="Buscas por cenário.")
+        parser.add_argument('--batch-size', type=int, default=10_000, help="Usuários por bulk_create.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._seed(options['users'], options['batch_size'])
+                emails = [
+                    f"Bench.User{random.randrange(options['users'])}@Example.com"
+                    for _ in range(options['lookups'])
+                ]
+                self._measure("email= (sem índice)", lambda email: User.objects.filter(email=email.lower()).exists(),
+                              emails)
+                self._measure("LOWER(email) indexado", lambda email: users_by_email(email).exists(), emails)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _seed(self, total, batch_size):
+        start = time.perf_counter()
+        # Hash fixo: o custo medido é só o da busca
+        password = '!benchmark'
+        for offset in range(0, total, batch_size):
+            User.objects.bulk_create([
+                User(username=f"bench-{i}", email=f"bench.user{i}@example.com", password=password)
+                for i in range(offset, min(offset + batch_size, total))
+            ])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{total} usuários semeados em {elapsed:.1f}s ({total / elapsed:.0f} linhas/s)")
+
+    def _measure(self, label, lookup, emails):
+        samples = []
+        for email in emails:
+            start = time.perf_counter()
+            assert lookup(email)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        p50 = samples[len(samples) // 2]
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        self.stdout.write(f"{label:>22}: p50={p50:.3f}ms p99={p99:.3f}ms ({len(samples)} buscas)")
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PASSWORD = 'Bench@12345'
+
+
+def _run_worker(db_path, tuned, worker_id, requests):
+    """
+    Processo de carga: configura o Django contra a cópia do banco e alterna
+    cadastro e login pelos endpoints de autenticação.
+    """
+    os.environ.update({
+        'DJANGO_SETTINGS_MODULE': 'core.settings',
+        'DB_ENGINE': 'sqlite3',
+        'DB_NAME': db_path,
+        'DB_SQLITE_TUNED': '1' if tuned else '0',
+        # Mede a disputa pelo banco, não o throttling dos endpoints
+        'THROTTLE_LOGIN_IP': '1000000/min',
+        'THROTTLE_LOGIN_EMAIL': '1000000/min',
+    })
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import OperationalError
+    from django.test import Client
+
+    # Hash rápido: o custo medido é o do banco, não o do PBKDF2
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+    result = {'ok': 0, 'locked': 0, 'errors': 0, 'latencies': [], 'start': time.time()}
+
+    def call(path, payload):
+        start = time.perf_counter()
+        try:
+            response = client.post(path, payload, content_type='application/json')
+        except OperationalError as e:
+            result['locked' if 'locked' in str(e) else 'errors'] += 1
+            return
+        result['latencies'].append((time.perf_counter() - start) * 1000)
+        result['ok' if response.status_code < 400 else 'errors'] += 1
+
+    for i in range(requests):
+        email = f"contention.{worker_id}.{i}@example.com"
+        call('/api/auth/register/', {
+            'first_name': 'Bench', 'last_name': 'User', 'email': email,
+            'password': PASSWORD, 'password2': PASSWORD,
+        })
+        call('/api/auth/login/', {'email': email, 'password': PASSWORD})
+    result['end'] = time.time()
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispara vários processos contra os endpoints de cadastro e login sobre "
+        "cópias do banco SQLite atual, com e sem o modo concorrente "
+        "(DB_SQLITE_TUNED), e compara vazão, latência e erros de 'database is locked'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help="Processos escritores simultâneos.")
+        parser.add_argument('--requests', type=int, default=50, help="Pares cadastro+login por processo.")
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError("O banco padrão não é SQLite.")
+        source.close()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, tuned in (("padrão", False), ("concorrente", True)):
+                db_path = os.path.join(tmp, f"{label}.sqlite3")
+                # Cópia consistente do banco já migrado, via API de backup
+                with sqlite3.connect(source.settings_dict['NAME']) as src, sqlite3.connect(db_path) as dst:
+                    src.backup(dst)
+                    # O modo WAL fica gravado no arquivo: o cenário padrão volta ao journal clássico
+                    dst.execute(f"PRAGMA journal_mode={'WAL' if tuned else 'DELETE'}")
+                self._run(label, db_path, tuned, options['processes'], options['requests'])
+
+    def _run(self, label, db_path, tuned, processes, requests):
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(
+                _run_worker, [db_path] * processes, [tuned] * processes, range(processes), [requests] * processes
+            ))
+
+        elapsed = max(r['end'] for r in results) - min(r['start'] for r in results)
+        latencies = sorted(ms for r in results for ms in r['latencies'])
+        ok = sum(r['ok'] for r in results)
+        locked = sum(r['locked'] for r in results)
+        errors = sum(r['errors'] for r in results)
+        p50 = statistics.median(latencies) if latencies else 0.0
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] if latencies else 0.0
+        self.stdout.write(
+            f"{label:>12}: {ok} ok, {locked} 'database is locked', {errors} outros erros em {elapsed:.1f}s "
+            f"→ {ok / elapsed:.1f} req/s, p50={p50:.1f}ms p95={p95:.1f}ms"
+        )
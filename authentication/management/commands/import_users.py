@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from authentication.bulk_import import UserImporter, iter_rows, detect_format, rows_per_second
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa usuários em massa de um arquivo CSV, JSON Lines ou JSON (colunas: email, "
+        "first_name, last_name, password), com hash de senhas em paralelo e gravação em lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo a importar.")
+        parser.add_argument('--format', choices=['csv', 'jsonl', 'json'], default=None,
+                            help="Formato do arquivo (padrão: pela extensão).")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Usuários gravados por lote.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Processos de hashing (padrão: número de CPUs).")
+        parser.add_argument('--send-welcome', action='store_true', help="Agenda e-mails de boas-vindas em lote.")
+
+    def _progress(self, stats):
+        self.stdout.write(
+            f"{stats['processed']} linha(s) processadas, {stats['created']} criadas, "
+            f"{stats['skipped']} ignoradas — {rows_per_second(stats):.0f} linhas/s"
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        importer = UserImporter(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            send_welcome=options['send_welcome'],
+            progress=self._progress,
+        )
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                stats = importer.run(iter_rows(stream, fmt))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        except IntegrityError as e:
+            raise CommandError(
+                f"Conflito ao gravar usuários ({e}); {importer.stats['created']} já importados. "
+                f"Rode novamente para importar o restante."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação concluída: {stats['created']} usuário(s) criados, {stats['skipped']} ignorados "
+            f"em {stats['elapsed']:.1f}s ({rows_per_second(stats):.0f} linhas/s)."
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from authentication.tasks import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Remove OTPs, tokens de redefinição de senha e refresh tokens expirados, em blocos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help="Linhas apagadas por bloco.")
+
+    def handle(self, *args, **options):
+        result = purge_expired_tokens(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            f"{result['otp_codes']} OTP(s), {result['reset_tokens']} token(s) de redefinição, "
+            f"{result['outstanding_tokens']} refresh token(s) e {result['blacklisted_tokens']} revogação(ões) removidos."
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otpcode',
+            index=models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otpcode',
+            index=models.Index(fields=['user', 'created_at'], name='otp_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resetpasswordtoken',
+            index=models.Index(fields=['expires_at'], name='reset_token_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resetpasswordtoken',
+            index=models.Index(fields=['user', 'created_at'], name='reset_token_user_created_idx'),
+        ),
+    ]
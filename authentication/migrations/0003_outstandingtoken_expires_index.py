@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+INDEX = models.Index(fields=['expires_at'], name='outstanding_expires_idx')
+
+
+def add_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('token_blacklist', 'OutstandingToken'), INDEX)
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('token_blacklist', 'OutstandingToken'), INDEX)
+
+
+class Migration(migrations.Migration):
+    """
+    Índice em token_blacklist_outstandingtoken.expires_at para a limpeza em
+    blocos de refresh tokens expirados (o modelo pertence ao simplejwt).
+    """
+
+    dependencies = [
+        ('authentication', '0002_token_indexes'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
@@ -0,0 +1,71 @@
+import logging
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'auth_user_email_lower_uniq'
+# E-mails vazios viram NULL e ficam fora da unicidade (vários usuários sem e-mail).
+# Deve ser a mesma expressão gerada por authentication.lookup.users_by_email.
+INDEX_EXPRESSION = "(NULLIF(LOWER(email), ''))"
+
+
+def check_duplicates(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.exclude(email='')
+        .annotate(email_lower=Lower('email'))
+        .values('email_lower')
+        .order_by()
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Existem e-mails duplicados (ignorando maiúsculas) em auth_user; resolva-os antes de "
+            f"criar o índice único: {duplicates}"
+        )
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('postgresql', 'sqlite', 'mysql'):
+        logger.warning(f"[DATABASE] Índice em LOWER(email) não suportado para '{vendor}'; busca por e-mail sem índice.")
+        return
+    # CONCURRENTLY (PostgreSQL) evita travar auth_user durante a criação em tabelas grandes
+    concurrently = 'CONCURRENTLY ' if vendor == 'postgresql' else ''
+    schema_editor.execute(f"CREATE UNIQUE INDEX {concurrently}{INDEX_NAME} ON auth_user ({INDEX_EXPRESSION})")
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+    elif vendor == 'sqlite':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+    elif vendor == 'mysql':
+        schema_editor.execute(f"DROP INDEX {INDEX_NAME} ON auth_user")
+
+
+class Migration(migrations.Migration):
+    """
+    Índice único funcional em LOWER(email) de auth_user (e-mails vazios
+    ignorados), usado por authentication.lookup. O modelo User é do
+    django.contrib.auth, por isso o índice é criado por SQL conforme o banco.
+    """
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0003_outstandingtoken_expires_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -18,6 +19,10 @@ class OtpCode(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+            models.Index(fields=['user', 'created_at'], name='otp_user_created_idx'),
+        ]
 
     @staticmethod
     def generate_otp(length=6):
@@ -28,7 +33,7 @@ class OtpCode(models.Model):
     def save(self, *args, **kwargs):
         """Define a expiração do OTP ao salvar."""
         if not self.pk:  # Apenas para novos OTPs
-            self.expires_at = timezone.now() + timezone.timedelta(minutes=10)  # Expira em 10 minutos
+            self.expires_at = timezone.now() + timezone.timedelta(seconds=settings.OTP_TTL)  # Expira em OTP_TTL (10 minutos)
             self.code = self.generate_otp()
         super().save(*args, **kwargs)
 
@@ -46,6 +51,10 @@ class ResetPasswordToken(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['expires_at'], name='reset_token_expires_idx'),
+            models.Index(fields=['user', 'created_at'], name='reset_token_user_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         """Define a expiração do token ao salvar."""
@@ -0,0 +1,119 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from authentication.consumption import consume_otp
+from authentication.models import OtpCode
+from core.tiered_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Tentativas de gerar um código livre antes de desistir
+MAX_ISSUE_ATTEMPTS = 5
+
+
+class OtpStoreError(Exception):
+    """Não foi possível emitir um código OTP."""
+
+
+class DatabaseOtpStore:
+    """
+    Códigos OTP gravados na tabela OtpCode (backend padrão).
+
+    Colisões com a restrição unique de `code` são tratadas gerando um novo
+    código, dentro de um savepoint para não invalidar a transação do chamador.
+    """
+
+    def issue(self, user):
+        """Retorna (código, criado): reutiliza o OTP ainda válido do usuário, se houver."""
+        otp = OtpCode.objects.filter(user=user, is_used=False, expires_at__gt=timezone.now()).first()
+        if otp is not None:
+            return otp.code, False
+
+        for _ in range(MAX_ISSUE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return OtpCode.objects.create(user=user).code, True
+            except IntegrityError:
+                logger.warning("[OTP] Colisão de código OTP; gerando outro.")
+        raise OtpStoreError("Não foi possível gerar um código OTP único.")
+
+    def consume(self, code):
+        """Valida e consome o código; retorna o usuário dono ou None se inválido/expirado."""
+        return consume_otp(code)
+
+
+class CacheOtpStore:
+    """
+    Códigos OTP guardados no cache, sem gravações no banco.
+
+    A chave é um HMAC do código (o código em si não aparece na chave) e a
+    expiração fica a cargo do TTL do cache. A reserva do código é feita com
+    cache.add, portanto duas emissões nunca recebem o mesmo código, e o
+    consumo é decidido pelo cache.delete: apenas uma chamada concorrente
+    consegue apagar a chave.
+
+    Com um TieredCache, o store fala direto com o L2: o L1 deste processo
+    poderia devolver um código já consumido em outro processo.
+    """
+
+    def __init__(self, alias=None, ttl=None):
+        cache = caches[alias or settings.OTP_CACHE_ALIAS]
+        self.cache = cache.shared if isinstance(cache, TieredCache) else cache
+        self.ttl = ttl or settings.OTP_TTL
+
+    @staticmethod
+    def _code_key(code):
+        return f"otp:code:{salted_hmac('otp-store', code).hexdigest()}"
+
+    @staticmethod
+    def _user_key(user_id):
+        return f"otp:user:{user_id}"
+
+    def issue(self, user):
+        """Retorna (código, criado): reutiliza o OTP ainda válido do usuário, se houver."""
+        code = self.cache.get(self._user_key(user.pk))
+        if code is not None and self.cache.get(self._code_key(code)) == user.pk:
+            return code, False
+
+        for _ in range(MAX_ISSUE_ATTEMPTS):
+            code = OtpCode.generate_otp()
+            if self.cache.add(self._code_key(code), user.pk, timeout=self.ttl):
+                self.cache.set(self._user_key(user.pk), code, timeout=self.ttl)
+                return code, True
+            logger.warning("[OTP] Colisão de código OTP no cache; gerando outro.")
+        raise OtpStoreError("Não foi possível gerar um código OTP único.")
+
+    def consume(self, code):
+        """Valida e consome o código; retorna o usuário dono ou None se inválido/expirado."""
+        key = self._code_key(code)
+        user_id = self.cache.get(key)
+        if user_id is None or not self.cache.delete(key):
+            return None
+        self.cache.delete(self._user_key(user_id))
+        return User.objects.filter(pk=user_id).first()
+
+
+OTP_STORES = {
+    'db': DatabaseOtpStore,
+    'cache': CacheOtpStore,
+}
+
+_stores = {}
+
+
+def get_otp_store():
+    """Retorna a instância do backend configurado em OTP_STORE_BACKEND."""
+    backend = settings.OTP_STORE_BACKEND
+    if backend not in OTP_STORES:
+        raise ValueError(f"OTP_STORE_BACKEND inválido: {backend}. Use um de {list(OTP_STORES)}.")
+    if backend not in _stores:
+        _stores[backend] = OTP_STORES[backend]()
+    return _stores[backend]
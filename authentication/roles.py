@@ -0,0 +1,64 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+
+from authentication.local_cache import LocalTTLCache
+
+# Grupo atribuído a todo usuário no registro e papel usado quando não há grupo
+DEFAULT_ROLE = 'user'
+
+
+class RoleResolver:
+    """
+    Resolve o papel (nome do primeiro grupo) de um usuário com cache local.
+
+    O cache é invalidado pelos sinais de authentication.signals quando a
+    associação usuário-grupo ou os grupos mudam neste processo; nos demais
+    processos vale AUTH_ROLE_CACHE_TTL. O id do grupo padrão é carregado uma
+    única vez por processo.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._cache = LocalTTLCache(
+            maxsize if maxsize is not None else settings.AUTH_ROLE_CACHE_SIZE,
+            ttl if ttl is not None else settings.AUTH_ROLE_CACHE_TTL
+        )
+        self._lock = threading.Lock()
+        self._default_group_id = None
+
+    def default_group_id(self):
+        """Id do grupo padrão, criado se não existir."""
+        if self._default_group_id is None:
+            with self._lock:
+                if self._default_group_id is None:
+                    self._default_group_id = Group.objects.get_or_create(name=DEFAULT_ROLE)[0].pk
+        return self._default_group_id
+
+    def role_for(self, user):
+        role = self._cache.get(user.pk)
+        if role is None:
+            role = user.groups.order_by('pk').values_list('name', flat=True).first() or DEFAULT_ROLE
+            self._cache.set(user.pk, role)
+        return role
+
+    def prime(self, user_id, role):
+        """Registra o papel já conhecido (ex.: recém-atribuído no registro)."""
+        self._cache.set(user_id, role)
+
+    def invalidate(self, user_ids=None):
+        """Descarta o papel dos usuários informados ou, sem argumentos, de todos."""
+        if user_ids is None:
+            self._cache.clear()
+            return
+        for user_id in user_ids:
+            self._cache.delete(user_id)
+
+    def invalidate_groups(self):
+        """Grupos renomeados ou removidos: descarta todos os papéis e o id do grupo padrão."""
+        self._cache.clear()
+        self._default_group_id = None
+
+
+role_resolver = RoleResolver()
+
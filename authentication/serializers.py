@@ -1,9 +1,15 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenRefreshSerializer
 from django.contrib.auth import get_user_model, authenticate
-from django.contrib.auth.models import Group
 from django.conf import settings
-from authentication.models import OtpCode, ResetPasswordToken
+from django.db import IntegrityError, transaction
+from authentication.consumption import consume_reset_token
+from authentication.lookup import users_by_email, get_user_by_email, normalize_email
+from authentication.models import ResetPasswordToken
+from authentication.otp_store import get_otp_store
+from authentication.roles import role_resolver, DEFAULT_ROLE
+from authentication.tokens import RoleRefreshToken
 from services.utils.emails.email_service import EmailService
 import re
 
@@ -24,9 +30,9 @@ class UserRegisterSerializer(serializers.ModelSerializer):
 
     def validate_email(self, value):
         """Valida se o e-mail já está em uso."""
-        if User.objects.filter(email=value.lower()).exists():
+        if users_by_email(value).exists():
             raise serializers.ValidationError("Este e-mail já está em uso.")
-        return value.lower()
+        return normalize_email(value)
 
     def validate_password(self, value):
         """Valida a força da senha."""
@@ -47,27 +53,32 @@ class UserRegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """Cria um novo usuário e retorna tokens JWT."""
         validated_data.pop('password2')
-        user = User.objects.create_user(
-            username=validated_data['email'],
-            email=validated_data['email'],
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            password=validated_data['password']
-        )
-
-        # Adiciona o grupo padrão "user"
-        default_group, _ = Group.objects.get_or_create(name='user')
-        user.groups.add(default_group)
-
-        refresh = RefreshToken.for_user(user)
-        groups = user.groups.values_list('name', flat=True)
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=validated_data['email'],
+                    email=validated_data['email'],
+                    first_name=validated_data['first_name'],
+                    last_name=validated_data['last_name'],
+                    password=validated_data['password']
+                )
+        except IntegrityError:
+            # Registro concorrente com o mesmo e-mail (índice único em LOWER(email))
+            raise serializers.ValidationError({"email": ["Este e-mail já está em uso."]})
+
+        # Adiciona o grupo padrão "user": usuário novo não tem grupos, então um
+        # único INSERT na tabela de associação basta (sem o SELECT do groups.add)
+        User.groups.through.objects.create(user_id=user.pk, group_id=role_resolver.default_group_id())
+        role_resolver.prime(user.pk, DEFAULT_ROLE)
+
+        refresh = RoleRefreshToken.for_user(user)
 
         return {
             "id": user.id,
             "first_name": user.first_name,
             "last_name": user.last_name,
             "email": user.email,
-            "role": groups[0] if groups else "user",
+            "role": refresh['role'],
             "access": str(refresh.access_token),
             "refresh": str(refresh),
         }
@@ -80,15 +91,12 @@ class UserLoginSerializer(serializers.Serializer):
 
     def validate(self, data):
         """Valida as credenciais do usuário."""
-        email = data.get("email").lower()
-        password = data.get("password")
-        user = authenticate(username=email, password=password)
+        user = authenticate(email=data.get("email"), password=data.get("password"))
 
         if not user:
             raise serializers.ValidationError("Credenciais inválidas.")
 
-        refresh = RefreshToken.for_user(user)
-        groups = user.groups.values_list('name', flat=True)
+        refresh = RoleRefreshToken.for_user(user)
 
         return {
             "access": str(refresh.access_token),
@@ -98,7 +106,7 @@ class UserLoginSerializer(serializers.Serializer):
                 "first_name": user.first_name,
                 "last_name": user.last_name,
                 "email": user.email,
-                "role": groups[0] if groups else "user"
+                "role": refresh['role']
             },
         }
 
@@ -109,21 +117,24 @@ class UserRecoverySerializer(serializers.Serializer):
 
     def validate_email(self, value):
         """Valida se o e-mail existe e envia o código OTP."""
-        try:
-            user = User.objects.get(email=value.lower())
-        except User.DoesNotExist:
+        user = get_user_by_email(value)
+        if user is None:
             raise serializers.ValidationError("E-mail não encontrado.")
 
-        otp_code = OtpCode.objects.create(user=user)
-        email_service = EmailService(
-            subject="Código de Recuperação de Senha",
-            to_email=[value.lower()],
-            template_name="emails/recovery_email.html",
-            context={"otp_code": otp_code.code, "user": user}
-        )
-        email_service.send()
+        # OTP e e-mail (no modo outbox) são gravados na mesma transação
+        with transaction.atomic():
+            # Pedidos repetidos reutilizam o OTP ainda válido em vez de gerar outro
+            code, _ = get_otp_store().issue(user)
+            email_service = EmailService(
+                subject="Código de Recuperação de Senha",
+                to_email=[user.email],
+                template_name="emails/recovery_email.html",
+                context={"otp_code": code, "user": user}
+            )
+            # Reenvios do mesmo OTP dentro da janela de idempotência são descartados
+            email_service.send(idempotency_key=f"otp:{user.pk}:{code}")
 
-        return value.lower()
+        return normalize_email(value)
 
 
 class OtpVerifySerializer(serializers.Serializer):
@@ -132,19 +143,13 @@ class OtpVerifySerializer(serializers.Serializer):
 
     def validate(self, data):
         """Valida o código OTP e gera um link temporário para redefinição de senha."""
-        try:
-            otp = OtpCode.objects.filter(code=data['code'], is_used=False).latest('created_at')
-        except OtpCode.DoesNotExist:
-            raise serializers.ValidationError({"code": "Código inválido ou expirado."})
-
-        if not otp.is_valid():
-            otp.delete()
-            raise serializers.ValidationError({"code": "Código expirado."})
+        # Consumo do OTP e criação do token de redefinição na mesma transação
+        with transaction.atomic():
+            user = get_otp_store().consume(data['code'])
+            if user is None:
+                raise serializers.ValidationError({"code": "Código inválido ou expirado."})
 
-        user = otp.user
-        otp.delete()  # Apaga o OTP após validação
-
-        reset_token = ResetPasswordToken.objects.create(user=user)
+            reset_token = ResetPasswordToken.objects.create(user=user)
         domain = getattr(settings, 'SITE_URL', "http://127.0.0.1")
         reset_url = f"{domain}/auth/reset-password/?token={reset_token.token}"
 
@@ -168,35 +173,39 @@ class ResetPasswordSerializer(serializers.Serializer):
         return value
 
     def validate(self, data):
-        """Valida o token e se as senhas coincidem."""
+        """Valida se as senhas coincidem; o token é validado e consumido em save()."""
         if data['password'] != data['password2']:
             raise serializers.ValidationError({"password": "As senhas não coincidem."})
-
-        try:
-            reset_token = ResetPasswordToken.objects.get(token=data['token'])
-        except ResetPasswordToken.DoesNotExist:
-            raise serializers.ValidationError("Token inválido ou expirado.")
-
-        if not reset_token.is_valid():
-            raise serializers.ValidationError("Token expirado.")
-
         return data
 
     def save(self):
         """Redefine a senha do usuário e envia uma confirmação por e-mail."""
-        reset_token = ResetPasswordToken.objects.get(token=self.validated_data['token'])
-        user = reset_token.user
-        user.set_password(self.validated_data['password'])
-        user.save()
-
-        reset_token.delete()
-
-        email_service = EmailService(
-            subject="Sua senha foi alterada",
-            to_email=[user.email],
-            template_name="emails/password_changed.html",
-            context={"user": user}
-        )
-        email_service.send()
-
-        return {"message": "Senha redefinida com sucesso!"}
\ No newline at end of file
+        with transaction.atomic():
+            # Valida e consome o token (com o usuário) num único SELECT ... FOR UPDATE
+            user = consume_reset_token(self.validated_data['token'])
+            if user is None:
+                raise serializers.ValidationError(
+                    {api_settings.NON_FIELD_ERRORS_KEY: ["Token inválido ou expirado."]}
+                )
+            user.set_password(self.validated_data['password'])
+            user.save(update_fields=['password'])
+
+            email_service = EmailService(
+                subject="Sua senha foi alterada",
+                to_email=[user.email],
+                template_name="emails/password_changed.html",
+                context={"user": user}
+            )
+            email_service.send()
+
+        return {"message": "Senha redefinida com sucesso!"}
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """Renova o access token; tokens revogados são recusados pelo token_blacklist (Bloom + cache)."""
+    token_class = RoleRefreshToken
+
+
+class LogoutSerializer(TokenBlacklistSerializer):
+    """Revoga o refresh token informado (logout)."""
+    token_class = RoleRefreshToken
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from authentication.blacklist import token_blacklist
+from authentication.jwt_auth import user_cache
+from authentication.roles import role_resolver
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Descarta o papel em cache dos usuários cuja associação a grupos mudou."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        role_resolver.invalidate([instance.pk])
+    elif pk_set is not None:
+        role_resolver.invalidate(pk_set)
+    else:
+        # group.user_set.clear(): os usuários afetados não são informados
+        role_resolver.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_roles_on_group_change(sender, **kwargs):
+    """Grupos renomeados ou removidos mudam o papel de todos os seus membros."""
+    role_resolver.invalidate_groups()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Senha trocada, desativação ou qualquer alteração: descarta o snapshot do usuário."""
+    user_cache.delete(str(instance.pk))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_token_blacklist(sender, instance, created, **kwargs):
+    """Toda revogação (admin, RefreshToken.blacklist()) alimenta o token_blacklist."""
+    if created:
+        token_blacklist.add(instance.token.jti, instance.token.expires_at)
@@ -0,0 +1,64 @@
+import logging
+from collections import Counter
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from authentication.models import OtpCode, ResetPasswordToken
+
+logger = logging.getLogger(__name__)
+
+
+def purge_expired(model, chunk_size=None, now=None):
+    """
+    Apaga as linhas expiradas de `model` em blocos de até `chunk_size` ids.
+
+    Cada bloco é um DELETE curto por chave primária (em autocommit), guiado
+    pelo índice de expires_at, para nunca manter locks longos na tabela.
+    Retorna as linhas apagadas por modelo (incluindo as removidas em cascata).
+    """
+    chunk_size = chunk_size or settings.AUTH_TOKEN_PURGE_CHUNK_SIZE
+    now = now or timezone.now()
+    totals = Counter()
+    while True:
+        ids = list(model.objects.filter(expires_at__lte=now).order_by().values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return totals
+        _, deleted = model.objects.filter(pk__in=ids).delete()
+        totals.update(deleted)
+
+
+def purge_expired_tokens(chunk_size=None):
+    """
+    Remove OTPs, tokens de redefinição e refresh tokens expirados (as linhas
+    de BlacklistedToken saem em cascata com o OutstandingToken); retorna as
+    contagens por tabela.
+    """
+    now = timezone.now()
+    totals = Counter()
+    for model in (OtpCode, ResetPasswordToken, OutstandingToken):
+        totals.update(purge_expired(model, chunk_size, now))
+    result = {
+        'otp_codes': totals[OtpCode._meta.label],
+        'reset_tokens': totals[ResetPasswordToken._meta.label],
+        'outstanding_tokens': totals[OutstandingToken._meta.label],
+        'blacklisted_tokens': totals[BlacklistedToken._meta.label],
+    }
+    logger.info(
+        f"[AUTH PURGE] {result['otp_codes']} OTP(s), {result['reset_tokens']} token(s) de redefinição, "
+        f"{result['outstanding_tokens']} refresh token(s) e {result['blacklisted_tokens']} revogação(ões) "
+        f"expirados removidos."
+    )
+    return result
+
+
+@shared_task
+def purge_expired_tokens_task(chunk_size=None):
+    """
+    Tarefa periódica (Celery Beat) que remove OTPs, tokens de redefinição e
+    refresh tokens expirados. Retorna as linhas apagadas por tabela.
+    """
+    return purge_expired_tokens(chunk_size)
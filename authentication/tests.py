@@ -1,3 +1,515 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.http import JsonResponse
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from authentication import throttles
+from authentication.blacklist import TokenBlacklistStore, token_blacklist
+from authentication.hashing_pool import HashingPool
+from authentication.jwt_auth import CachedJWTAuthentication, user_cache
+from authentication.lookup import get_user_by_email
+from authentication.bulk_import import UserImporter
+from authentication.otp_store import CacheOtpStore
+from authentication.roles import DEFAULT_ROLE, role_resolver
+
+from authentication.models import OtpCode, ResetPasswordToken
+from authentication.serializers import OtpVerifySerializer, ResetPasswordSerializer
+from authentication.tasks import purge_expired_tokens
+from authentication.tokens import RoleRefreshToken
+from authentication.views import UserRegisterView, user_login_view
+
+User = get_user_model()
+
+
+@override_settings(OTP_STORE_BACKEND='db', EMAIL_OUTBOX_ENABLED=False)
+@mock.patch('services.tasks.email_tasks.send_email_task.apply_async')
+class TokenConsumptionQueryTests(TestCase):
+    """Fixa o número de queries dos fluxos de verificação de OTP e redefinição de senha."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ana@example.com', email='ana@example.com', password='x')
+
+    def test_otp_verify_queries(self, apply_async):
+        otp = OtpCode.objects.create(user=self.user)
+        serializer = OtpVerifySerializer(data={'code': otp.code})
+        # SAVEPOINT, SELECT OTP + usuário FOR UPDATE, DELETE OTP, INSERT token, RELEASE
+        with self.assertNumQueries(5):
+            self.assertTrue(serializer.is_valid())
+        self.assertFalse(OtpCode.objects.filter(pk=otp.pk).exists())
+        self.assertEqual(ResetPasswordToken.objects.filter(user=self.user).count(), 1)
+
+    def test_otp_cannot_be_reused(self, apply_async):
+        otp = OtpCode.objects.create(user=self.user)
+        self.assertTrue(OtpVerifySerializer(data={'code': otp.code}).is_valid())
+        serializer = OtpVerifySerializer(data={'code': otp.code})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('code', serializer.errors)
+
+    def test_reset_password_queries(self, apply_async):
+        token = ResetPasswordToken.objects.create(user=self.user)
+        serializer = ResetPasswordSerializer(
+            data={'token': str(token.token), 'password': 'Nova@Senha1', 'password2': 'Nova@Senha1'}
+        )
+        self.assertTrue(serializer.is_valid())
+        # SAVEPOINT, SELECT token + usuário FOR UPDATE, DELETE token, UPDATE usuário, RELEASE
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(5):
+            serializer.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Nova@Senha1'))
+        self.assertFalse(ResetPasswordToken.objects.filter(pk=token.pk).exists())
+        apply_async.assert_called_once()
+
+    def test_expired_reset_token_is_rejected(self, apply_async):
+        token = ResetPasswordToken.objects.create(user=self.user)
+        ResetPasswordToken.objects.filter(pk=token.pk).update(expires_at=timezone.now())
+        serializer = ResetPasswordSerializer(
+            data={'token': str(token.token), 'password': 'Nova@Senha1', 'password2': 'Nova@Senha1'}
+        )
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('x'))
+
+
+class EmailLookupTests(TestCase):
+    """Busca por e-mail sem diferenciar maiúsculas, login por e-mail e unicidade em LOWER(email)."""
+
+    def setUp(self):
+        role_resolver.invalidate_groups()
+        self.user = User.objects.create_user(username='Caio@Example.com', email='Caio@Example.com', password='x')
+
+    def test_get_user_by_email_ignores_case_and_spaces(self):
+        self.assertEqual(get_user_by_email(' CAIO@example.COM '), self.user)
+        self.assertIsNone(get_user_by_email('outro@example.com'))
+
+    def test_users_without_email_do_not_match(self):
+        User.objects.create_user(username='sem-email-1', password='x')
+        User.objects.create_user(username='sem-email-2', password='x')
+        self.assertIsNone(get_user_by_email(''))
+
+    def test_email_backend_login(self):
+        self.assertEqual(authenticate(email='caio@EXAMPLE.com', password='x'), self.user)
+        self.assertIsNone(authenticate(email='caio@example.com', password='errada'))
+        self.assertIsNone(authenticate(email='ninguem@example.com', password='x'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(authenticate(email='caio@example.com', password='x'))
+
+    def test_unique_index_rejects_case_variant(self):
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(username='caio2', email='CAIO@example.com', password='x')
+
+    def test_concurrent_duplicate_register_returns_400(self):
+        # Outro registro gravou o e-mail entre a validação e o INSERT: só o índice único percebe
+        payload = {'first_name': 'Caio', 'last_name': 'Dois', 'email': 'caio@example.com',
+                   'password': 'Senha@123', 'password2': 'Senha@123'}
+        request = APIRequestFactory().post('/', payload, format='json')
+        with mock.patch('authentication.serializers.users_by_email', return_value=User.objects.none()):
+            response = UserRegisterView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['email'], ["Este e-mail já está em uso."])
+        self.assertEqual(User.objects.count(), 1)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Snapshot do usuário em cache: sem SELECT nos acertos, descartado ao salvar o usuário."""
+
+    def setUp(self):
+        user_cache.clear()
+        # O reload do simplejwt em setting_changed não alcança os módulos que já importaram api_settings
+        patcher = mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='ivo@example.com', email='ivo@example.com', password='x')
+        self.auth = CachedJWTAuthentication()
+        self.token = self.auth.get_validated_token(str(RoleRefreshToken.for_user(self.user).access_token))
+
+    def test_hit_skips_db(self):
+        self.auth.get_user(self.token)
+        with self.assertNumQueries(0):
+            user = self.auth.get_user(self.token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_password_change_evicts_cached_user(self):
+        self.auth.get_user(self.token)
+        self.user.set_password('Nova@Senha1')
+        self.user.save()
+        self.assertIsNone(user_cache.get(str(self.user.pk)))
+        with self.assertRaises(AuthenticationFailed) as ctx:
+            self.auth.get_user(self.token)
+        self.assertEqual(ctx.exception.detail['code'], 'password_changed')
+
+    def test_deactivation_evicts_cached_user(self):
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_cache.get(str(self.user.pk)))
+        with self.assertRaises(AuthenticationFailed) as ctx:
+            self.auth.get_user(self.token)
+        self.assertEqual(ctx.exception.detail['code'], 'user_inactive')
+
+    def test_hit_rechecks_is_active(self):
+        # Snapshot desatualizado (desativação feita em outro processo, antes do TTL)
+        self.auth.get_user(self.token)
+        user_cache.get(str(self.user.pk)).is_active = False
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_requests_get_a_copy_of_the_snapshot(self):
+        self.auth.get_user(self.token).first_name = 'alterado'
+        self.assertEqual(self.auth.get_user(self.token).first_name, '')
+
+
+class RoleClaimTests(TestCase):
+    """Claim `role` nos tokens e invalidação do papel em cache pelos sinais."""
+
+    def setUp(self):
+        role_resolver.invalidate_groups()
+        self.user = User.objects.create_user(username='eva@example.com', email='eva@example.com', password='x')
+        self.staff = Group.objects.create(name='staff')
+
+    def test_refresh_and_access_tokens_carry_role(self):
+        self.assertEqual(RoleRefreshToken.for_user(self.user)['role'], DEFAULT_ROLE)
+        self.user.groups.add(self.staff)
+        refresh = RoleRefreshToken.for_user(self.user)
+        self.assertEqual(refresh['role'], 'staff')
+        self.assertEqual(refresh.access_token['role'], 'staff')
+
+    def test_cached_role_skips_db(self):
+        role_resolver.role_for(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(role_resolver.role_for(self.user), DEFAULT_ROLE)
+
+    def test_membership_change_invalidates(self):
+        self.assertEqual(role_resolver.role_for(self.user), DEFAULT_ROLE)
+        self.user.groups.add(self.staff)
+        self.assertEqual(role_resolver.role_for(self.user), 'staff')
+        self.user.groups.remove(self.staff)
+        self.assertEqual(role_resolver.role_for(self.user), DEFAULT_ROLE)
+
+    def test_reverse_membership_change_invalidates(self):
+        self.assertEqual(role_resolver.role_for(self.user), DEFAULT_ROLE)
+        self.staff.user_set.add(self.user)
+        self.assertEqual(role_resolver.role_for(self.user), 'staff')
+        self.staff.user_set.clear()
+        self.assertEqual(role_resolver.role_for(self.user), DEFAULT_ROLE)
+
+    def test_group_rename_and_delete_invalidate(self):
+        self.user.groups.add(self.staff)
+        self.assertEqual(role_resolver.role_for(self.user), 'staff')
+        self.staff.name = 'suporte'
+        self.staff.save()
+        self.assertEqual(role_resolver.role_for(self.user), 'suporte')
+        self.staff.delete()
+        self.assertEqual(role_resolver.role_for(self.user), DEFAULT_ROLE)
+
+
+@override_settings(AUTH_TOKEN_PURGE_CHUNK_SIZE=2)
+class PurgeExpiredTokensTests(TestCase):
+    """Limpeza periódica apaga só as linhas expiradas, em blocos curtos, e conta por tabela."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='leo@example.com', email='leo@example.com', password='x')
+        self.past = timezone.now() - timedelta(minutes=1)
+        self.future = timezone.now() + timedelta(hours=1)
+
+    def create_outstanding(self, jti, expires_at, revoked=False):
+        token = OutstandingToken.objects.create(user=self.user, jti=jti, token=jti, expires_at=expires_at)
+        if revoked:
+            BlacklistedToken.objects.create(token=token)
+        return token
+
+    def test_purges_in_chunks_and_keeps_live_rows(self):
+        for _ in range(5):
+            OtpCode.objects.create(user=self.user)
+        live_otp = OtpCode.objects.create(user=self.user)
+        OtpCode.objects.exclude(pk=live_otp.pk).update(expires_at=self.past)
+        for _ in range(3):
+            ResetPasswordToken.objects.create(user=self.user)
+        live_reset = ResetPasswordToken.objects.create(user=self.user)
+        ResetPasswordToken.objects.exclude(pk=live_reset.pk).update(expires_at=self.past)
+        for i in range(3):
+            self.create_outstanding(f'velho-{i}', self.past, revoked=i < 2)
+        live_refresh = self.create_outstanding('vivo', self.future, revoked=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = purge_expired_tokens()
+
+        self.assertEqual(result, {
+            'otp_codes': 5, 'reset_tokens': 3, 'outstanding_tokens': 3, 'blacklisted_tokens': 2,
+        })
+        otp_deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "authentication_otpcode"')]
+        self.assertEqual(len(otp_deletes), 3)
+        self.assertQuerySetEqual(OtpCode.objects.all(), [live_otp])
+        self.assertQuerySetEqual(ResetPasswordToken.objects.all(), [live_reset])
+        self.assertQuerySetEqual(OutstandingToken.objects.all(), [live_refresh])
+        self.assertTrue(BlacklistedToken.objects.filter(token=live_refresh).exists())
+
+    def test_nothing_expired(self):
+        OtpCode.objects.create(user=self.user)
+        self.assertEqual(set(purge_expired_tokens().values()), {0})
+        self.assertEqual(OtpCode.objects.count(), 1)
+
+
+@override_settings(AUTH_BLACKLIST_SYNC_INTERVAL=3600)
+class TokenBlacklistTests(TestCase):
+    """Refresh e logout passam pelo token_blacklist: Bloom local primeiro, banco só em caso de dúvida."""
+
+    def setUp(self):
+        caches[settings.AUTH_BLACKLIST_CACHE_ALIAS].clear()
+        # Um único processo de teste: o LocMemCache faz o papel do cache compartilhado
+        patcher = mock.patch.object(token_blacklist, 'shared', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        token_blacklist._bloom = None
+        token_blacklist._version = None
+        self.user = User.objects.create_user(username='bia@example.com', email='bia@example.com', password='x')
+        self.refresh = RoleRefreshToken.for_user(self.user)
+
+    def test_blacklisted_refresh_token_rejected_without_db_hit(self):
+        response = self.client.post(reverse('authentication:logout'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=self.refresh['jti']).exists())
+
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('authentication:token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_bloom_false_positive_falls_through_to_db(self):
+        self.assertFalse(token_blacklist.is_blacklisted('aquecimento'))
+        # Simula um falso positivo: o jti "aparece" no Bloom sem estar revogado
+        token_blacklist._bloom.add(self.refresh['jti'])
+
+        with self.assertNumQueries(1):
+            self.assertFalse(token_blacklist.is_blacklisted(self.refresh['jti']))
+
+        response = self.client.post(reverse('authentication:token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RoleRefreshToken(str(self.refresh)).access_token['role'], self.refresh['role'])
+
+
+@override_settings(AUTH_BLACKLIST_SYNC_INTERVAL=3600, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'processo-a': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-processo-a'},
+    'processo-b': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-processo-b'},
+})
+class TokenBlacklistCrossProcessTests(TestCase):
+    """Com caches locais a cada processo, uma revogação feita em um vale em todos."""
+
+    def test_revocation_seen_by_other_process(self):
+        user = User.objects.create_user(username='rui@example.com', email='rui@example.com', password='x')
+        refresh = RoleRefreshToken.for_user(user)
+        revoker, other = TokenBlacklistStore('processo-a'), TokenBlacklistStore('processo-b')
+        self.assertFalse(other.shared)
+        self.assertFalse(other.is_blacklisted(refresh['jti']))
+
+        refresh.blacklist()
+        revoker.add(refresh['jti'], timezone.now() + timedelta(days=1))
+
+        self.assertTrue(revoker.is_blacklisted(refresh['jti']))
+        self.assertTrue(other.is_blacklisted(refresh['jti']))
+
+
+class LoginThrottleTests(TestCase):
+    """Os throttles de login recusam antes de ocupar uma vaga no hashing_pool."""
+
+    def setUp(self):
+        throttles._stores.clear()
+
+    @mock.patch.object(throttles.LoginIPThrottle, 'rate', '2/min', create=True)
+    @mock.patch('authentication.views.hashing_pool.run', new_callable=mock.AsyncMock)
+    def test_flood_is_rejected_before_the_pool(self, run):
+        run.return_value = JsonResponse({}, status=400)
+        payload = {'email': 'flood@example.com', 'password': 'errada'}
+        statuses = [
+            self.client.post(reverse('authentication:login'), payload, content_type='application/json').status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [400, 400, 429])
+        self.assertEqual(run.await_count, 2)
+
+    @override_settings(AUTH_THROTTLE_BACKEND='cache')
+    @mock.patch('authentication.views.hashing_pool.run', new_callable=mock.AsyncMock)
+    def test_cache_backend_checks_off_the_event_loop(self, run):
+        run.return_value = JsonResponse({}, status=400)
+        on_loop = []
+
+        def hit(store, key, limit, duration):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return True, 0.0
+
+        with mock.patch.object(throttles.CacheWindowStore, 'hit', hit):
+            self.client.post(reverse('authentication:login'), {'email': 'x@example.com'}, content_type='application/json')
+        self.assertTrue(on_loop)
+        self.assertNotIn(True, on_loop)
+
+    @mock.patch.object(throttles.LoginIPThrottle, 'rate', '1/min', create=True)
+    @mock.patch('authentication.views.hashing_pool.run', new_callable=mock.AsyncMock)
+    def test_stats_endpoint_reports_throttle_counts(self, run):
+        run.return_value = JsonResponse({}, status=400)
+        before = throttles.throttle_metrics.snapshot().get('login_ip', {'allowed': 0, 'rejected': 0})
+        for _ in range(2):
+            self.client.post(reverse('authentication:login'), {}, content_type='application/json')
+
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        access = RoleRefreshToken.for_user(admin).access_token
+        response = self.client.get(reverse('authentication:stats'), HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 200)
+        login_ip = response.json()['throttles']['login_ip']
+        self.assertEqual(login_ip['allowed'] - before['allowed'], 1)
+        self.assertEqual(login_ip['rejected'] - before['rejected'], 1)
+        self.assertIn('inflight', response.json()['hashing_pool'])
+
+
+class HashingPoolSaturationTests(SimpleTestCase):
+    """Com execução e fila cheias, a view responde 503 com Retry-After sem esperar vaga."""
+
+    def setUp(self):
+        throttles._stores.clear()
+
+    def test_full_pool_and_queue_returns_503(self):
+        pool = HashingPool(max_workers=1, max_queue=1)
+        gate = threading.Event()
+        request = AsyncRequestFactory().post(
+            reverse('authentication:login'), {'email': 'pico@example.com', 'password': 'x'},
+            content_type='application/json'
+        )
+
+        async def scenario():
+            # Uma tarefa rodando e uma na fila ocupam todas as vagas
+            busy = [asyncio.ensure_future(pool.run(gate.wait)) for _ in range(2)]
+            await asyncio.sleep(0)
+            try:
+                with mock.patch('authentication.views.hashing_pool', pool):
+                    return await user_login_view(request)
+            finally:
+                gate.set()
+                await asyncio.gather(*busy)
+
+        response = asyncio.run(scenario())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(pool.stats()['rejected'], 1)
+        self.assertEqual(pool.stats()['inflight'], 0)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.tiered_cache.TieredCache',
+        'LOCATION': 'tests-tiered',
+        'OPTIONS': {'L2': 'shared', 'L1_TTL': 60},
+    },
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-tiered-l2'},
+})
+class TieredCacheTests(TestCase):
+    """O L1 nunca guarda um valor vindo do L2 por mais tempo do que ele ainda vale lá."""
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache.clear()
+
+    def l1_remaining(self, key):
+        _, expires_at = self.cache.l1._data[self.cache.make_and_validate_key(key)]
+        return expires_at - time.monotonic()
+
+    def test_l2_hit_is_capped_at_remaining_l2_ttl(self):
+        caches['shared'].set('reserva', 1, timeout=2)
+        self.assertEqual(self.cache.get('reserva'), 1)
+        self.assertLessEqual(self.l1_remaining('reserva'), 2)
+
+    def test_l2_hit_without_expiry_uses_l1_ttl(self):
+        caches['shared'].set('config', 'x', timeout=None)
+        self.assertEqual(self.cache.get_many(['config']), {'config': 'x'})
+        self.assertGreater(self.l1_remaining('config'), 2)
+
+    def test_otp_store_skips_l1(self):
+        user = User.objects.create_user(username='caio@example.com', email='caio@example.com', password='x')
+        store = CacheOtpStore(alias='default')
+        code, created = store.issue(user)
+        self.assertTrue(created)
+        # Consumido por outro processo: some do L2, o L1 deste não fica sabendo
+        self.cache.l1.set(self.cache.make_and_validate_key(store._code_key(code)), user.pk, 60)
+        caches['shared'].delete(store._code_key(code))
+
+        self.assertIsNone(store.consume(code))
+        self.assertTrue(store.issue(user)[1])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImporterTests(TestCase):
+    """Importação em massa: filtragem das linhas, valores não textuais e conflitos na gravação."""
+
+    def setUp(self):
+        # O id do grupo padrão guardado por outro teste pode ter sido revertido
+        role_resolver.invalidate_groups()
+        User.objects.create_user(username='existe@example.com', email='existe@example.com', password='x')
+        # Username igual a um e-mail do arquivo, com outro e-mail cadastrado
+        User.objects.create_user(username='ocupado@example.com', email='outro@example.com', password='x')
+
+    def test_skips_duplicates_existing_emails_and_usernames(self):
+        rows = [
+            {'email': ' Nova@Example.com ', 'first_name': 'Nova', 'password': 'Senha@123'},
+            {'email': 'nova@example.com', 'first_name': 'Repetida'},
+            {'email': 'EXISTE@example.com'},
+            {'email': 'ocupado@example.com'},
+            {'first_name': 'Sem e-mail'},
+        ]
+        stats = UserImporter(chunk_size=2, workers=1).run(rows)
+        self.assertEqual((stats['processed'], stats['created'], stats['skipped']), (5, 1, 4))
+        user = User.objects.get(username='nova@example.com')
+        self.assertEqual(user.first_name, 'Nova')
+        self.assertTrue(user.check_password('Senha@123'))
+        self.assertTrue(user.groups.exists())
+
+    def test_non_string_json_values(self):
+        rows = [{'email': 'num@example.com', 'first_name': 42, 'last_name': None, 'password': 1234}, ['lista']]
+        stats = UserImporter(workers=1).run(rows)
+        self.assertEqual((stats['created'], stats['skipped']), (1, 1))
+        user = User.objects.get(username='num@example.com')
+        self.assertEqual((user.first_name, user.last_name), ('42', ''))
+        self.assertTrue(user.check_password('1234'))
+
+    def test_failed_chunk_is_rolled_back(self):
+        rows = [{'email': 'a@example.com'}, {'email': 'b@example.com'}, {'email': 'c@example.com'}]
+        importer = UserImporter(chunk_size=2, workers=1)
+        with mock.patch.object(
+            User.groups.through.objects, 'bulk_create', side_effect=[None, IntegrityError('conflito')]
+        ), self.assertRaises(IntegrityError):
+            importer.run(rows)
+        self.assertEqual(importer.stats['created'], 2)
+        self.assertQuerySetEqual(
+            User.objects.filter(username__in=[row['email'] for row in rows]).order_by('username'),
+            ['a@example.com', 'b@example.com'], transform=lambda user: user.username
+        )
+
+    def test_admin_reports_integrity_error_on_the_form(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('usuarios.csv', b'email\nnovo@example.com\n')
+        with mock.patch('authentication.admin.UserImporter.run', side_effect=IntegrityError('conflito')):
+            response = self.client.post(reverse('admin:auth_user_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Conflito ao gravar usuários', str(response.context['form'].non_field_errors()))
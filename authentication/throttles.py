@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class LocalWindowStore:
+    """
+    Contadores de janela deslizante em memória do processo.
+
+    Usa a aproximação de duas janelas fixas (atual + anterior ponderada pelo
+    tempo restante): memória O(1) por chave e um único lock por verificação.
+    """
+
+    # A cada N verificações remove as chaves cujas janelas já expiraram
+    PRUNE_EVERY = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._hits = 0
+
+    def hit(self, key, limit, duration):
+        """Conta uma requisição; retorna (permitida, segundos até liberar)."""
+        now = time.time()
+        window = int(now // duration)
+        elapsed = (now % duration) / duration
+        with self._lock:
+            current_window, current, previous = self._windows.get(key, (window, 0, 0))
+            if current_window < window - 1:
+                current, previous = 0, 0
+            elif current_window == window - 1:
+                current, previous = 0, current
+            allowed = previous * (1 - elapsed) + current < limit
+            if allowed:
+                current += 1
+            self._windows[key] = (window, current, previous)
+
+            self._hits += 1
+            if self._hits % self.PRUNE_EVERY == 0:
+                self._windows = {k: v for k, v in self._windows.items() if v[0] >= window - 1}
+        return allowed, 0.0 if allowed else _wait(limit, duration, elapsed, current, previous)
+
+
+class CacheWindowStore:
+    """Mesmos contadores guardados no cache compartilhado (várias instâncias da API)."""
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.AUTH_THROTTLE_CACHE_ALIAS]
+
+    def hit(self, key, limit, duration):
+        now = time.time()
+        window = int(now // duration)
+        elapsed = (now % duration) / duration
+        current_key = f"{key}:{window}"
+        previous = self.cache.get(f"{key}:{window - 1}", 0)
+        self.cache.add(current_key, 0, timeout=duration * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:  # a chave expirou entre o add e o incr
+            self.cache.set(current_key, 1, timeout=duration * 2)
+            current = 1
+        if previous * (1 - elapsed) + current <= limit:
+            return True, 0.0
+        # Requisições recusadas não contam para a janela
+        self.cache.decr(current_key)
+        return False, _wait(limit, duration, elapsed, current - 1, previous)
+
+
+def _wait(limit, duration, elapsed, current, previous):
+    """Segundos até a estimativa da janela deslizante cair abaixo do limite."""
+    if current >= limit or not previous:
+        return (1 - elapsed) * duration
+    release_at = 1 - (limit - current) / previous
+    return max(0.0, (release_at - elapsed) * duration)
+
+
+class ThrottleMetrics:
+    """Contadores de requisições permitidas/recusadas por escopo, com log periódico."""
+
+    def __init__(self, report_every=100):
+        self.report_every = report_every
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, scope, allowed):
+        with self._lock:
+            counts = self._counts.setdefault(scope, {'allowed': 0, 'rejected': 0})
+            counts['allowed' if allowed else 'rejected'] += 1
+            should_report = not allowed and counts['rejected'] % self.report_every == 0
+            snapshot = dict(counts)
+        if should_report:
+            logger.warning(
+                f"[AUTH THROTTLE] escopo={scope} permitidas={snapshot['allowed']} recusadas={snapshot['rejected']}"
+            )
+
+    def snapshot(self):
+        with self._lock:
+            return {scope: dict(counts) for scope, counts in self._counts.items()}
+
+
+throttle_metrics = ThrottleMetrics()
+
+_stores = {}
+
+
+def get_window_store():
+    """Retorna o armazenamento configurado em AUTH_THROTTLE_BACKEND ('local' ou 'cache')."""
+    backend = settings.AUTH_THROTTLE_BACKEND
+    if backend not in _stores:
+        _stores[backend] = CacheWindowStore() if backend == 'cache' else LocalWindowStore()
+    return _stores[backend]
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Throttle DRF com janela deslizante aproximada.
+
+    Diferente do SimpleRateThrottle, não guarda o histórico de timestamps no
+    cache: cada verificação é um contador, e a recusa acontece em
+    APIView.initial(), antes de qualquer consulta ao banco ou hashing.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = get_window_store().hit(self.key, self.num_requests, self.duration)
+        throttle_metrics.record(self.scope, allowed)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class IPThrottle(SlidingWindowThrottle):
+    """Limita por endereço IP do cliente."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    """Limita pelo e-mail informado no corpo, normalizado (minúsculas, sem espaços)."""
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = 'login_email'
+
+
+class RecoveryIPThrottle(IPThrottle):
+    scope = 'recovery_ip'
+
+
+class RecoveryEmailThrottle(EmailThrottle):
+    scope = 'recovery_email'
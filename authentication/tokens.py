@@ -0,0 +1,28 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.blacklist import token_blacklist
+from authentication.roles import role_resolver
+
+
+class RoleRefreshToken(RefreshToken):
+    """
+    Refresh token com o papel do usuário na claim `role`.
+
+    A claim é copiada para o access token derivado, de modo que requisições
+    autenticadas obtêm o papel sem consultar os grupos no banco. A checagem
+    de revogação usa o token_blacklist (Bloom + cache) em vez de um JOIN em
+    BlacklistedToken a cada verificação.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['role'] = role_resolver.role_for(user)
+        return token
+
+    def check_blacklist(self):
+        if token_blacklist.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
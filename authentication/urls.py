@@ -1,18 +1,24 @@
 from django.urls import path
 from authentication.views import (
-    UserRegisterView,
-    UserLoginView,
+    user_register_view,
+    user_login_view,
     UserRecoveryView,
     OtpVerifyView,
-    ResetPasswordView
+    reset_password_view,
+    TokenRefreshRoleView,
+    LogoutView,
+    auth_stats
 )
 
 app_name = 'authentication'
 
 urlpatterns = [
-    path('register/', UserRegisterView.as_view(), name='register'),
-    path('login/', UserLoginView.as_view(), name='login'),
+    path('register/', user_register_view, name='register'),
+    path('login/', user_login_view, name='login'),
     path('recovery/', UserRecoveryView.as_view(), name='recovery'),
     path('otp-verify/', OtpVerifyView.as_view(), name='otp_verify'),
-    path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
+    path('reset-password/', reset_password_view, name='reset_password'),
+    path('token/refresh/', TokenRefreshRoleView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('stats/', auth_stats, name='stats'),
 ]
\ No newline at end of file
@@ -1,13 +1,32 @@
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ParseError, Throttled
+from rest_framework.request import Request
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework_simplejwt.views import TokenBlacklistView, TokenRefreshView
 from authentication.serializers import (
     UserRegisterSerializer,
     UserLoginSerializer,
     UserRecoverySerializer,
     OtpVerifySerializer,
-    ResetPasswordSerializer
+    ResetPasswordSerializer,
+    RoleTokenRefreshSerializer,
+    LogoutSerializer
+)
+from authentication.hashing_pool import hashing_pool, HashingPoolSaturated
+from authentication.throttles import (
+    LoginIPThrottle,
+    LoginEmailThrottle,
+    RecoveryIPThrottle,
+    RecoveryEmailThrottle,
+    throttle_metrics
 )
 
 
@@ -26,6 +45,7 @@ class UserRegisterView(APIView):
 class UserLoginView(APIView):
     """View para login de usuários."""
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
 
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
@@ -37,6 +57,7 @@ class UserLoginView(APIView):
 class UserRecoveryView(APIView):
     """View para iniciar a recuperação de senha."""
     permission_classes = [AllowAny]
+    throttle_classes = [RecoveryIPThrottle, RecoveryEmailThrottle]
 
     def post(self, request):
         serializer = UserRecoverySerializer(data=request.data)
@@ -66,3 +87,105 @@ class ResetPasswordView(APIView):
             data = serializer.save()
             return Response(data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TokenRefreshRoleView(TokenRefreshView):
+    """Renova o access token a partir do refresh token, mantendo a claim `role`."""
+    serializer_class = RoleTokenRefreshSerializer
+
+
+class LogoutView(TokenBlacklistView):
+    """Logout: coloca o refresh token na blacklist."""
+    serializer_class = LogoutSerializer
+
+
+def _run_view(view, request, *args, **kwargs):
+    """Executa a view DRF e renderiza a resposta ainda na thread do pool."""
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+def _check_throttles(view_class, request):
+    """
+    Aplica os throttles da view ainda no event loop, antes de ocupar uma vaga
+    no hashing_pool. Retorna a resposta 429 ou None se a requisição passou.
+    """
+    if not view_class.throttle_classes:
+        return None
+    # Lê o corpo para a memória: a view no pool volta a parseá-lo depois
+    request.body
+    drf_request = Request(request, parsers=[parser() for parser in view_class.parser_classes])
+    try:
+        drf_request.data
+    except ParseError:
+        pass  # o corpo inválido vira 400 na própria view; aqui só o throttle por IP se aplica
+
+    durations = []
+    for throttle_class in view_class.throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            durations.append(throttle.wait())
+    if not durations:
+        return None
+
+    wait = max((duration for duration in durations if duration is not None), default=None)
+    response = JsonResponse({"detail": str(Throttled(wait).detail)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    if wait is not None:
+        response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def offload_to_hashing_pool(view_class):
+    """
+    Versão assíncrona de uma APIView cujo trabalho é dominado pelo hashing de senha.
+
+    A view DRF inteira (serializer, ORM e PBKDF2) roda no hashing_pool, de modo
+    que sob ASGI o event loop e a thread de código síncrono continuam livres
+    para endpoints baratos como /health/. Os throttles da view são checados
+    antes: uma enxurrada de tentativas recebe 429 sem ocupar o pool nem
+    esperar atrás do PBKDF2. Com o pool saturado responde 503.
+
+    Com AUTH_THROTTLE_BACKEND='cache' a checagem faz I/O no cache (Redis) e
+    roda numa thread, fora do event loop; com 'local' são só contadores em
+    memória e ela roda direto no loop.
+    """
+    # Os throttles já rodaram em _check_throttles; a view no pool não os repete
+    view = view_class.as_view(throttle_classes=[])
+    check_throttles_in_thread = sync_to_async(_check_throttles, thread_sensitive=False)
+
+    async def async_view(request, *args, **kwargs):
+        if settings.AUTH_THROTTLE_BACKEND == 'cache':
+            throttled = await check_throttles_in_thread(view_class, request)
+        else:
+            throttled = _check_throttles(view_class, request)
+        if throttled is not None:
+            return throttled
+        try:
+            return await hashing_pool.run(_run_view, view, request, *args, **kwargs)
+        except HashingPoolSaturated:
+            response = JsonResponse(
+                {"detail": "Servidor ocupado. Tente novamente em instantes."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = '1'
+            return response
+
+    # Mantém o comportamento de APIView.as_view (isenção de CSRF) e a introspecção do drf-spectacular
+    async_view.csrf_exempt = True
+    async_view.cls = view.cls
+    async_view.initkwargs = view.initkwargs
+    return async_view
+
+
+user_register_view = offload_to_hashing_pool(UserRegisterView)
+user_login_view = offload_to_hashing_pool(UserLoginView)
+reset_password_view = offload_to_hashing_pool(ResetPasswordView)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def auth_stats(request):
+    """Requisições permitidas/recusadas por escopo de throttle e ocupação do hashing_pool neste processo."""
+    return Response({"throttles": throttle_metrics.snapshot(), "hashing_pool": hashing_pool.stats()})
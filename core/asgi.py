@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+As views de login, registro e redefinição de senha são assíncronas e delegam o
+hashing ao pool limitado de authentication.hashing_pool; sirva a aplicação por
+este módulo (ex.: uvicorn core.asgi:application) para que endpoints baratos
+como /health/ continuem respondendo durante picos de login.
 """
 
 import os
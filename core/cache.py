@@ -0,0 +1,77 @@
+import logging
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+SHARED_ALIAS = 'shared'
+
+
+def get_shared_cache_config(redis_url: str, timeout: int, key_prefix: str) -> dict:
+    """
+    Cache L2, compartilhado entre processos, no Redis. Só o Redis garante
+    add/incr atômicos entre processos, de que dependem reservas, throttles e
+    o consumo único de códigos.
+    """
+    logger.info(f"[CACHE] L2 no Redis → {redis_url.rsplit('@', 1)[-1]}")
+    return {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': redis_url,
+        'TIMEOUT': timeout,
+        'KEY_PREFIX': key_prefix,
+    }
+
+
+def get_cache_config():
+    """
+    Monta CACHES conforme CACHE_BACKEND:
+
+    - 'tiered': 'default' é um L1 LRU em memória do processo na frente do
+      L2 compartilhado (alias 'shared');
+    - 'shared': 'default' é o próprio L2, sem L1;
+    - 'local': LocMemCache por processo, como o Django faz sem CACHES.
+
+    O padrão é 'tiered' quando CACHE_REDIS_URL está definido e 'local' caso
+    contrário. 'tiered' e 'shared' pedidos sem CACHE_REDIS_URL caem para
+    'local' com um aviso.
+    """
+    redis_url = config('CACHE_REDIS_URL', default='')
+    backend = config('CACHE_BACKEND', default='tiered' if redis_url else 'local').lower()
+    timeout = config('CACHE_DEFAULT_TIMEOUT', default=300, cast=int)
+    key_prefix = config('CACHE_KEY_PREFIX', default='django_template')
+
+    if backend != 'local' and not redis_url:
+        logger.warning(f"[CACHE] CACHE_BACKEND '{backend}' exige CACHE_REDIS_URL. Usando 'local'.")
+        backend = 'local'
+
+    if backend == 'local':
+        logger.info("[CACHE] Usando LocMemCache por processo.")
+        return {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'TIMEOUT': timeout}}
+
+    shared = get_shared_cache_config(redis_url, timeout, key_prefix)
+    if backend == 'shared':
+        return {'default': shared, SHARED_ALIAS: shared}
+
+    if backend != 'tiered':
+        logger.warning(f"[CACHE] CACHE_BACKEND '{backend}' não reconhecido. Usando 'tiered'.")
+
+    l1_max_entries = config('CACHE_L1_MAX_ENTRIES', default=1000, cast=int)
+    l1_ttl = config('CACHE_L1_TTL', default=5.0, cast=float)
+    logger.info(f"[CACHE] L1 local (até {l1_max_entries} entradas, TTL {l1_ttl}s) na frente do L2.")
+    return {
+        'default': {
+            'BACKEND': 'core.tiered_cache.TieredCache',
+            'LOCATION': 'default',
+            'TIMEOUT': timeout,
+            'KEY_PREFIX': key_prefix,
+            'OPTIONS': {
+                'L2': SHARED_ALIAS,
+                'L1_MAX_ENTRIES': l1_max_entries,
+                'L1_TTL': l1_ttl,
+            },
+        },
+        SHARED_ALIAS: shared,
+    }
+
+
+# Exporta para uso direto no settings.py
+CACHES = get_cache_config()
@@ -1,8 +1,27 @@
 import os
 from celery import Celery
+from kombu import Queue
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 app = Celery('core')
 app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Filas de e-mail separadas por prioridade: OTPs e avisos de conta nunca
+# esperam atrás de campanhas em lote. Workers dedicados são iniciados por
+# start_manager.sh com concorrência e prefetch próprios para cada fila.
+EMAIL_TRANSACTIONAL_QUEUE = 'email_transactional'
+EMAIL_BULK_QUEUE = 'email_bulk'
+
+app.conf.task_default_queue = 'celery'
+app.conf.task_queues = (
+    Queue('celery'),
+    Queue(EMAIL_TRANSACTIONAL_QUEUE),
+    Queue(EMAIL_BULK_QUEUE),
+)
+app.conf.task_routes = {
+    'services.tasks.email_tasks.send_email_task': {'queue': EMAIL_TRANSACTIONAL_QUEUE},
+    'services.tasks.email_tasks.send_bulk_email_task': {'queue': EMAIL_BULK_QUEUE},
+}
+
 app.autodiscover_tasks()
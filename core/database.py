@@ -32,6 +32,151 @@ def validate_env_vars(engine_key: str) -> bool:
         return False
     return True
 
+def _pool_available() -> bool:
+    """O pool nativo do Django 5.1+ depende do pacote psycopg_pool (psycopg[pool])."""
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _engine_options(engine_key: str) -> dict:
+    """Ajustes de conexão específicos de cada banco, lidos do ambiente."""
+    connect_timeout = config('DB_CONNECT_TIMEOUT', default=5, cast=int)
+    options = {}
+    if engine_key == 'postgresql':
+        options['connect_timeout'] = connect_timeout
+        sslmode = config('DB_SSLMODE', default='')
+        if sslmode:
+            options['sslmode'] = sslmode
+        statement_timeout = config('DB_STATEMENT_TIMEOUT', default=0, cast=int)
+        if statement_timeout:
+            options['options'] = f'-c statement_timeout={statement_timeout}'
+    elif engine_key == 'mysql':
+        options['connect_timeout'] = connect_timeout
+        options['charset'] = config('DB_CHARSET', default='utf8mb4')
+        options['init_command'] = "SET sql_mode='STRICT_TRANS_TABLES'"
+    elif engine_key == 'oracle':
+        options['tcp_connect_timeout'] = connect_timeout
+    return options
+
+
+def apply_connection_settings(db: dict, engine_key: str) -> dict:
+    """
+    Completa a configuração com persistência de conexões e pool nativo.
+
+    DB_POOL_ENABLED liga o pool do psycopg (somente PostgreSQL, Django 5.1+);
+    como o pool já mantém as conexões abertas, CONN_MAX_AGE fica em 0. Nos
+    demais casos, com DB_CONN_MAX_AGE > 0 (padrão 0, comportamento do
+    Django) a conexão é reaproveitada entre requisições por esse número de
+    segundos, validada antes do uso quando DB_CONN_HEALTH_CHECKS estiver
+    ativo.
+    """
+    db['CONN_HEALTH_CHECKS'] = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+    db['OPTIONS'] = _engine_options(engine_key)
+
+    pool_enabled = config('DB_POOL_ENABLED', default=False, cast=bool)
+    if pool_enabled and engine_key != 'postgresql':
+        logger.warning(f"[DATABASE] Pool nativo disponível apenas para PostgreSQL; ignorado para '{engine_key}'.")
+        pool_enabled = False
+    elif pool_enabled and not _pool_available():
+        logger.warning("[DATABASE] Pacote psycopg_pool não instalado; usando conexões persistentes.")
+        pool_enabled = False
+
+    if pool_enabled:
+        pool = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+            'max_idle': config('DB_POOL_MAX_IDLE', default=300.0, cast=float),
+            'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+        }
+        db['OPTIONS']['pool'] = pool
+        db['CONN_MAX_AGE'] = 0
+        logger.info(
+            f"[DATABASE] Pool de conexões psycopg ativo (min={pool['min_size']}, max={pool['max_size']}, "
+            f"timeout={pool['timeout']}s)."
+        )
+        return db
+
+    db['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=0, cast=int)
+    if db['CONN_MAX_AGE']:
+        logger.info(
+            f"[DATABASE] Conexões persistentes (CONN_MAX_AGE={db['CONN_MAX_AGE']}s, "
+            f"health checks={'on' if db['CONN_HEALTH_CHECKS'] else 'off'})."
+        )
+    else:
+        logger.info("[DATABASE] Sem persistência: uma conexão nova por requisição.")
+    return db
+
+
+def sqlite_config(db_name: str) -> dict:
+    """
+    Configuração do SQLite. Com DB_SQLITE_TUNED (padrão) cada conexão nova
+    executa os PRAGMAs de concorrência (journal WAL, synchronous=NORMAL,
+    mmap e cache de páginas), espera até DB_SQLITE_BUSY_TIMEOUT segundos por
+    um lock em vez de falhar com "database is locked" e abre as transações
+    com BEGIN IMMEDIATE, reservando a escrita logo no início para que dois
+    escritores não fiquem presos tentando promover um lock de leitura.
+    """
+    db = {
+        'ENGINE': ENGINE_MAP['sqlite3'],
+        'NAME': db_name,
+    }
+    if not config('DB_SQLITE_TUNED', default=True, cast=bool):
+        logger.info("[DATABASE] SQLite sem ajustes de concorrência (DB_SQLITE_TUNED desligado).")
+        return db
+
+    pragmas = {
+        'journal_mode': config('DB_SQLITE_JOURNAL_MODE', default='WAL'),
+        'synchronous': config('DB_SQLITE_SYNCHRONOUS', default='NORMAL'),
+        'mmap_size': config('DB_SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+        # Negativo: tamanho em KiB (64 MiB) em vez de número de páginas
+        'cache_size': config('DB_SQLITE_CACHE_SIZE', default=-64000, cast=int),
+    }
+    db['OPTIONS'] = {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items()),
+        'timeout': config('DB_SQLITE_BUSY_TIMEOUT', default=5.0, cast=float),
+        'transaction_mode': config('DB_SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+    }
+    logger.info(
+        f"[DATABASE] SQLite em modo concorrente (journal={pragmas['journal_mode']}, "
+        f"synchronous={pragmas['synchronous']}, timeout={db['OPTIONS']['timeout']}s, "
+        f"transações {db['OPTIONS']['transaction_mode']})."
+    )
+    return db
+
+
+def get_replica_configs(primary: dict) -> dict:
+    """
+    Lê as réplicas de leitura DB_REPLICA_<n>_HOST (n = 1, 2, ...) até a
+    primeira ausente. NAME, USER, PASSWORD e PORT herdam do primário quando
+    não informados; DB_REPLICA_<n>_WEIGHT define o peso no round-robin.
+    """
+    replicas = {}
+    n = 1
+    while config(f'DB_REPLICA_{n}_HOST', default=''):
+        alias = f'replica_{n}'
+        replicas[alias] = {
+            **primary,
+            'OPTIONS': dict(primary.get('OPTIONS', {})),
+            'NAME': config(f'DB_REPLICA_{n}_NAME', default=primary['NAME']),
+            'USER': config(f'DB_REPLICA_{n}_USER', default=primary['USER']),
+            'PASSWORD': config(f'DB_REPLICA_{n}_PASSWORD', default=primary['PASSWORD']),
+            'HOST': config(f'DB_REPLICA_{n}_HOST'),
+            'PORT': config(f'DB_REPLICA_{n}_PORT', default=primary['PORT']),
+            # Nos testes a réplica espelha o primário em vez de criar outro banco
+            'TEST': {'MIRROR': 'default'},
+        }
+        REPLICA_WEIGHTS[alias] = max(config(f'DB_REPLICA_{n}_WEIGHT', default=1, cast=int), 0)
+        logger.info(
+            f"[DATABASE] Réplica de leitura '{alias}' → {replicas[alias]['HOST']} (peso {REPLICA_WEIGHTS[alias]})."
+        )
+        n += 1
+    return replicas
+
+
 def get_database_config():
     engine_key = config('DB_ENGINE', default='sqlite3').lower()
     engine = ENGINE_MAP.get(engine_key)
@@ -50,35 +195,28 @@ def get_database_config():
         )
 
         logger.info(f"[DATABASE] Usando SQLite como backend → {db_name}")
-        return {
-            'default': {
-                'ENGINE': engine,
-                'NAME': db_name,
-            }
-        }
+        return {'default': sqlite_config(db_name)}
 
     # Para outros bancos, validar campos obrigatórios
     if not validate_env_vars(engine_key):
         logger.warning(f"[DATABASE] Fallback para SQLite devido a configuração incompleta de '{engine_key}'.")
-        return {
-            'default': {
-                'ENGINE': ENGINE_MAP['sqlite3'],
-                'NAME': str(BASE_DIR / 'db.sqlite3'),
-            }
-        }
+        return {'default': sqlite_config(str(BASE_DIR / 'db.sqlite3'))}
 
     logger.info(f"[DATABASE] Usando banco '{engine_key}' com engine '{engine}'.")
 
-    return {
-        'default': {
-            'ENGINE': engine,
-            'NAME': config('DB_NAME'),
-            'USER': config('DB_USER'),
-            'PASSWORD': config('DB_PASSWORD'),
-            'HOST': config('DB_HOST'),
-            'PORT': config('DB_PORT'),
-        }
-    }
+    primary = apply_connection_settings({
+        'ENGINE': engine,
+        'NAME': config('DB_NAME'),
+        'USER': config('DB_USER'),
+        'PASSWORD': config('DB_PASSWORD'),
+        'HOST': config('DB_HOST'),
+        'PORT': config('DB_PORT'),
+    }, engine_key)
+    return {'default': primary, **get_replica_configs(primary)}
+
+# Pesos das réplicas para o roteador (preenchido por get_replica_configs)
+REPLICA_WEIGHTS = {}
 
 # Exporta para uso direto no settings.py
 DATABASES = get_database_config()
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter'] if REPLICA_WEIGHTS else []
@@ -0,0 +1,189 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_primary_pin'
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+# Estado da request corrente: {'pinned': bool, 'wrote': bool}; None fora de requests (tarefas, shell)
+_request_state = contextvars.ContextVar('db_request_state', default=None)
+_forced_primary = contextvars.ContextVar('db_forced_primary', default=False)
+
+
+def pin_to_primary():
+    """Manda o restante da request corrente para o primário."""
+    state = _request_state.get()
+    if state is not None:
+        state['pinned'] = True
+
+
+def is_pinned():
+    state = _request_state.get()
+    return _forced_primary.get() or bool(state and state['pinned'])
+
+
+@contextmanager
+def use_primary():
+    """Força leituras no primário dentro do bloco (útil fora de requests)."""
+    token = _forced_primary.set(True)
+    try:
+        yield
+    finally:
+        _forced_primary.reset(token)
+
+
+class ReplicaSelector:
+    """
+    Round-robin ponderado suave (como o do nginx) entre as réplicas saudáveis.
+
+    Cada réplica é testada com uma conexão no máximo a cada
+    DB_REPLICA_HEALTH_INTERVAL segundos; se falhar, sai do rodízio por
+    DB_REPLICA_EJECT_SECONDS e as leituras caem nas demais ou no primário.
+    """
+
+    def __init__(self, weights):
+        self.weights = {alias: weight for alias, weight in weights.items() if weight > 0}
+        self._lock = threading.Lock()
+        self._current = {alias: 0 for alias in self.weights}
+        self._ejected_until = {}
+        self._checked_at = {}
+
+    def _healthy(self, now):
+        return {
+            alias: weight for alias, weight in self.weights.items()
+            if self._ejected_until.get(alias, 0) <= now
+        }
+
+    def _next(self, now, exclude=()):
+        with self._lock:
+            candidates = {alias: w for alias, w in self._healthy(now).items() if alias not in exclude}
+            if not candidates:
+                return None
+            total = sum(candidates.values())
+            for alias, weight in candidates.items():
+                self._current[alias] += weight
+            alias = max(candidates, key=self._current.__getitem__)
+            self._current[alias] -= total
+            return alias
+
+    def eject(self, alias, reason):
+        with self._lock:
+            self._ejected_until[alias] = time.monotonic() + settings.DB_REPLICA_EJECT_SECONDS
+        logger.warning(
+            f"[DATABASE] Réplica '{alias}' fora do rodízio por {settings.DB_REPLICA_EJECT_SECONDS}s: {reason}"
+        )
+
+    def _check(self, alias, now):
+        if now - self._checked_at.get(alias, float('-inf')) < settings.DB_REPLICA_HEALTH_INTERVAL:
+            return True
+        self._checked_at[alias] = now
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            if not connection.is_usable():
+                raise DatabaseError("conexão inutilizável")
+        except DatabaseError as e:
+            connection.close()
+            self.eject(alias, e)
+            return False
+        return True
+
+    def pick(self):
+        """Retorna o alias da próxima réplica saudável ou None se não houver."""
+        now = time.monotonic()
+        tried = set()
+        while True:
+            alias = self._next(now, exclude=tried)
+            if alias is None or self._check(alias, now):
+                return alias
+            tried.add(alias)
+
+
+class PrimaryReplicaRouter:
+    """
+    Leituras vão para as réplicas; escritas vão para o primário e fixam nele o
+    restante da request, para que ela leia o que acabou de gravar. Leituras
+    dentro de uma transação aberta no primário também ficam nele.
+    """
+
+    def __init__(self):
+        self.selector = ReplicaSelector(settings.DATABASE_REPLICA_WEIGHTS)
+
+    def db_for_read(self, model, **hints):
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.selector.pick() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['pinned'] = state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas espelham o primário: objetos de qualquer alias são os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """
+    Abre o estado de roteamento da request. Requests de escrita (POST, PUT,
+    PATCH, DELETE) e clientes com o cookie de fixação já começam no primário;
+    quando a request grava, o cookie mantém o cliente no primário por
+    DB_REPLICA_STICKY_SECONDS, tempo para as réplicas alcançarem a escrita.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Sob ASGI a cadeia é assíncrona: sem este modo o Django trocaria de thread a cada requisição
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _initial_state(request):
+        return {'pinned': request.method in WRITE_METHODS or PIN_COOKIE in request.COOKIES, 'wrote': False}
+
+    @staticmethod
+    def _finish(request, state, response):
+        if state['wrote'] and settings.DB_REPLICA_STICKY_SECONDS > 0:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DB_REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax', secure=request.is_secure()
+            )
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self._initial_state(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._finish(request, state, response)
+
+    async def __acall__(self, request):
+        # Views síncronas rodam com uma cópia do contexto, mas o dict de estado é o mesmo
+        state = self._initial_state(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._finish(request, state, response)
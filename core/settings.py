@@ -13,7 +13,8 @@ import os
 from pathlib import Path
 from decouple import config, Csv
 from corsheaders.defaults import default_headers
-from core.database import DATABASES
+from core.database import DATABASES, DATABASE_ROUTERS, REPLICA_WEIGHTS
+from core.cache import CACHES
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -66,6 +67,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.db_router.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,6 +95,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 
 
 # Database
@@ -100,6 +103,16 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = DATABASES
 
+# Leituras vão para as réplicas (DB_REPLICA_<n>_*) quando houver; escritas e o
+# restante da request depois delas ficam no primário
+DATABASE_ROUTERS = DATABASE_ROUTERS
+DATABASE_REPLICA_WEIGHTS = REPLICA_WEIGHTS
+# Janela em que o cliente continua lendo do primário após uma escrita (atraso da réplica)
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=5, cast=int)
+# Réplica que falhar no teste de conexão fica fora do rodízio por este tempo
+DB_REPLICA_EJECT_SECONDS = config('DB_REPLICA_EJECT_SECONDS', default=30, cast=float)
+DB_REPLICA_HEALTH_INTERVAL = config('DB_REPLICA_HEALTH_INTERVAL', default=10, cast=float)
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -108,9 +121,25 @@ DATABASES = DATABASES
 # }
 
 
+# Cache
+# L1 LRU em memória do processo na frente de um L2 compartilhado no Redis
+# (CACHE_REDIS_URL; sem ele, LocMemCache por processo); ver core/cache.py e
+# core/tiered_cache.py
+
+CACHES = CACHES
+# Prazo da reserva de recálculo (single-flight) de get_or_compute/cache_response
+CACHE_SINGLE_FLIGHT_TIMEOUT = config('CACHE_SINGLE_FLIGHT_TIMEOUT', default=10, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# Login por e-mail usa a busca indexada por LOWER(email); o ModelBackend atende o admin
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -176,6 +205,17 @@ CELERY_TIMEZONE = 'UTC'
 CELERY_RESULT_BACKEND_ALWAYS_RETRY = True
 CELERY_RESULT_BACKEND_MAX_RETRIES = 3
 
+CELERY_BEAT_SCHEDULE = {
+    'collect-attachment-spool': {
+        'task': 'services.tasks.email_tasks.collect_attachment_spool',
+        'schedule': 3600.0,
+    },
+    'purge-expired-auth-tokens': {
+        'task': 'authentication.tasks.purge_expired_tokens_task',
+        'schedule': config('AUTH_TOKEN_PURGE_INTERVAL', default=900.0, cast=float),
+    },
+}
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
@@ -186,6 +226,105 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 EMAIL_TIMEOUT = 30
 
+# Pool de conexões SMTP persistentes por processo worker
+EMAIL_POOL_ENABLED = config('EMAIL_POOL_ENABLED', default=True, cast=bool)
+EMAIL_POOL_IDLE_TIMEOUT = config('EMAIL_POOL_IDLE_TIMEOUT', default=60, cast=int)
+EMAIL_POOL_HEALTH_CHECK_INTERVAL = config('EMAIL_POOL_HEALTH_CHECK_INTERVAL', default=10, cast=int)
+EMAIL_POOL_MAX_IDLE = config('EMAIL_POOL_MAX_IDLE', default=2, cast=int)
+
+# Envio em lote (EmailService.send_many / send_bulk_email_task)
+EMAIL_BULK_CHUNK_SIZE = config('EMAIL_BULK_CHUNK_SIZE', default=100, cast=int)
+
+# Roteamento entre provedores (services.EmailProvider) com failover
+EMAIL_PROVIDER_CACHE_TTL = config('EMAIL_PROVIDER_CACHE_TTL', default=60, cast=int)
+EMAIL_PROVIDER_TIMEOUT = config('EMAIL_PROVIDER_TIMEOUT', default=10, cast=int)
+EMAIL_PROVIDER_SLOW_THRESHOLD = config('EMAIL_PROVIDER_SLOW_THRESHOLD', default=5.0, cast=float)
+EMAIL_PROVIDER_COOLDOWN = config('EMAIL_PROVIDER_COOLDOWN', default=60, cast=int)
+
+# Motor de entrega: 'sync' (uma mensagem por vez) ou 'async' (sessões SMTP concorrentes via asyncio)
+EMAIL_DELIVERY_ENGINE = config('EMAIL_DELIVERY_ENGINE', default='sync')
+EMAIL_ASYNC_CONCURRENCY = config('EMAIL_ASYNC_CONCURRENCY', default=10, cast=int)
+
+# Limitador de taxa adaptativo (AIMD) por provedor; 0 desativa quando o provedor não define teto.
+# Com EMAIL_RATE_LIMIT_REDIS_URL o bucket é compartilhado por todos os workers. Sem Redis cada
+# processo tem o seu bucket: o teto é dividido por EMAIL_RATE_LIMIT_LOCAL_PROCESSES (informe o
+# total de processos de envio, ex.: concorrência do Celery × instâncias) para não multiplicá-lo.
+EMAIL_RATE_LIMIT_PER_MINUTE = config('EMAIL_RATE_LIMIT_PER_MINUTE', default=0, cast=int)
+EMAIL_RATE_LIMIT_REDIS_URL = config('EMAIL_RATE_LIMIT_REDIS_URL', default='')
+EMAIL_RATE_LIMIT_LOCAL_PROCESSES = config('EMAIL_RATE_LIMIT_LOCAL_PROCESSES', default=1, cast=int)
+EMAIL_RATE_LIMIT_BURST_SECONDS = config('EMAIL_RATE_LIMIT_BURST_SECONDS', default=1.0, cast=float)
+EMAIL_RATE_LIMIT_DECREASE = config('EMAIL_RATE_LIMIT_DECREASE', default=0.7, cast=float)
+EMAIL_RATE_LIMIT_INCREASE = config('EMAIL_RATE_LIMIT_INCREASE', default=0.05, cast=float)
+EMAIL_RATE_LIMIT_MIN_FRACTION = config('EMAIL_RATE_LIMIT_MIN_FRACTION', default=0.05, cast=float)
+
+# Outbox transacional: EmailService grava no banco e o dispatcher publica no broker
+EMAIL_OUTBOX_ENABLED = config('EMAIL_OUTBOX_ENABLED', default=False, cast=bool)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=500, cast=int)
+EMAIL_OUTBOX_MAX_BATCHES = config('EMAIL_OUTBOX_MAX_BATCHES', default=20, cast=int)
+# O dispatcher só entra no Beat com o outbox ligado (sem ele, seria uma query por tick à toa);
+# linhas que sobrarem após desligá-lo podem ser drenadas com `manage.py dispatch_email_outbox`
+if EMAIL_OUTBOX_ENABLED:
+    CELERY_BEAT_SCHEDULE['dispatch-email-outbox'] = {
+        'task': 'services.tasks.outbox_tasks.dispatch_email_outbox',
+        'schedule': config('EMAIL_OUTBOX_DISPATCH_INTERVAL', default=5.0, cast=float),
+    }
+
+# Spool de anexos endereçado por conteúdo (compartilhado entre web e workers)
+EMAIL_ATTACHMENT_SPOOL_ENABLED = config('EMAIL_ATTACHMENT_SPOOL_ENABLED', default=True, cast=bool)
+EMAIL_ATTACHMENT_SPOOL_DIR = config('EMAIL_ATTACHMENT_SPOOL_DIR', default=os.path.join(MEDIA_ROOT, 'email_spool'))
+EMAIL_ATTACHMENT_SPOOL_TTL = config('EMAIL_ATTACHMENT_SPOOL_TTL', default=7 * 24 * 3600, cast=int)
+
+# Janela (segundos) de deduplicação de envios com chave de idempotência
+EMAIL_IDEMPOTENCY_WINDOW = config('EMAIL_IDEMPOTENCY_WINDOW', default=300, cast=int)
+# Alias do cache das reservas; precisa ser compartilhado entre processos (Redis).
+# Padrão: 'default' com CACHE_REDIS_URL, senão vazio (deduplicação desligada)
+EMAIL_IDEMPOTENCY_CACHE_ALIAS = config(
+    'EMAIL_IDEMPOTENCY_CACHE_ALIAS', default='default' if config('CACHE_REDIS_URL', default='') else ''
+)
+
+# Log de entregas (EmailDeliveryLog) gravado em lote pelos workers
+EMAIL_DELIVERY_LOG_ENABLED = config('EMAIL_DELIVERY_LOG_ENABLED', default=True, cast=bool)
+EMAIL_DELIVERY_LOG_BUFFER_SIZE = config('EMAIL_DELIVERY_LOG_BUFFER_SIZE', default=200, cast=int)
+EMAIL_DELIVERY_LOG_FLUSH_INTERVAL = config('EMAIL_DELIVERY_LOG_FLUSH_INTERVAL', default=5.0, cast=float)
+
+# Build de templates de e-mail (CSS inline, minificação, parte texto) por versão;
+# fora da árvore do código, como o spool de anexos
+EMAIL_TEMPLATE_BUILD_ENABLED = config('EMAIL_TEMPLATE_BUILD_ENABLED', default=True, cast=bool)
+EMAIL_TEMPLATE_BUILD_DIR = config('EMAIL_TEMPLATE_BUILD_DIR', default=os.path.join(MEDIA_ROOT, 'email_build'))
+
+# Armazenamento dos códigos OTP de recuperação de senha: 'db' (OtpCode) ou 'cache'.
+# O backend 'cache' exige um cache compartilhado entre os processos (CACHES).
+OTP_STORE_BACKEND = config('OTP_STORE_BACKEND', default='db')
+OTP_CACHE_ALIAS = config('OTP_CACHE_ALIAS', default='default')
+OTP_TTL = config('OTP_TTL', default=600, cast=int)
+
+# Limpeza periódica de OTPs, tokens de redefinição e refresh tokens (outstanding/blacklist) expirados, em blocos de N linhas
+AUTH_TOKEN_PURGE_CHUNK_SIZE = config('AUTH_TOKEN_PURGE_CHUNK_SIZE', default=1000, cast=int)
+
+# Pool limitado para o hashing de senhas nas views assíncronas de autenticação.
+# 0 usa o número de CPUs; acima de CONCURRENCY + QUEUE_DEPTH requisições as views respondem 503.
+AUTH_HASHING_CONCURRENCY = config('AUTH_HASHING_CONCURRENCY', default=0, cast=int)
+AUTH_HASHING_QUEUE_DEPTH = config('AUTH_HASHING_QUEUE_DEPTH', default=32, cast=int)
+
+# Throttles de login/recuperação (janela deslizante): 'local' (memória do processo)
+# ou 'cache' (CACHES compartilhado entre instâncias). Taxas em REST_FRAMEWORK.
+AUTH_THROTTLE_BACKEND = config('AUTH_THROTTLE_BACKEND', default='local')
+AUTH_THROTTLE_CACHE_ALIAS = config('AUTH_THROTTLE_CACHE_ALIAS', default='default')
+
+# Cache local (por processo) do papel do usuário emitido na claim `role` do JWT
+AUTH_ROLE_CACHE_SIZE = config('AUTH_ROLE_CACHE_SIZE', default=10000, cast=int)
+AUTH_ROLE_CACHE_TTL = config('AUTH_ROLE_CACHE_TTL', default=300, cast=int)
+
+# Cache local de usuários autenticados via JWT (CachedJWTAuthentication)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=10000, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=int)
+
+# Blacklist de refresh tokens: filtro de Bloom local + cache (authentication.blacklist)
+AUTH_BLACKLIST_CACHE_ALIAS = config('AUTH_BLACKLIST_CACHE_ALIAS', default='default')
+AUTH_BLACKLIST_BLOOM_CAPACITY = config('AUTH_BLACKLIST_BLOOM_CAPACITY', default=100000, cast=int)
+AUTH_BLACKLIST_BLOOM_ERROR_RATE = config('AUTH_BLACKLIST_BLOOM_ERROR_RATE', default=0.01, cast=float)
+AUTH_BLACKLIST_SYNC_INTERVAL = config('AUTH_BLACKLIST_SYNC_INTERVAL', default=5.0, cast=float)
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -214,9 +353,15 @@ INTERNAL_IPS = ['127.0.0.1']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.jwt_auth.CachedJWTAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': config('THROTTLE_LOGIN_IP', default='30/min'),
+        'login_email': config('THROTTLE_LOGIN_EMAIL', default='10/min'),
+        'recovery_ip': config('THROTTLE_RECOVERY_IP', default='10/min'),
+        'recovery_email': config('THROTTLE_RECOVERY_EMAIL', default='3/min'),
+    },
 }
 
 
@@ -0,0 +1,236 @@
+import asyncio
+import os
+from collections import Counter
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.db import DatabaseError, connection
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import db_router
+from core.cache import get_cache_config
+from core.database import sqlite_config
+from core.tiered_cache import cache_response, invalidate_namespace, namespaced_key
+from core.db_router import PIN_COOKIE, PrimaryPinningMiddleware, PrimaryReplicaRouter, ReplicaSelector, use_primary
+
+
+@override_settings(DB_REPLICA_HEALTH_INTERVAL=3600, DB_REPLICA_EJECT_SECONDS=30)
+class ReplicaSelectorTests(SimpleTestCase):
+    """Round-robin ponderado entre réplicas e ejeção das que falham no teste de conexão."""
+
+    def setUp(self):
+        self.selector = ReplicaSelector({'r1': 3, 'r2': 1, 'desligada': 0})
+
+    def test_weighted_round_robin(self):
+        with mock.patch.object(ReplicaSelector, '_check', return_value=True):
+            picks = [self.selector.pick() for _ in range(8)]
+        self.assertEqual(Counter(picks), {'r1': 6, 'r2': 2})
+        # Suave: a réplica de peso menor não espera as três da maior em sequência
+        self.assertEqual(picks[:4], ['r1', 'r1', 'r2', 'r1'])
+
+    def test_failed_health_check_ejects_replica(self):
+        broken = mock.Mock()
+        broken.ensure_connection.side_effect = DatabaseError("recusada")
+        healthy = mock.Mock()
+        healthy.is_usable.return_value = True
+        with mock.patch.object(db_router, 'connections', {'r1': broken, 'r2': healthy}):
+            self.assertEqual(self.selector.pick(), 'r2')
+            self.assertEqual({self.selector.pick() for _ in range(4)}, {'r2'})
+        broken.close.assert_called_once()
+
+    def test_no_healthy_replica_returns_none(self):
+        self.selector.eject('r1', "teste")
+        self.selector.eject('r2', "teste")
+        self.assertIsNone(self.selector.pick())
+
+
+@override_settings(DATABASE_REPLICA_WEIGHTS={'replica': 1})
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Leituras na réplica até a request gravar; depois, no primário."""
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        patcher = mock.patch.object(self.router.selector, 'pick', return_value='replica')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_go_to_replica_outside_requests(self):
+        self.assertEqual(self.router.db_for_read(None), 'replica')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_write_pins_rest_of_request(self):
+        token = db_router._request_state.set({'pinned': False, 'wrote': False})
+        try:
+            self.assertEqual(self.router.db_for_read(None), 'replica')
+            self.assertEqual(self.router.db_for_write(None), 'default')
+            self.assertEqual(self.router.db_for_read(None), 'default')
+        finally:
+            db_router._request_state.reset(token)
+
+    def test_only_primary_migrates(self):
+        self.assertTrue(self.router.allow_migrate('default', 'authentication'))
+        self.assertFalse(self.router.allow_migrate('replica', 'authentication'))
+
+
+@override_settings(DATABASE_REPLICA_WEIGHTS={'replica': 1}, DB_REPLICA_STICKY_SECONDS=5)
+class PrimaryPinningMiddlewareTests(SimpleTestCase):
+    """Cookie de fixação após escritas, nos modos síncrono e assíncrono."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.reads = []
+
+    def view(self, write):
+        def get_response(request):
+            if write:
+                self.router.db_for_write(None)
+            self.reads.append(db_router.is_pinned())
+            return HttpResponse()
+        return get_response
+
+    def test_write_sets_sticky_cookie(self):
+        response = PrimaryPinningMiddleware(self.view(write=True))(self.factory.get('/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+
+    def test_read_only_request_has_no_cookie(self):
+        response = PrimaryPinningMiddleware(self.view(write=False))(self.factory.get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.reads, [False])
+
+    def test_cookie_pins_following_requests(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        PrimaryPinningMiddleware(self.view(write=False))(request)
+        self.assertEqual(self.reads, [True])
+
+    def test_async_chain(self):
+        sync_view = self.view(write=True)
+
+        async def get_response(request):
+            return sync_view(request)
+
+        middleware = PrimaryPinningMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(self.factory.get('/')))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(db_router.is_pinned())
+
+
+class SqliteConfigTests(SimpleTestCase):
+    """PRAGMAs de concorrência e BEGIN IMMEDIATE gerados a partir do ambiente."""
+
+    def test_tuned_defaults(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            db = sqlite_config('/tmp/x.sqlite3')
+        self.assertEqual(db['NAME'], '/tmp/x.sqlite3')
+        self.assertEqual(db['OPTIONS'], {
+            'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;'
+                            'PRAGMA mmap_size=268435456;PRAGMA cache_size=-64000',
+            'timeout': 5.0,
+            'transaction_mode': 'IMMEDIATE',
+        })
+
+    def test_environment_overrides(self):
+        env = {'DB_SQLITE_SYNCHRONOUS': 'FULL', 'DB_SQLITE_BUSY_TIMEOUT': '10', 'DB_SQLITE_TRANSACTION_MODE': 'DEFERRED'}
+        with mock.patch.dict(os.environ, env, clear=True):
+            options = sqlite_config('/tmp/x.sqlite3')['OPTIONS']
+        self.assertIn('PRAGMA synchronous=FULL', options['init_command'].split(';'))
+        self.assertEqual((options['timeout'], options['transaction_mode']), (10.0, 'DEFERRED'))
+
+    def test_untuned(self):
+        with mock.patch.dict(os.environ, {'DB_SQLITE_TUNED': 'False'}, clear=True):
+            self.assertNotIn('OPTIONS', sqlite_config('/tmp/x.sqlite3'))
+
+
+class SqliteConnectionTests(TestCase):
+    """A conexão de teste executa o init_command: synchronous=NORMAL (1)."""
+
+    def test_pragmas_applied(self):
+        if connection.vendor != 'sqlite' or 'init_command' not in connection.settings_dict['OPTIONS']:
+            self.skipTest("Somente com o SQLite ajustado.")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'tests-cache-response'}})
+class CacheResponseTests(SimpleTestCase):
+    """Respostas GET guardadas por usuário e invalidadas em bloco pelo namespace."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.factory = APIRequestFactory()
+        self.calls = 0
+        self.status = 200
+
+        @api_view(['GET', 'POST'])
+        @permission_classes([AllowAny])
+        @cache_response(timeout=60, namespace='relatorio')
+        def view(request):
+            self.calls += 1
+            return Response({'chamada': self.calls}, status=self.status)
+        self.view = view
+
+    def get(self, path='/relatorio/', user=None):
+        request = self.factory.get(path)
+        force_authenticate(request, user=user or AnonymousUser())
+        return self.view(request)
+
+    def test_get_is_cached_per_path(self):
+        self.assertEqual(self.get().data, {'chamada': 1})
+        self.assertEqual(self.get().data, {'chamada': 1})
+        self.assertEqual(self.get('/relatorio/?pagina=2').data, {'chamada': 2})
+
+    def test_per_user_entries(self):
+        ana, bia = User(pk=1, username='ana'), User(pk=2, username='bia')
+        self.assertEqual(self.get(user=ana).data, {'chamada': 1})
+        self.assertEqual(self.get(user=bia).data, {'chamada': 2})
+        self.assertEqual(self.get(user=ana).data, {'chamada': 1})
+
+    def test_writes_and_errors_are_not_cached(self):
+        self.view(self.factory.post('/relatorio/'))
+        self.view(self.factory.post('/relatorio/'))
+        self.assertEqual(self.calls, 2)
+        self.status = 404
+        self.get()
+        self.assertEqual(self.get().status_code, 404)
+        self.assertEqual(self.calls, 4)
+
+    def test_invalidate_namespace(self):
+        key = namespaced_key('relatorio', 'x')
+        self.get()
+        invalidate_namespace('relatorio')
+        self.assertNotEqual(namespaced_key('relatorio', 'x'), key)
+        self.assertEqual(self.get().data, {'chamada': 2})
+
+
+class CacheConfigTests(SimpleTestCase):
+    """CACHE_BACKEND segue CACHE_REDIS_URL por padrão; só um pedido explícito sem Redis gera aviso."""
+
+    def test_defaults_to_local_without_redis(self):
+        with mock.patch.dict(os.environ, {}, clear=True), self.assertNoLogs('core.cache', 'WARNING'):
+            caches_config = get_cache_config()
+        self.assertEqual(caches_config['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+    def test_defaults_to_tiered_with_redis(self):
+        with mock.patch.dict(os.environ, {'CACHE_REDIS_URL': 'redis://cache:6379/1'}, clear=True):
+            caches_config = get_cache_config()
+        self.assertEqual(caches_config['default']['BACKEND'], 'core.tiered_cache.TieredCache')
+        self.assertEqual(caches_config['shared']['LOCATION'], 'redis://cache:6379/1')
+
+    def test_explicit_tiered_without_redis_warns(self):
+        with mock.patch.dict(os.environ, {'CACHE_BACKEND': 'tiered'}, clear=True), \
+                self.assertLogs('core.cache', 'WARNING'):
+            caches_config = get_cache_config()
+        self.assertNotIn('shared', caches_config)
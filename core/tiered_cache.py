@@ -0,0 +1,401 @@
+import functools
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpRequest
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CacheMetrics:
+    """Contadores por cache: acertos no L1 e no L2, falhas, despejos do L1 e esperas do single-flight."""
+
+    FIELDS = ('l1_hits', 'l2_hits', 'misses', 'l1_evictions', 'sets', 'single_flight_waits', 'recomputes')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def incr(self, name, field, amount=1):
+        with self._lock:
+            counts = self._counts.setdefault(name, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+
+cache_metrics = CacheMetrics()
+
+
+class LocalLRU:
+    """L1: valores serializados em memória do processo, com despejo LRU e TTL por entrada."""
+
+    def __init__(self, name, max_entries):
+        self.name = name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            payload, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, value, ttl):
+        if self.max_entries <= 0 or ttl <= 0:
+            self.delete(key)
+            return
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        evicted = 0
+        with self._lock:
+            self._data[key] = (payload, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            cache_metrics.incr(self.name, 'l1_evictions', evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Um L1 por LOCATION no processo: o CacheHandler cria uma instância do backend por thread
+_l1_stores = {}
+_l1_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    Backend de cache em dois níveis: L1 LRU em memória do processo na frente
+    do cache compartilhado configurado em OPTIONS['L2'] (Redis).
+
+    Leituras consultam o L1 e depois o L2, trazendo o valor para o L1 por no
+    máximo L1_TTL segundos, nunca além do que resta da validade no L2. Escritas, remoções e incrementos vão ao L2 e
+    atualizam ou descartam o L1 deste processo; os demais processos enxergam
+    a mudança quando a entrada do L1 deles expira. Operações atômicas (add,
+    incr, delete) retornam o resultado do L2, então continuam servindo para
+    reservas e consumo único entre processos.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.name = location or 'default'
+        self.l2_alias = options.get('L2', 'shared')
+        self.l1_ttl = float(options.get('L1_TTL', 5.0))
+        with _l1_lock:
+            self.l1 = _l1_stores.get(self.name)
+            if self.l1 is None:
+                self.l1 = _l1_stores[self.name] = LocalLRU(self.name, int(options.get('L1_MAX_ENTRIES', 1000)))
+
+    @property
+    def shared(self):
+        """O cache L2 (instância da thread corrente)."""
+        return caches[self.l2_alias]
+
+    def _version(self, version):
+        return self.version if version is None else version
+
+    def _l1_ttl(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.l1_ttl
+        return min(self.l1_ttl, timeout - time.time())
+
+    def _l2_remaining(self, key, version):
+        """
+        Segundos de validade restantes da chave no L2, para que o L1 não
+        sirva um valor já expirado lá (chaves de vida curta, como reservas e
+        códigos). None quando a chave não expira ou o backend não informa.
+        """
+        shared = self.shared
+        full_key = shared.make_and_validate_key(key, version=self._version(version))
+        backend = getattr(shared, '_cache', None)
+        if hasattr(backend, 'get_client'):
+            # RedisCache: PTTL é -1 sem expiração e -2 se a chave sumiu
+            remaining = backend.get_client(full_key).pttl(full_key)
+            return None if remaining == -1 else max(remaining, 0) / 1000
+        expire_info = getattr(shared, '_expire_info', None)
+        if expire_info is not None:
+            # LocMemCache
+            expires_at = expire_info.get(full_key)
+            return None if expires_at is None else expires_at - time.time()
+        return None
+
+    def _promote(self, key, value, version):
+        remaining = self._l2_remaining(key, version)
+        ttl = self.l1_ttl if remaining is None else min(self.l1_ttl, remaining)
+        self.l1.set(self.make_and_validate_key(key, version=version), value, ttl)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self.l1.get(l1_key)
+        if value is not _MISSING:
+            cache_metrics.incr(self.name, 'l1_hits')
+            return value
+        value = self.shared.get(key, _MISSING, version=self._version(version))
+        if value is _MISSING:
+            cache_metrics.incr(self.name, 'misses')
+            return default
+        cache_metrics.incr(self.name, 'l2_hits')
+        self._promote(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        pending = []
+        for key in keys:
+            value = self.l1.get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                pending.append(key)
+            else:
+                found[key] = value
+        cache_metrics.incr(self.name, 'l1_hits', len(found))
+        if pending:
+            shared = self.shared.get_many(pending, version=self._version(version))
+            for key, value in shared.items():
+                self._promote(key, value, version)
+            cache_metrics.incr(self.name, 'l2_hits', len(shared))
+            cache_metrics.incr(self.name, 'misses', len(pending) - len(shared))
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.shared.set(key, value, timeout=timeout, version=self._version(version))
+        self.l1.set(self.make_and_validate_key(key, version=version), value, self._l1_ttl(timeout))
+        cache_metrics.incr(self.name, 'sets')
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        failed = self.shared.set_many(data, timeout=timeout, version=self._version(version))
+        for key, value in data.items():
+            if key not in failed:
+                self.l1.set(self.make_and_validate_key(key, version=version), value, self._l1_ttl(timeout))
+        cache_metrics.incr(self.name, 'sets', len(data) - len(failed))
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        added = self.shared.add(key, value, timeout=timeout, version=self._version(version))
+        if added:
+            self.l1.set(self.make_and_validate_key(key, version=version), value, self._l1_ttl(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        return self.shared.touch(key, timeout=timeout, version=self._version(version))
+
+    def delete(self, key, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=self._version(version))
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.l1.delete(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=self._version(version))
+
+    def has_key(self, key, version=None):
+        if self.l1.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=self._version(version))
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=self._version(version))
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        if not callable(default):
+            return super().get_or_set(key, default, timeout=timeout, version=version)
+        return get_or_compute(self, key, lambda: (default(), True), timeout=timeout, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.shared.clear()
+
+    def stats(self):
+        return {**cache_metrics.snapshot().get(self.name, {}), 'l1_size': len(self.l1)}
+
+
+def is_shared_cache(cache):
+    """
+    Indica se o cache é visto por todos os processos. LocMemCache (o padrão
+    sem CACHE_REDIS_URL) e DummyCache são por processo; num TieredCache vale
+    o L2.
+    """
+    if isinstance(cache, TieredCache):
+        cache = cache.shared
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+class _Flight:
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _metrics_name(cache):
+    return getattr(cache, 'name', type(cache).__name__)
+
+
+def get_or_compute(cache, key, compute, timeout=DEFAULT_TIMEOUT, version=None, lock_timeout=None):
+    """
+    Lê `key`; na falta, apenas um chamador recalcula (single-flight) e os
+    demais aguardam o valor em vez de recalculá-lo ao mesmo tempo.
+
+    Dentro do processo a exclusão é um lock por chave; entre processos, uma
+    reserva `cache.add` com validade de CACHE_SINGLE_FLIGHT_TIMEOUT segundos.
+    Se o dono da reserva não publicar o valor nesse prazo, o chamador
+    recalcula por conta própria. `compute()` retorna (valor, cacheável); só
+    valores cacheáveis são gravados.
+    """
+    value = cache.get(key, _MISSING, version=version)
+    if value is not _MISSING:
+        return value
+
+    lock_timeout = settings.CACHE_SINGLE_FLIGHT_TIMEOUT if lock_timeout is None else lock_timeout
+    name = _metrics_name(cache)
+    flight_key = (id(cache.__class__), name, cache.make_key(key, version=version))
+    with _flights_lock:
+        flight = _flights.setdefault(flight_key, _Flight())
+        flight.users += 1
+    try:
+        with flight.lock:
+            value = cache.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                cache_metrics.incr(name, 'single_flight_waits')
+                return value
+
+            lock_key = f"{key}:single-flight"
+            if not cache.add(lock_key, 1, timeout=lock_timeout, version=version):
+                # Outro processo está recalculando: espera o valor aparecer no cache
+                cache_metrics.incr(name, 'single_flight_waits')
+                deadline = time.monotonic() + lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = cache.get(key, _MISSING, version=version)
+                    if value is not _MISSING:
+                        return value
+                logger.warning(f"[CACHE] Single-flight de '{key}' expirou; recalculando localmente.")
+                lock_key = None
+
+            try:
+                cache_metrics.incr(name, 'recomputes')
+                value, cacheable = compute()
+                if cacheable:
+                    cache.set(key, value, timeout=timeout, version=version)
+                return value
+            finally:
+                if lock_key is not None:
+                    cache.delete(lock_key, version=version)
+    finally:
+        with _flights_lock:
+            flight.users -= 1
+            if not flight.users:
+                _flights.pop(flight_key, None)
+
+
+def namespace_version(namespace, cache=None):
+    """
+    Versão corrente do namespace. Começa num valor derivado do relógio para
+    que, se a chave de versão for despejada do cache, as entradas antigas não
+    voltem a valer.
+    """
+    cache = cache or caches['default']
+    version_key = f"cache-ns:{namespace}"
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def namespaced_key(namespace, key, cache=None):
+    return f"{namespace}:v{namespace_version(namespace, cache)}:{key}"
+
+
+def invalidate_namespace(namespace, cache=None):
+    """
+    Invalida de uma vez todas as chaves do namespace trocando a versão; as
+    entradas antigas expiram sozinhas. Em outros processos o efeito aparece
+    quando a versão guardada no L1 deles expira (CACHE_L1_TTL).
+    """
+    cache = cache or caches['default']
+    version_key = f"cache-ns:{namespace}"
+    try:
+        return cache.incr(version_key)
+    except ValueError:
+        cache.add(version_key, time.time_ns() // 1000, timeout=None)
+        return cache.get(version_key)
+
+
+def cache_response(timeout=DEFAULT_TIMEOUT, namespace=None, per_user=True, alias='default'):
+    """
+    Decorator para views DRF (métodos de APIView ou funções com @api_view):
+    respostas 200 de GET/HEAD são guardadas por `timeout` segundos, com
+    single-flight no recálculo. A chave combina o caminho com a query string
+    e, com `per_user`, o usuário autenticado. `invalidate_namespace(namespace)`
+    descarta todas as respostas guardadas do endpoint.
+    """
+    def decorator(view_func):
+        ns = namespace or f"{view_func.__module__}.{view_func.__qualname__}"
+
+        @functools.wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(*args, **kwargs)
+
+            cache = caches[alias]
+            user = getattr(request, 'user', None)
+            owner = user.pk if per_user and user is not None and user.is_authenticated else 'anon'
+            digest = hashlib.sha256(f"{owner}:{request.get_full_path()}".encode()).hexdigest()
+            key = f"drf:{namespaced_key(ns, digest, cache)}"
+
+            def compute():
+                response = view_func(*args, **kwargs)
+                if response.status_code == 200 and isinstance(response, Response):
+                    return response.data, True
+                return response, False
+
+            result = get_or_compute(cache, key, compute, timeout=timeout)
+            return result if hasattr(result, 'status_code') else Response(result)
+        return wrapper
+    return decorator
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from services.views.email_test_view import testar_template_email_api_view
+from core.views import health, cache_stats
 
 
 # Tratamento de erro 404 customizado
@@ -13,8 +14,9 @@ handler404 = 'core.views.custom_404'
 
 urlpatterns = [
     path('', lambda r: HttpResponse("API Alvelos ativa")),
-    path('health/', lambda r: JsonResponse({"status": "ok"})),
+    path('health/', health),
     path('api/version/', lambda r: JsonResponse({"version": "1.0.0"})),
+    path('api/cache/stats/', cache_stats, name='cache-stats'),
 
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -1,4 +1,27 @@
+from django.core.cache import caches
+from django.http import JsonResponse
 from django.shortcuts import render
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from core.tiered_cache import TieredCache, cache_metrics
 
 def custom_404(request, exception):
     return render(request, 'errors/404.html', status=404)
+
+
+async def health(request):
+    """Health check assíncrono: não depende de threads ocupadas por outras views."""
+    return JsonResponse({"status": "ok"})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Contadores de acerto/falha/despejo do cache neste processo e tamanho dos L1."""
+    l1_size = {}
+    for alias in caches:
+        if isinstance(caches[alias], TieredCache):
+            l1_size[alias] = len(caches[alias].l1)
+    return Response({"metrics": cache_metrics.snapshot(), "l1_size": l1_size})
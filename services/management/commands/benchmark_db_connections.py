@@ -0,0 +1,76 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+from core.database import _pool_available
+
+BENCH_ALIAS = 'benchmark_connections'
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a latência por requisição simulada (request_started → consultas → "
+        "request_finished) com conexão nova a cada requisição, com conexões "
+        "persistentes e, no PostgreSQL com psycopg_pool, com o pool nativo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requisições por cenário.")
+        parser.add_argument('--queries', type=int, default=3, help="Consultas por requisição.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Alias do banco usado como base.")
+
+    def handle(self, *args, **options):
+        base = connections[options['database']].settings_dict
+        scenarios = [
+            ("sem persistência", {'CONN_MAX_AGE': 0}),
+            ("persistente", {'CONN_MAX_AGE': 600}),
+        ]
+        if base['ENGINE'] == 'django.db.backends.postgresql' and _pool_available():
+            pool = base['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': 4}
+            scenarios.append(("pool psycopg", {'CONN_MAX_AGE': 0, 'OPTIONS': {**base['OPTIONS'], 'pool': pool}}))
+
+        for label, overrides in scenarios:
+            options_dict = {**base['OPTIONS']}
+            options_dict.pop('pool', None)
+            self._run(label, {**base, 'OPTIONS': options_dict, **overrides}, options['requests'], options['queries'])
+
+    def _run(self, label, settings_dict, total, queries):
+        # Alias próprio: o ciclo de close_old_connections é o real, sem mexer no 'default'
+        connections.settings[BENCH_ALIAS] = settings_dict
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection.alias == BENCH_ALIAS:
+                opened.append(connection)
+
+        connection_created.connect(count)
+        samples = []
+        try:
+            for _ in range(total):
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                with connections[BENCH_ALIAS].cursor() as cursor:
+                    for _ in range(queries):
+                        cursor.execute("SELECT 1")
+                        cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+                samples.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection_created.disconnect(count)
+            connection = connections[BENCH_ALIAS]
+            connection.close()
+            if hasattr(connection, 'close_pool'):
+                connection.close_pool()
+            del connections[BENCH_ALIAS]
+            del connections.settings[BENCH_ALIAS]
+
+        samples.sort()
+        self.stdout.write(
+            f"{label:>16}: p50={statistics.median(samples):.3f}ms "
+            f"p95={samples[int(len(samples) * 0.95) - 1]:.3f}ms "
+            f"média={statistics.fmean(samples):.3f}ms, {len(opened)} conexão(ões) aberta(s)"
+        )
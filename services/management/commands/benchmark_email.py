@@ -0,0 +1,80 @@
+import time
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from services.management.commands._smtp_sink import SMTPSink
+from services.utils.emails.async_engine import AsyncDeliveryEngine
+from services.utils.emails.smtp_pool import SMTPConnectionPool
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede mensagens/segundo contra um sink SMTP local: sem pool, com pool "
+        "de conexões e com o motor assíncrono."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help="Quantidade de mensagens por cenário.")
+        parser.add_argument('--connect-delay', type=float, default=0.05,
+                            help="Atraso simulado de handshake (TCP+TLS+AUTH) em segundos.")
+        parser.add_argument('--message-delay', type=float, default=0.01,
+                            help="Atraso simulado do servidor por mensagem (após DATA) em segundos.")
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help="Sessões SMTP simultâneas do motor assíncrono.")
+
+    def handle(self, *args, **options):
+        total = options['messages']
+
+        with SMTPSink(connect_delay=options['connect_delay'], message_delay=options['message_delay']) as sink:
+            params = {
+                'backend': 'django.core.mail.backends.smtp.EmailBackend',
+                'host': '127.0.0.1',
+                'port': sink.port,
+                'username': '',
+                'password': '',
+                'use_tls': False,
+                'use_ssl': False,
+            }
+
+            pool = SMTPConnectionPool()
+            for label, send in (
+                ("sem pool", self._sender_without_pool(params)),
+                ("com pool", self._sender_with_pool(pool, params)),
+            ):
+                start = time.perf_counter()
+                for i in range(total):
+                    send(self._build_message(i))
+                self._report(label, total, time.perf_counter() - start)
+            pool.close_all()
+
+            engine = AsyncDeliveryEngine(concurrency=options['concurrency'])
+            messages = [(i, self._build_message(i)) for i in range(total)]
+            start = time.perf_counter()
+            failed = engine.send_chunk(messages, params)
+            self._report(f"async x{options['concurrency']}", total - len(failed), time.perf_counter() - start)
+
+    def _report(self, label, total, elapsed):
+        self.stdout.write(f"{label:>10}: {total} mensagens em {elapsed:.2f}s → {total / elapsed:.1f} msg/s")
+
+    @staticmethod
+    def _build_message(i):
+        return EmailMessage(
+            subject=f"Benchmark {i}",
+            body="<p>benchmark</p>",
+            from_email="bench@example.com",
+            to=[f"user{i}@example.com"],
+        )
+
+    @staticmethod
+    def _sender_without_pool(params):
+        def send(message):
+            message.connection = get_connection(fail_silently=False, **params)
+            message.send()
+        return send
+
+    @staticmethod
+    def _sender_with_pool(pool, params):
+        def send(message):
+            pool.send_messages([message], **params)
+        return send
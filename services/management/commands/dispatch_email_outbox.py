@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.tasks.outbox_tasks import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Drena o outbox de e-mails publicando as tarefas pendentes no broker em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Tarefas publicadas por lote.")
+        parser.add_argument('--watch', type=float, default=None,
+                            help="Executa continuamente, aguardando N segundos entre as drenagens.")
+
+    def handle(self, *args, **options):
+        while True:
+            published = drain_outbox(batch_size=options['batch_size'])
+            self.stdout.write(f"{published} e-mail(s) publicados.")
+            if options['watch'] is None:
+                return
+            time.sleep(options['watch'])
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.celery import app
+
+
+class Command(BaseCommand):
+    help = ("Mostra, por worker, a taxa AIMD atual de cada provedor, a concorrência "
+            "e os percentis de espera na fila do limitador.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=2.0, help="Segundos aguardando as respostas dos workers.")
+        parser.add_argument('--json', action='store_true', help="Imprime as respostas em JSON.")
+
+    def handle(self, *args, **options):
+        replies = app.control.broadcast('email_rate_limits', reply=True, timeout=options['timeout'])
+        if not replies:
+            raise CommandError("Nenhum worker respondeu.")
+        workers = {hostname: stats for reply in replies for hostname, stats in reply.items()}
+        if options['json']:
+            self.stdout.write(json.dumps(workers, indent=2))
+            return
+        for hostname, limiters in sorted(workers.items()):
+            self.stdout.write(hostname)
+            if not limiters:
+                self.stdout.write("  nenhum envio com limite de taxa desde o início do worker.")
+            for stats in limiters:
+                wait = stats['wait_ms']
+                self.stdout.write(
+                    f"  {stats['key']}: {stats['rate']:.2f}/{stats['ceiling']:.2f} msg/s, "
+                    f"concorrência {stats['concurrency']}, espera p50 {wait['p50']:.0f} ms, "
+                    f"p99 {wait['p99']:.0f} ms ({wait['count']} amostras)"
+                )
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_alter_emailprovider_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=255, verbose_name='Tarefa')),
+                ('payload', models.JSONField(verbose_name='Argumentos')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'E-mail Pendente (Outbox)',
+                'verbose_name_plural': 'E-mails Pendentes (Outbox)',
+                'ordering': ['id'],
+            },
+        ),
+    ]
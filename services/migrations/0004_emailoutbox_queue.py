@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='queue',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='Fila'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_emailoutbox_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailprovider',
+            name='delivery_engine',
+            field=models.CharField(blank=True, choices=[('', 'Padrão do sistema'), ('sync', 'Síncrono'), ('async', 'Assíncrono (asyncio)')], default='', max_length=10, verbose_name='Motor de Entrega'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_emailprovider_delivery_engine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailprovider',
+            name='max_rate_per_minute',
+            field=models.PositiveIntegerField(blank=True, help_text='Teto do limitador adaptativo. Vazio usa EMAIL_RATE_LIMIT_PER_MINUTE.', null=True, verbose_name='Limite de envios por minuto'),
+        ),
+    ]
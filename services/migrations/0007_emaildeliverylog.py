@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_emailprovider_max_rate_per_minute'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailDeliveryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254, verbose_name='Destinatário')),
+                ('subject', models.CharField(blank=True, default='', max_length=255, verbose_name='Assunto')),
+                ('template_name', models.CharField(blank=True, default='', max_length=255, verbose_name='Template')),
+                ('provider', models.CharField(blank=True, default='', max_length=100, verbose_name='Provedor')),
+                ('status', models.CharField(choices=[('sent', 'Enviado'), ('failed', 'Falhou')], max_length=10, verbose_name='Status')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Erro')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data do envio')),
+            ],
+            options={
+                'verbose_name': 'Log de Entrega de E-mail',
+                'verbose_name_plural': 'Logs de Entrega de E-mail',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['recipient', '-created_at'], name='email_log_recipient_idx'), models.Index(fields=['created_at'], name='email_log_created_idx')],
+            },
+        ),
+    ]
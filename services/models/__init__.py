@@ -1 +1,3 @@
-from .email_model import *
\ No newline at end of file
+from .email_model import *
+from .outbox_model import *
+from .delivery_log_model import *
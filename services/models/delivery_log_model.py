@@ -0,0 +1,31 @@
+from django.db import models
+from django.utils import timezone
+
+
+class EmailDeliveryLog(models.Model):
+    """Registro de auditoria de cada e-mail entregue (ou que falhou) pelos workers."""
+    STATUS_CHOICES = [
+        ('sent', 'Enviado'),
+        ('failed', 'Falhou'),
+    ]
+
+    recipient = models.EmailField(verbose_name="Destinatário")
+    subject = models.CharField(max_length=255, blank=True, default='', verbose_name="Assunto")
+    template_name = models.CharField(max_length=255, blank=True, default='', verbose_name="Template")
+    provider = models.CharField(max_length=100, blank=True, default='', verbose_name="Provedor")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name="Status")
+    error = models.TextField(blank=True, default='', verbose_name="Erro")
+    # Momento do envio (não do flush do buffer), por isso não usa auto_now_add
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Data do envio")
+
+    class Meta:
+        verbose_name = "Log de Entrega de E-mail"
+        verbose_name_plural = "Logs de Entrega de E-mail"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='email_log_recipient_idx'),
+            models.Index(fields=['created_at'], name='email_log_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} - {self.status} ({self.created_at:%Y-%m-%d %H:%M})"
@@ -22,6 +22,21 @@ class EmailProvider(models.Model):
     # API Key (Mailgun / SendGrid)
     api_key = models.CharField(max_length=255, blank=True, null=True, verbose_name="API Key")
 
+    ENGINE_CHOICES = [
+        ('', 'Padrão do sistema'),
+        ('sync', 'Síncrono'),
+        ('async', 'Assíncrono (asyncio)'),
+    ]
+    delivery_engine = models.CharField(
+        max_length=10, choices=ENGINE_CHOICES, blank=True, default='',
+        verbose_name="Motor de Entrega"
+    )
+
+    max_rate_per_minute = models.PositiveIntegerField(
+        blank=True, null=True, verbose_name="Limite de envios por minuto",
+        help_text="Teto do limitador adaptativo. Vazio usa EMAIL_RATE_LIMIT_PER_MINUTE."
+    )
+
     is_active = models.BooleanField(default=True, verbose_name="Ativo")
 
     class Meta:
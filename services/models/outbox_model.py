@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class EmailOutbox(models.Model):
+    """Envio de e-mail pendente, gravado na mesma transação de quem o solicitou."""
+    task_name = models.CharField(max_length=255, verbose_name="Tarefa")
+    payload = models.JSONField(verbose_name="Argumentos")
+    queue = models.CharField(max_length=50, blank=True, default='', verbose_name="Fila")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+
+    class Meta:
+        verbose_name = "E-mail Pendente (Outbox)"
+        verbose_name_plural = "E-mails Pendentes (Outbox)"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.task_name} #{self.pk}"
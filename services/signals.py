@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from services.models import EmailProvider
+from services.utils.emails.provider_router import provider_router
+
+
+@receiver([post_save, post_delete], sender=EmailProvider)
+def invalidate_provider_cache(sender, **kwargs):
+    """Descarta o snapshot de provedores quando a tabela muda."""
+    provider_router.invalidate()
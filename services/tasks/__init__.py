@@ -0,0 +1,2 @@
+from .email_tasks import *
+from .outbox_tasks import *
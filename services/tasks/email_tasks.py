@@ -1,27 +1,237 @@
+import logging
+import smtplib
+import time
 from celery import shared_task
-from django.core.mail import EmailMessage
-from django.template.loader import render_to_string
+from celery.worker.control import inspect_command
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
 from django.conf import settings
+from services.utils.emails.smtp_pool import smtp_pool, RECONNECT_ERRORS
+from services.utils.emails.provider_router import provider_router
+from services.utils.emails.metrics import enqueue_to_send
+from services.utils.emails.attachment_spool import AttachmentSpool, load_attachment_content, load_attachments
+from services.utils.emails.template_build import template_builder
+from services.utils.emails.async_engine import async_engine
+from services.utils.emails.rate_limiter import rate_limiters, is_throttle_error
+from services.utils.emails.delivery_log import delivery_log
+from services.utils.emails import idempotency
 
-@shared_task
-def send_email_task(subject, to_email, template_name, context, from_email=None, cc=None, bcc=None, attachments=None):
+logger = logging.getLogger(__name__)
+
+
+@inspect_command(name='email_rate_limits')
+def email_rate_limits(state):
+    """Taxa AIMD, concorrência e espera na fila dos limitadores deste worker (ver email_rate_stats)."""
+    return rate_limiters.stats()
+
+
+def _get_renderer(template_name):
     """
-    Tarefa Celery para envio de e-mails em background.
+    Retorna uma função contexto -> (html, texto).
+
+    Usa o template pré-compilado (CSS inline, minificado, parte texto) quando
+    EMAIL_TEMPLATE_BUILD_ENABLED; caso contrário, ou se o build falhar,
+    renderiza o template diretamente sem parte texto.
     """
-    message = render_to_string(template_name, context)
-    
-    email = EmailMessage(
+    if settings.EMAIL_TEMPLATE_BUILD_ENABLED:
+        try:
+            return template_builder.get(template_name).render
+        except Exception as e:
+            logger.warning(f"Falha ao compilar template {template_name}, usando renderização direta: {e}")
+    template = get_template(template_name)
+    return lambda context: (template.render(context), None)
+
+
+def _build_email(subject, body, from_email, to, cc=None, bcc=None, attachments=None, text_body=None):
+    """Monta um e-mail HTML (com alternativa em texto, quando houver) e anexos."""
+    email = EmailMultiAlternatives(
         subject=subject,
-        body=message,
+        body=text_body if text_body is not None else body,
         from_email=from_email or settings.DEFAULT_FROM_EMAIL,
-        to=[to_email] if isinstance(to_email, str) else to_email,
+        to=to,
         cc=cc or [],
         bcc=bcc or []
     )
-    email.content_subtype = "html"
+    if text_body is not None:
+        email.attach_alternative(body, "text/html")
+    else:
+        email.content_subtype = "html"
 
     if attachments:
         for attachment in attachments:
-            email.attach(attachment.get('filename'), attachment.get('content'), attachment.get('mimetype'))
+            email.attach(attachment.get('filename'), load_attachment_content(attachment), attachment.get('mimetype'))
+
+    return email
+
+
+def _record_latency(task):
+    """Registra a latência entre o enfileiramento (header enqueued_at) e o envio."""
+    enqueued_at = task.request.get('enqueued_at')
+    if enqueued_at is None:
+        return
+    queue = (task.request.delivery_info or {}).get('routing_key') or 'desconhecida'
+    enqueue_to_send.record(queue, (time.time() - enqueued_at) * 1000)
+
+
+@shared_task(bind=True)
+def send_email_task(self, subject, to_email, template_name, context, from_email=None, cc=None, bcc=None,
+                    attachments=None, idempotency_key=None):
+    """
+    Tarefa Celery para envio de e-mails em background.
+
+    Com `idempotency_key`, reentregas e retries da mesma mensagem dentro da
+    janela de deduplicação não geram um segundo envio.
+    """
+    if idempotency_key is not None and not idempotency.claim('deliver', template_name, to_email, idempotency_key):
+        logger.info(f"Entrega duplicada ignorada: para {to_email} usando template {template_name}.")
+        return
+
+    try:
+        message, text_message = _get_renderer(template_name)(context)
+
+        email = _build_email(
+            subject,
+            message,
+            from_email,
+            [to_email] if isinstance(to_email, str) else to_email,
+            cc,
+            bcc,
+            attachments,
+            text_message
+        )
+    except Exception:
+        if idempotency_key is not None:
+            idempotency.release('deliver', template_name, to_email, idempotency_key)
+        raise
+
+    try:
+        provider = provider_router.send_messages([email])
+    except Exception as e:
+        delivery_log.record(email.recipients(), 'failed', subject, template_name, error=e)
+        if idempotency_key is not None:
+            idempotency.release('deliver', template_name, to_email, idempotency_key)
+        raise
+    delivery_log.record(email.recipients(), 'sent', subject, template_name, provider.name)
+    _record_latency(self)
 
-    email.send()
\ No newline at end of file
+
+def _send_chunk(messages, provider):
+    """
+    Envia as mensagens de um lote numa única sessão SMTP do provedor.
+
+    Retorna os destinatários que falharam; se a sessão cair, os restantes
+    são marcados como falhos sem novas tentativas nesta execução.
+    """
+    failed = []
+    limiter = rate_limiters.get(provider)
+    provider_router.prepare_messages([message for _, message in messages], provider)
+    pooled = smtp_pool.acquire(**provider.params) if settings.EMAIL_POOL_ENABLED else None
+    connection = pooled.backend if pooled else get_connection(fail_silently=False, **provider.params)
+    session_lost = False
+    try:
+        connection.open()
+    except (smtplib.SMTPException, OSError) as e:
+        logger.warning(f"Não foi possível abrir sessão SMTP para o lote: {e}")
+        session_lost = True
+        failed = [recipient for recipient, _ in messages]
+    else:
+        for recipient, message in messages:
+            if session_lost:
+                failed.append(recipient)
+                continue
+            if limiter:
+                limiter.acquire()
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                # Throttling (SMTPResponseException 421/45x) é avaliado antes da perda de
+                # sessão: reduz a taxa do limitador e só este destinatário é reenviado
+                if is_throttle_error(e):
+                    logger.warning(f"Provedor limitou o envio em lote para {recipient['email']}: {e}")
+                    if limiter:
+                        limiter.on_throttle()
+                elif isinstance(e, RECONNECT_ERRORS):
+                    logger.warning(f"Sessão SMTP perdida durante envio em lote: {e}")
+                    session_lost = True
+                else:
+                    # Falha só deste destinatário (recusa, erro no DATA): a sessão segue para os demais
+                    logger.warning(f"Falha ao enviar e-mail em lote para {recipient['email']}: {e}")
+                failed.append(recipient)
+            else:
+                if limiter:
+                    limiter.on_success()
+    finally:
+        if pooled and not session_lost:
+            smtp_pool.release(pooled, **provider.params)
+        else:
+            connection.close()
+
+    if session_lost:
+        provider_router.mark_failure(provider, "sessão SMTP perdida durante o lote")
+    return failed
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_bulk_email_task(self, subject, recipients, template_name, context, from_email=None, attachments=None):
+    """
+    Tarefa Celery para envio em lote: o template é carregado uma vez por lote
+    e cada destinatário recebe o contexto compartilhado mesclado ao seu próprio.
+
+    `recipients` é uma lista de dicionários {"email": ..., "context": {...}}.
+    Apenas os destinatários que falharam são reenviados nas novas tentativas.
+    """
+    render = _get_renderer(template_name)
+    context = context or {}
+    # Bytes só para montar as mensagens; o retry volta ao broker apenas com as referências
+    loaded_attachments = load_attachments(attachments)
+
+    messages = []
+    for recipient in recipients:
+        message, text_message = render({**context, **(recipient.get('context') or {})})
+        messages.append((
+            recipient,
+            _build_email(
+                subject,
+                message,
+                from_email,
+                [recipient['email']],
+                attachments=loaded_attachments,
+                text_body=text_message
+            )
+        ))
+
+    provider = provider_router.pick()
+    if provider.engine == 'async':
+        provider_router.prepare_messages([message for _, message in messages], provider)
+        failed = async_engine.send_chunk(messages, provider.params, rate_limiters.get(provider))
+        if len(failed) == len(messages):
+            provider_router.mark_failure(provider, "todas as mensagens do lote falharam")
+    else:
+        failed = _send_chunk(messages, provider)
+    _record_latency(self)
+
+    failed_emails = {recipient['email'] for recipient in failed}
+    delivery_log.record(
+        [recipient['email'] for recipient in recipients if recipient['email'] not in failed_emails],
+        'sent', subject, template_name, provider.name
+    )
+    delivery_log.record(failed_emails, 'failed', subject, template_name, provider.name,
+                        error=f"Falha no envio em lote (tentativa {self.request.retries + 1})")
+    if not failed:
+        return {"sent": len(recipients), "failed": 0}
+
+    failed_emails = sorted(failed_emails)
+    if self.request.retries >= self.max_retries:
+        logger.error(f"Envio em lote esgotou as tentativas para {len(failed)} destinatário(s): {failed_emails}")
+        return {"sent": len(recipients) - len(failed), "failed": len(failed)}
+
+    logger.info(f"Reenviando lote apenas para {len(failed)} destinatário(s) com falha: {failed_emails}")
+    raise self.retry(args=(subject, failed, template_name, context, from_email, attachments))
+
+
+@shared_task(ignore_result=True)
+def collect_attachment_spool():
+    """
+    Tarefa periódica (Celery Beat) que remove anexos expirados do spool.
+    """
+    return AttachmentSpool().collect_garbage()
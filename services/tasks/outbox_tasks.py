@@ -0,0 +1,56 @@
+import logging
+from celery import shared_task, current_app
+from django.conf import settings
+from django.db import transaction
+from services.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    """
+    Publica os e-mails pendentes do outbox em lotes.
+
+    Cada lote é travado com SELECT ... FOR UPDATE SKIP LOCKED (quando o banco
+    suporta), publicado reutilizando uma única conexão com o broker e removido
+    na mesma transação. Retorna o total de tarefas publicadas.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_batches = max_batches or settings.EMAIL_OUTBOX_MAX_BATCHES
+    published = 0
+
+    for _ in range(max_batches):
+        with transaction.atomic():
+            rows = list(
+                EmailOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+            if not rows:
+                break
+
+            with current_app.producer_or_acquire() as producer:
+                for row in rows:
+                    current_app.tasks[row.task_name].apply_async(
+                        args=row.payload,
+                        queue=row.queue or None,
+                        producer=producer,
+                        # Latência medida a partir da gravação no outbox, não da publicação
+                        headers={'enqueued_at': row.created_at.timestamp()},
+                    )
+
+            EmailOutbox.objects.filter(id__in=[row.id for row in rows]).delete()
+            published += len(rows)
+
+        if len(rows) < batch_size:
+            break
+
+    if published:
+        logger.info(f"[OUTBOX] {published} e-mail(s) publicados no broker.")
+    return published
+
+
+@shared_task(ignore_result=True)
+def dispatch_email_outbox():
+    """
+    Tarefa periódica (Celery Beat) que drena o outbox de e-mails.
+    """
+    return drain_outbox()
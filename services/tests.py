@@ -0,0 +1,595 @@
+import os
+import shutil
+import smtplib
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.celery import EMAIL_BULK_QUEUE, EMAIL_TRANSACTIONAL_QUEUE, app
+from services.models import EmailDeliveryLog, EmailOutbox
+from services.tasks import email_tasks
+from services.utils.emails.async_engine import AsyncDeliveryEngine
+from services.utils.emails.attachment_spool import AttachmentSpool, load_attachments
+from services.utils.emails.delivery_log import DeliveryLogBuffer
+from services.utils.emails import idempotency
+from services.utils.emails.email_service import EmailService
+from services.utils.emails.provider_router import ProviderConfig, ProviderRouter, is_provider_error
+from services.utils.emails.rate_limiter import (
+    LocalBucketStore,
+    ProviderRateLimiter,
+    RateLimiterRegistry,
+    RedisBucketStore,
+)
+from services.utils.emails.smtp_pool import PooledConnection, SMTPConnectionPool
+from services.utils.emails.template_build import EmailTemplateBuilder, flatten_template, inline_css, minify_html
+
+REDIS_TEST_URL = os.environ.get('EMAIL_RATE_LIMIT_TEST_REDIS_URL', '')
+
+
+class FakeConnection:
+    """Backend SMTP de teste: `errors` mapeia destinatário -> exceção levantada no envio."""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+        self.closed = False
+
+    def open(self):
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.errors.get(message.to[0])
+            if error is not None:
+                raise error
+            self.sent.append(message.to[0])
+        return len(messages)
+
+    def close(self):
+        self.closed = True
+
+
+def _chunk(*emails):
+    return [({'email': email}, SimpleNamespace(to=[email])) for email in emails]
+
+
+@override_settings(EMAIL_POOL_ENABLED=False)
+@mock.patch.object(email_tasks.rate_limiters, 'get', return_value=None)
+@mock.patch.object(email_tasks.provider_router, 'prepare_messages')
+@mock.patch.object(email_tasks.provider_router, 'mark_failure')
+class SendChunkTests(SimpleTestCase):
+    """Erros de um destinatário não derrubam a sessão do lote."""
+
+    provider = SimpleNamespace(params={})
+
+    def test_recipient_error_fails_only_that_recipient(self, mark_failure, *mocks):
+        connection = FakeConnection({
+            'b@example.com': smtplib.SMTPRecipientsRefused({'b@example.com': (550, b'no such user')}),
+            'c@example.com': smtplib.SMTPDataError(554, b'rejected'),
+        })
+        with mock.patch.object(email_tasks, 'get_connection', return_value=connection):
+            failed = email_tasks._send_chunk(_chunk('a@example.com', 'b@example.com', 'c@example.com',
+                                                    'd@example.com'), self.provider)
+
+        self.assertEqual([recipient['email'] for recipient in failed], ['b@example.com', 'c@example.com'])
+        self.assertEqual(connection.sent, ['a@example.com', 'd@example.com'])
+        mark_failure.assert_not_called()
+
+    def test_disconnect_fails_the_rest_of_the_chunk(self, mark_failure, *mocks):
+        connection = FakeConnection({'b@example.com': smtplib.SMTPServerDisconnected('caiu')})
+        with mock.patch.object(email_tasks, 'get_connection', return_value=connection):
+            failed = email_tasks._send_chunk(_chunk('a@example.com', 'b@example.com', 'c@example.com'),
+                                             self.provider)
+
+        self.assertEqual([recipient['email'] for recipient in failed], ['b@example.com', 'c@example.com'])
+        self.assertTrue(connection.closed)
+        mark_failure.assert_called_once()
+
+
+class PooledSendTests(SimpleTestCase):
+    """SMTPConnectionPool.send_messages só reconecta quando a sessão caiu."""
+
+    def _pool(self, *connections):
+        pool = SMTPConnectionPool(idle_timeout=60, health_check_interval=60, max_idle=2)
+        opened = iter(connections)
+        pool._open = lambda params: PooledConnection(next(opened))
+        return pool
+
+    def test_permanent_error_is_not_retried(self):
+        refused = smtplib.SMTPRecipientsRefused({'x@example.com': (550, b'no such user')})
+        connection = FakeConnection({'x@example.com': refused})
+        pool = self._pool(connection)
+
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            pool.send_messages([SimpleNamespace(to=['x@example.com'])])
+        # A sessão continua boa: volta ao pool em vez de ser fechada
+        self.assertFalse(connection.closed)
+        self.assertIs(pool.acquire().backend, connection)
+
+    def test_disconnect_is_retried_on_a_new_connection(self):
+        broken = FakeConnection({'x@example.com': smtplib.SMTPServerDisconnected('caiu')})
+        fresh = FakeConnection()
+        pool = self._pool(broken, fresh)
+
+        pool.send_messages([SimpleNamespace(to=['x@example.com'])])
+        self.assertTrue(broken.closed)
+        self.assertEqual(fresh.sent, ['x@example.com'])
+
+
+class BucketStoreContract:
+    """Semântica comum dos buckets: o script Lua do Redis deve se comportar como o store local."""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+        self.key = f"email-rate:test-{self.id()}"
+
+    def test_burst_then_wait(self):
+        # 10 msg/s com 1s de rajada: 10 tokens disponíveis, o 11º espera ~0,1s
+        for _ in range(10):
+            wait, rate = self.store.take(self.key, 10.0, 1.0, 1)
+            self.assertEqual(wait, 0.0)
+            self.assertEqual(rate, 10.0)
+        wait, _ = self.store.take(self.key, 10.0, 1.0, 1)
+        self.assertAlmostEqual(wait, 0.1, delta=0.02)
+
+    def test_adjust_is_clamped(self):
+        self.assertAlmostEqual(self.store.adjust(self.key, 10.0, 0.5, 0.0, 1.0, 10.0), 5.0)
+        self.assertAlmostEqual(self.store.adjust(self.key, 10.0, 0.1, 0.0, 1.0, 10.0), 1.0)
+        self.assertAlmostEqual(self.store.adjust(self.key, 10.0, 1.0, 50.0, 1.0, 10.0), 10.0)
+        # A taxa ajustada passa a valer para o bucket
+        self.store.adjust(self.key, 10.0, 0.5, 0.0, 1.0, 10.0)
+        self.assertEqual(self.store.take(self.key, 10.0, 1.0, 1)[1], 5.0)
+
+
+class LocalBucketStoreTests(BucketStoreContract, SimpleTestCase):
+    def make_store(self):
+        return LocalBucketStore()
+
+
+@skipUnless(REDIS_TEST_URL, "defina EMAIL_RATE_LIMIT_TEST_REDIS_URL para testar o script Lua no Redis")
+class RedisBucketStoreTests(BucketStoreContract, SimpleTestCase):
+    def make_store(self):
+        return RedisBucketStore(REDIS_TEST_URL)
+
+    def tearDown(self):
+        self.store.client.delete(self.key)
+
+
+@override_settings(EMAIL_RATE_LIMIT_DECREASE=0.5, EMAIL_RATE_LIMIT_MIN_FRACTION=0.1, EMAIL_ASYNC_CONCURRENCY=4,
+                   EMAIL_RATE_LIMIT_INCREASE=0.05, EMAIL_RATE_LIMIT_BURST_SECONDS=1.0, EMAIL_POOL_ENABLED=False)
+class RateLimiterBackoffTests(SimpleTestCase):
+    """Resposta 421 do provedor reduz a taxa (AIMD) sem derrubar a sessão do lote."""
+
+    def setUp(self):
+        self.limiter = ProviderRateLimiter('email-rate:backoff', 10.0, LocalBucketStore())
+
+    def test_421_in_bulk_send_backs_off(self):
+        connection = FakeConnection({'b@example.com': smtplib.SMTPDataError(421, b'too many messages')})
+        with mock.patch.object(email_tasks.rate_limiters, 'get', return_value=self.limiter), \
+                mock.patch.object(email_tasks.provider_router, 'prepare_messages'), \
+                mock.patch.object(email_tasks.provider_router, 'mark_failure') as mark_failure, \
+                mock.patch.object(email_tasks, 'get_connection', return_value=connection):
+            failed = email_tasks._send_chunk(_chunk('a@example.com', 'b@example.com', 'c@example.com'),
+                                             SimpleNamespace(params={}))
+
+        self.assertEqual([recipient['email'] for recipient in failed], ['b@example.com'])
+        self.assertEqual(connection.sent, ['a@example.com', 'c@example.com'])
+        self.assertAlmostEqual(self.limiter.rate, 5.0, delta=0.5)
+        self.assertLess(self.limiter.concurrency, 4.0)
+        mark_failure.assert_not_called()
+
+    def test_rate_recovers_additively_and_never_exceeds_ceiling(self):
+        self.limiter.on_throttle()
+        throttled = self.limiter.rate
+        self.limiter.on_success(10)
+        self.assertGreater(self.limiter.rate, throttled)
+        for _ in range(100):
+            self.limiter.on_success(10)
+        self.assertEqual(self.limiter.rate, 10.0)
+
+    def test_successful_sends_grow_rate_back_after_421(self):
+        def send(*emails, errors=None):
+            connection = FakeConnection(errors or {})
+            with mock.patch.object(email_tasks.rate_limiters, 'get', return_value=self.limiter), \
+                    mock.patch.object(email_tasks.provider_router, 'prepare_messages'), \
+                    mock.patch.object(email_tasks, 'get_connection', return_value=connection), \
+                    mock.patch.object(self.limiter, 'acquire'):
+                return email_tasks._send_chunk(_chunk(*emails), SimpleNamespace(params={}))
+
+        send('a@example.com', errors={'a@example.com': smtplib.SMTPDataError(421, b'slow down')})
+        throttled = self.limiter.rate
+        self.assertAlmostEqual(throttled, 5.0, delta=0.5)
+
+        self.assertEqual(send('b@example.com', 'c@example.com'), [])
+        self.assertGreater(self.limiter.rate, throttled)
+        self.assertLessEqual(self.limiter.rate, self.limiter.ceiling)
+
+    def test_worker_control_command_reports_registry_stats(self):
+        registry = RateLimiterRegistry()
+        registry._limiters[self.limiter.key] = self.limiter
+        self.limiter.on_throttle()
+        with mock.patch.object(email_tasks, 'rate_limiters', registry):
+            [stats] = email_tasks.email_rate_limits(None)
+        self.assertEqual(stats['key'], 'email-rate:backoff')
+        self.assertAlmostEqual(stats['rate'], 5.0, delta=0.5)
+        self.assertEqual(stats['ceiling'], 10.0)
+
+    def test_stats_command_prints_worker_rates(self):
+        reply = [{'celery@bulk': [self.limiter.stats()]}]
+        out = StringIO()
+        with mock.patch('services.management.commands.email_rate_stats.app.control.broadcast',
+                        return_value=reply) as broadcast:
+            call_command('email_rate_stats', stdout=out)
+        broadcast.assert_called_once_with('email_rate_limits', reply=True, timeout=2.0)
+        self.assertIn('celery@bulk', out.getvalue())
+        self.assertIn('email-rate:backoff: 10.00/10.00 msg/s', out.getvalue())
+
+    def test_stats_command_fails_without_workers(self):
+        with mock.patch('services.management.commands.email_rate_stats.app.control.broadcast', return_value=[]):
+            with self.assertRaises(CommandError):
+                call_command('email_rate_stats')
+
+    @override_settings(EMAIL_RATE_LIMIT_PER_MINUTE=600, EMAIL_RATE_LIMIT_REDIS_URL='', EMAIL_RATE_LIMIT_LOCAL_PROCESSES=4)
+    def test_local_ceiling_is_split_across_processes(self):
+        registry = RateLimiterRegistry()
+        limiter = registry.get(SimpleNamespace(id=None, max_rate_per_minute=None))
+        self.assertEqual(limiter.ceiling, 2.5)
+
+
+@override_settings(DEFAULT_FROM_EMAIL='noreply@example.com', EMAIL_PROVIDER_COOLDOWN=60,
+                   EMAIL_PROVIDER_SLOW_THRESHOLD=5.0)
+class ProviderFailoverTests(SimpleTestCase):
+    """Failover reaplica o remetente por provedor e só ejeta em falhas do provedor."""
+
+    def setUp(self):
+        self.router = ProviderRouter()
+        self.primary = ProviderConfig(1, 'a', 'smtp', 'a@provider-a.com', {})
+        self.secondary = ProviderConfig(2, 'b', 'smtp', None, {})
+        self.router.candidates = lambda: [self.primary, self.secondary]
+        self.message = SimpleNamespace(from_email='noreply@example.com', to=['x@example.com'])
+
+    def test_failover_restores_requested_sender(self):
+        senders = []
+
+        def deliver(messages, provider):
+            senders.append(messages[0].from_email)
+            if provider is self.primary:
+                raise smtplib.SMTPServerDisconnected('caiu')
+
+        with mock.patch.object(ProviderRouter, 'deliver', side_effect=deliver):
+            self.assertIs(self.router.send_messages([self.message]), self.secondary)
+        self.assertEqual(senders, ['a@provider-a.com', 'noreply@example.com'])
+        self.assertIn(self.primary.id, self.router._ejected_until)
+
+    def test_permanent_error_does_not_eject_or_fail_over(self):
+        refused = smtplib.SMTPRecipientsRefused({'x@example.com': (550, b'no such user')})
+        with mock.patch.object(ProviderRouter, 'deliver', side_effect=refused) as deliver:
+            with self.assertRaises(smtplib.SMTPRecipientsRefused):
+                self.router.send_messages([self.message])
+        deliver.assert_called_once()
+        self.assertEqual(self.router._ejected_until, {})
+
+    def test_transient_4xx_fails_over(self):
+        self.assertTrue(is_provider_error(smtplib.SMTPDataError(451, b'try later')))
+        self.assertTrue(is_provider_error(smtplib.SMTPAuthenticationError(535, b'bad credentials')))
+        self.assertFalse(is_provider_error(smtplib.SMTPDataError(554, b'rejected')))
+
+    @mock.patch('services.utils.emails.provider_router.get_connection')
+    @mock.patch('services.utils.emails.async_engine.AsyncDeliveryEngine.send_chunk')
+    @override_settings(EMAIL_POOL_ENABLED=False, EMAIL_RATE_LIMIT_PER_MINUTE=0)
+    def test_single_message_skips_async_engine(self, send_chunk, get_connection):
+        get_connection.return_value = FakeConnection()
+        ProviderRouter.deliver([SimpleNamespace(to=['a@example.com'])], ProviderConfig(
+            None, 'async', 'smtp', None, {}, delivery_engine='async'
+        ))
+        send_chunk.assert_not_called()
+        self.assertEqual(get_connection.return_value.sent, ['a@example.com'])
+
+
+@override_settings(EMAIL_RATE_LIMIT_DECREASE=0.5, EMAIL_RATE_LIMIT_MIN_FRACTION=0.1, EMAIL_ASYNC_CONCURRENCY=2,
+                   EMAIL_RATE_LIMIT_INCREASE=0.05, EMAIL_RATE_LIMIT_BURST_SECONDS=1.0)
+class AsyncDeliveryEngineTests(SimpleTestCase):
+    """Motor assíncrono: falhas por destinatário e recuo da taxa em 421/45x."""
+
+    def send(self, connection, limiter=None):
+        params = {'backend': 'services.tests.FakeConnection'}
+        with mock.patch('services.utils.emails.async_engine.get_connection', return_value=connection):
+            return AsyncDeliveryEngine().send_chunk(_chunk('a@example.com', 'b@example.com', 'c@example.com'),
+                                                    params, limiter)
+
+    def test_partial_failure_returns_only_failed_recipients(self):
+        connection = FakeConnection({'b@example.com': smtplib.SMTPRecipientsRefused({'b@example.com': (550, b'no')})})
+        failed = self.send(connection)
+        self.assertEqual([recipient['email'] for recipient in failed], ['b@example.com'])
+        self.assertEqual(sorted(connection.sent), ['a@example.com', 'c@example.com'])
+
+    def test_throttle_backs_off_rate(self):
+        limiter = ProviderRateLimiter('email-rate:async', 10.0, LocalBucketStore())
+        connection = FakeConnection({'b@example.com': smtplib.SMTPDataError(451, b'slow down')})
+        failed = self.send(connection, limiter)
+        self.assertEqual([recipient['email'] for recipient in failed], ['b@example.com'])
+        # Cortada pela metade no 451; os dois sucessos só a recuperam aditivamente
+        self.assertAlmostEqual(limiter.rate, 5.0, delta=0.5)
+
+
+class TemplateBuildTests(SimpleTestCase):
+    """Achatamento de herança, inlining de CSS por especificidade e minificação."""
+
+    def setUp(self):
+        self.template_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.template_dir)
+        templates = {
+            'base.html': (
+                "<html><head><title>{% block title %}Base{% endblock %}</title></head>"
+                "<body>{% block content %}<p>padrão</p>{% block footer %}rodapé{% endblock %}"
+                "{% endblock %}</body></html>"
+            ),
+            'middle.html': "{% extends 'base.html' %}{% block title %}Meio{% endblock %}",
+            'child.html': (
+                "{% extends 'middle.html' %}{% load static %}"
+                "{% block title %}{{ block.super }} / Filho{% endblock %}"
+                "{% block footer %}<b>{{ nome }}</b>{% endblock %}"
+            ),
+        }
+        for name, source in templates.items():
+            with open(os.path.join(self.template_dir, name), 'w', encoding='utf-8') as f:
+                f.write(source)
+        override = override_settings(TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [self.template_dir],
+        }])
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_flatten_resolves_multilevel_extends_and_block_super(self):
+        source, chain = flatten_template('child.html')
+        self.assertEqual(
+            source,
+            "{% load static %}<html><head><title>Meio / Filho</title></head>"
+            "<body><p>padrão</p><b>{{ nome }}</b></body></html>"
+        )
+        self.assertEqual([os.path.basename(path) for path in chain], ['child.html', 'middle.html', 'base.html'])
+
+    def test_new_build_prunes_superseded_versions(self):
+        build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, build_dir)
+        builder = EmailTemplateBuilder(build_dir)
+        builder.build('middle.html')
+        _, first, _ = builder.build('child.html')
+        child = os.path.join(self.template_dir, 'child.html')
+        os.utime(child, ns=(os.stat(child).st_atime_ns, os.stat(child).st_mtime_ns + 10**9))
+        _, second, built = builder.build('child.html')
+
+        self.assertNotEqual(first, second)
+        files = os.listdir(build_dir)
+        self.assertEqual(len(files), 4)
+        self.assertEqual(sum(second in name for name in files), 2)
+        self.assertFalse(any(first in name for name in files))
+        self.assertIn('<b>Leo</b>', built.render({'nome': 'Leo'})[0])
+
+    def test_inline_css_orders_declarations_by_specificity(self):
+        source = (
+            "<style>#y { color: green } .x { color: blue } p { color: red } "
+            "a:hover { color: pink } @media (max-width: 600px) { p { color: black } }</style>"
+            "<p id=\"y\" class=\"x\" style=\"margin: 0\">oi</p>"
+        )
+        result = inline_css(source)
+        # Menor especificidade primeiro: a última declaração (a mais específica, depois o style original) vence
+        self.assertIn('style="color: red; color: blue; color: green; margin: 0"', result)
+        self.assertIn("<style>a:hover{color: pink}@media (max-width: 600px){p { color: black }}</style>", result)
+
+    def test_inline_css_descendant_selector(self):
+        result = inline_css("<style>td a { color: red }</style><td><a href='#'>x</a></td><a href='#'>y</a>")
+        self.assertEqual(result, '<td><a href="#" style="color: red">x</a></td><a href=\'#\'>y</a>')
+
+    def test_minify_keeps_inline_whitespace(self):
+        self.assertEqual(minify_html("<p><b>Hello</b>\n   <i>World</i></p>"), "<p><b>Hello</b> <i>World</i></p>")
+
+    def test_minify_skips_preformatted_blocks_and_keeps_conditional_comments(self):
+        source = "<div>\n  <!-- nota -->\n  <pre>  a\n    b</pre>\n<!--[if mso]><table></table><![endif]-->\n</div>"
+        self.assertEqual(
+            minify_html(source),
+            "<div><pre>  a\n    b</pre> <!--[if mso]><table></table><![endif]--></div>"
+        )
+
+
+@override_settings(EMAIL_OUTBOX_ENABLED=False)
+@mock.patch('services.tasks.email_tasks.send_email_task.apply_async')
+class EmailServiceEnqueueTests(TestCase):
+    """Sem o outbox, a tarefa só é publicada depois do commit da transação do chamador."""
+
+    def service(self):
+        return EmailService(subject='Oi', to_email='ana@example.com', template_name='emails/recuperar_senha.html')
+
+    def test_publishes_after_commit(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service().send()
+            apply_async.assert_not_called()
+        apply_async.assert_called_once()
+
+    def test_rollback_discards_the_send(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.service().send()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        apply_async.assert_not_called()
+
+
+class EmailQueueRoutingTests(TestCase):
+    """Envios transacionais e campanhas em filas separadas; `priority` escolhe a fila."""
+
+    def service(self, **kwargs):
+        return EmailService(subject='Oi', to_email='ana@example.com', template_name='emails/recuperar_senha.html',
+                            outbox=False, **kwargs)
+
+    def test_task_routes(self):
+        route = app.amqp.router.route
+        self.assertEqual(route({}, email_tasks.send_email_task.name)['queue'].name, EMAIL_TRANSACTIONAL_QUEUE)
+        self.assertEqual(route({}, email_tasks.send_bulk_email_task.name)['queue'].name, EMAIL_BULK_QUEUE)
+
+    @mock.patch('services.tasks.email_tasks.send_email_task.apply_async')
+    def test_send_defaults_to_transactional(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service().send()
+            self.service(priority='bulk').send()
+        self.assertEqual([c.kwargs['queue'] for c in apply_async.call_args_list],
+                         [EMAIL_TRANSACTIONAL_QUEUE, EMAIL_BULK_QUEUE])
+
+    @mock.patch('services.tasks.email_tasks.send_bulk_email_task.apply_async')
+    def test_send_many_defaults_to_bulk(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service().send_many(['a@example.com'])
+            self.service(priority='transactional').send_many(['b@example.com'])
+        self.assertEqual([c.kwargs['queue'] for c in apply_async.call_args_list],
+                         [EMAIL_BULK_QUEUE, EMAIL_TRANSACTIONAL_QUEUE])
+
+    def test_outbox_rows_keep_the_queue(self):
+        EmailService(subject='Oi', to_email='ana@example.com', template_name='emails/recuperar_senha.html',
+                     outbox=True, priority='bulk').send()
+        self.assertEqual(EmailOutbox.objects.get().queue, EMAIL_BULK_QUEUE)
+
+    def test_invalid_priority(self):
+        with self.assertRaises(ValueError):
+            self.service(priority='urgente')
+
+
+@override_settings(EMAIL_DELIVERY_LOG_ENABLED=True)
+class DeliveryLogBufferTests(TestCase):
+    """Auditoria write-behind: grava ao encher o buffer e nunca propaga falhas de gravação."""
+
+    def setUp(self):
+        self.buffer = DeliveryLogBuffer(max_size=3, flush_interval=3600)
+
+    def test_flushes_when_full(self):
+        self.buffer.record(['a@example.com', 'b@example.com'], 'sent', 'Oi', provider='smtp')
+        self.assertEqual(EmailDeliveryLog.objects.count(), 0)
+        self.buffer.record(['c@example.com'], 'failed', 'Oi', error='recusado')
+        self.assertQuerySetEqual(
+            EmailDeliveryLog.objects.order_by('recipient').values_list('recipient', 'status'),
+            [('a@example.com', 'sent'), ('b@example.com', 'sent'), ('c@example.com', 'failed')]
+        )
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flush_error_is_logged_not_raised(self):
+        with mock.patch.object(EmailDeliveryLog.objects, 'bulk_create', side_effect=DatabaseError('fora do ar')), \
+                self.assertLogs('services.utils.emails.delivery_log', 'ERROR') as logs:
+            self.buffer.record(['a@example.com', 'b@example.com', 'c@example.com'], 'sent')
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertIn('Falha ao gravar 3 registro(s)', logs.output[0])
+
+
+class AttachmentSpoolTests(SimpleTestCase):
+    """Spool de anexos: leitura integral e resolução única por lote."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.spool = AttachmentSpool(root=self.root, ttl=60)
+
+    def test_read_round_trip(self):
+        self.assertEqual(self.spool.read(self.spool.store(b'%PDF' * 1000)), b'%PDF' * 1000)
+        self.assertEqual(self.spool.read(self.spool.store(b'')), b'')
+
+    def test_load_attachments_resolves_refs(self):
+        ref = self.spool.store(b'conteudo')
+        attachments = [
+            {'filename': 'a.pdf', 'mimetype': 'application/pdf', 'ref': ref},
+            {'filename': 'b.txt', 'mimetype': 'text/plain', 'content': 'texto'},
+        ]
+        with override_settings(EMAIL_ATTACHMENT_SPOOL_DIR=self.root):
+            loaded = load_attachments(attachments)
+        self.assertEqual(loaded, [
+            {'filename': 'a.pdf', 'mimetype': 'application/pdf', 'content': b'conteudo'},
+            {'filename': 'b.txt', 'mimetype': 'text/plain', 'content': 'texto'},
+        ])
+
+    def test_bulk_retry_carries_only_refs(self):
+        ref = self.spool.store(b'conteudo')
+        attachments = [{'filename': 'a.pdf', 'mimetype': 'application/pdf', 'ref': ref}]
+        recipient = {'email': 'ana@example.com', 'context': {}}
+        provider = SimpleNamespace(name='p', engine='sync')
+        with override_settings(EMAIL_ATTACHMENT_SPOOL_DIR=self.root), \
+                mock.patch.object(email_tasks, '_get_renderer', return_value=lambda context: ('<p>Oi</p>', None)), \
+                mock.patch.object(email_tasks.provider_router, 'pick', return_value=provider), \
+                mock.patch.object(email_tasks, '_send_chunk', return_value=[recipient]), \
+                mock.patch.object(email_tasks, 'delivery_log'), \
+                mock.patch.object(email_tasks.send_bulk_email_task, 'retry', side_effect=RuntimeError) as retry:
+            with self.assertRaises(RuntimeError):
+                email_tasks.send_bulk_email_task.run('Oi', [recipient], 'emails/boas_vindas.html', {}, None, attachments)
+        self.assertEqual(retry.call_args.kwargs['args'][5], attachments)
+
+
+IDEMPOTENCY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'idem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-idem'},
+}
+
+
+@override_settings(CACHES=IDEMPOTENCY_CACHES, EMAIL_IDEMPOTENCY_CACHE_ALIAS='idem', EMAIL_OUTBOX_ENABLED=False)
+@mock.patch.object(idempotency, 'is_shared_cache', return_value=True)
+class IdempotencyTests(TestCase):
+    """Reserva e liberação da chave de idempotência no enfileiramento e na entrega."""
+
+    def setUp(self):
+        caches['idem'].clear()
+
+    def service(self):
+        return EmailService(subject='Oi', to_email='ana@example.com', template_name='emails/recuperar_senha.html')
+
+    @mock.patch('services.tasks.email_tasks.send_email_task.apply_async')
+    def test_duplicate_enqueue_is_dropped(self, apply_async, is_shared):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.service().send(idempotency_key='otp:1'))
+            self.assertFalse(self.service().send(idempotency_key='otp:1'))
+        apply_async.assert_called_once()
+
+    @mock.patch('services.tasks.email_tasks.send_email_task.apply_async', side_effect=ConnectionError('broker'))
+    def test_enqueue_failure_releases_claim(self, apply_async, is_shared):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service().send(idempotency_key='otp:2')
+        self.assertTrue(idempotency.claim('enqueue', 'emails/recuperar_senha.html', ['ana@example.com'], 'otp:2'))
+
+    @mock.patch.object(email_tasks, 'delivery_log')
+    @mock.patch.object(email_tasks, '_get_renderer', return_value=lambda context: ('<p>Oi</p>', None))
+    def test_delivery_failure_releases_claim(self, renderer, delivery_log, is_shared):
+        args = ('Oi', 'ana@example.com', 'emails/recuperar_senha.html', {})
+        with mock.patch.object(email_tasks.provider_router, 'send_messages',
+                               side_effect=smtplib.SMTPServerDisconnected('caiu')) as send_messages:
+            for _ in range(2):
+                with self.assertRaises(smtplib.SMTPServerDisconnected):
+                    email_tasks.send_email_task.run(*args, idempotency_key='otp:3')
+        # A falha liberou a reserva: o retry tenta entregar de novo em vez de ser descartado
+        self.assertEqual(send_messages.call_count, 2)
+
+    @mock.patch.object(email_tasks, '_record_latency')
+    @mock.patch.object(email_tasks, 'delivery_log')
+    @mock.patch.object(email_tasks, '_get_renderer', return_value=lambda context: ('<p>Oi</p>', None))
+    def test_redelivery_after_success_is_dropped(self, renderer, delivery_log, record_latency, is_shared):
+        args = ('Oi', 'ana@example.com', 'emails/recuperar_senha.html', {})
+        with mock.patch.object(email_tasks.provider_router, 'send_messages') as send_messages:
+            for _ in range(2):
+                email_tasks.send_email_task.run(*args, idempotency_key='otp:4')
+        send_messages.assert_called_once()
+
+    def test_process_local_alias_is_rejected(self, is_shared):
+        is_shared.return_value = False
+        with self.assertRaises(ImproperlyConfigured):
+            idempotency.claim('enqueue', 'emails/recuperar_senha.html', ['ana@example.com'], 'otp:5')
+
+    @override_settings(EMAIL_IDEMPOTENCY_CACHE_ALIAS='')
+    def test_empty_alias_disables_deduplication(self, is_shared):
+        for _ in range(2):
+            self.assertTrue(idempotency.claim('enqueue', 'emails/recuperar_senha.html', ['ana@example.com'], 'otp:6'))
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import close_old_connections
+
+from services.utils.emails.rate_limiter import is_throttle_error
+
+try:
+    import aiosmtplib  # opcional: sessões SMTP nativamente assíncronas
+except ImportError:
+    aiosmtplib = None
+
+logger = logging.getLogger(__name__)
+
+
+def _call(func, *args):
+    # Threads do executor não passam pelos sinais de request: fecham as conexões como uma request faria
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def _to_thread(func, *args):
+    """asyncio.to_thread respeitando CONN_MAX_AGE (o backend pode consultar o banco)."""
+    return await asyncio.to_thread(_call, func, *args)
+
+
+class _ThreadedSession:
+    """Sessão com backend de e-mail do Django executado em thread (qualquer provedor)."""
+
+    def __init__(self, params):
+        self.backend = get_connection(fail_silently=False, **params)
+        self.opened = False
+
+    async def send(self, message):
+        if not self.opened:
+            await _to_thread(self.backend.open)
+            self.opened = True
+        await _to_thread(self.backend.send_messages, [message])
+
+    async def reset(self):
+        try:
+            await self.close()
+        except Exception:  # sessão já pode estar quebrada
+            pass
+
+    async def close(self):
+        if self.opened:
+            self.opened = False
+            await _to_thread(self.backend.close)
+
+
+class _AioSMTPSession:
+    """Sessão SMTP assíncrona via aiosmtplib."""
+
+    def __init__(self, params):
+        self.client = aiosmtplib.SMTP(
+            hostname=params.get('host') or settings.EMAIL_HOST,
+            port=params.get('port') or settings.EMAIL_PORT,
+            username=params.get('username', settings.EMAIL_HOST_USER) or None,
+            password=params.get('password', settings.EMAIL_HOST_PASSWORD) or None,
+            use_tls=params.get('use_ssl', settings.EMAIL_USE_SSL),
+            start_tls=params.get('use_tls', settings.EMAIL_USE_TLS),
+            timeout=params.get('timeout', settings.EMAIL_TIMEOUT),
+        )
+
+    async def send(self, message):
+        if not self.client.is_connected:
+            await self.client.connect()
+        await self.client.send_message(message.message(), sender=message.from_email, recipients=message.recipients())
+
+    async def reset(self):
+        try:
+            await self.close()
+        except Exception:  # sessão já pode estar quebrada
+            pass
+
+    async def close(self):
+        if self.client.is_connected:
+            try:
+                await self.client.quit()
+            except Exception:
+                self.client.close()
+
+
+class AsyncDeliveryEngine:
+    """
+    Motor de entrega com loop asyncio dentro do worker.
+
+    Um lote local de mensagens é drenado por até EMAIL_ASYNC_CONCURRENCY
+    sessões SMTP simultâneas. Usa aiosmtplib quando instalado (apenas para
+    provedores SMTP); nos demais casos cada sessão usa o backend do Django
+    numa thread.
+    """
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or settings.EMAIL_ASYNC_CONCURRENCY
+
+    @staticmethod
+    def _open_session(params):
+        is_smtp = params.get('backend', settings.EMAIL_BACKEND) == 'django.core.mail.backends.smtp.EmailBackend'
+        if aiosmtplib is not None and is_smtp:
+            return _AioSMTPSession(params)
+        return _ThreadedSession(params)
+
+    def send_chunk(self, messages, params, limiter=None):
+        """
+        Envia [(destinatário, mensagem)] em paralelo e retorna os destinatários
+        que falharam. Com `limiter`, cada envio consome um token do provedor e
+        o número de sessões respeita a concorrência adaptativa do limitador.
+        """
+        if not messages:
+            return []
+        return asyncio.run(self._drain(messages, params, limiter))
+
+    async def _drain(self, messages, params, limiter):
+        queue = asyncio.Queue()
+        for item in messages:
+            queue.put_nowait(item)
+        failed = []
+        concurrency = min(self.concurrency, int(limiter.concurrency)) if limiter else self.concurrency
+        sessions = max(1, min(concurrency, len(messages)))
+        await asyncio.gather(*(self._session(queue, params, failed, limiter) for _ in range(sessions)))
+        return failed
+
+    async def _session(self, queue, params, failed, limiter):
+        session = self._open_session(params)
+        try:
+            while not queue.empty():
+                recipient, message = queue.get_nowait()
+                if limiter:
+                    await limiter.acquire_async()
+                try:
+                    await session.send(message)
+                except Exception as e:
+                    logger.warning(f"[ASYNC ENGINE] Falha ao enviar para {message.to}: {e}")
+                    if limiter and is_throttle_error(e):
+                        limiter.on_throttle()
+                    failed.append(recipient)
+                    await session.reset()
+                else:
+                    if limiter:
+                        limiter.on_success()
+        finally:
+            await session.close()
+
+
+async_engine = AsyncDeliveryEngine()
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AttachmentSpool:
+    """
+    Armazenamento de anexos em disco endereçado por conteúdo (SHA-256).
+
+    As tarefas carregam apenas a referência (hash) em vez dos bytes, e anexos
+    idênticos enviados a muitos destinatários são gravados uma única vez.
+    O diretório precisa ser compartilhado entre a aplicação web e os workers.
+    """
+
+    def __init__(self, root=None, ttl=None):
+        self.root = root or settings.EMAIL_ATTACHMENT_SPOOL_DIR
+        self.ttl = ttl if ttl is not None else settings.EMAIL_ATTACHMENT_SPOOL_TTL
+
+    def path(self, ref):
+        return os.path.join(self.root, ref[:2], ref)
+
+    def store(self, content):
+        """Grava o conteúdo (se ainda não existir) e retorna sua referência."""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        ref = hashlib.sha256(content).hexdigest()
+        path = self.path(ref)
+
+        if os.path.exists(path):
+            # Renova o prazo de expiração para o novo envio
+            os.utime(path)
+            return ref
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return ref
+
+    def read(self, ref):
+        """
+        Lê o anexo numa única leitura. O e-mail precisa dos bytes inteiros
+        (o MIME os codifica em base64), então mmap só acrescentaria uma cópia.
+        """
+        with open(self.path(ref), 'rb') as f:
+            return f.read()
+
+    def collect_garbage(self):
+        """Remove anexos não utilizados há mais de `ttl` segundos. Retorna o total removido."""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        logger.info(f"[ATTACHMENT SPOOL] {removed} anexo(s) expirado(s) removido(s).")
+        return removed
+
+
+def spool_attachments(attachments):
+    """Substitui o conteúdo dos anexos pela referência no spool."""
+    if not settings.EMAIL_ATTACHMENT_SPOOL_ENABLED:
+        return attachments
+    spool = AttachmentSpool()
+    spooled = []
+    for attachment in attachments:
+        if 'content' in attachment:
+            attachment = {
+                'filename': attachment.get('filename'),
+                'mimetype': attachment.get('mimetype'),
+                'ref': spool.store(attachment['content']),
+            }
+        spooled.append(attachment)
+    return spooled
+
+
+def load_attachments(attachments):
+    """
+    Resolve as referências ao spool uma vez: num lote, os e-mails de todos
+    os destinatários compartilham os mesmos bytes em vez de reler o arquivo.
+    """
+    return [
+        {
+            'filename': attachment.get('filename'),
+            'mimetype': attachment.get('mimetype'),
+            'content': load_attachment_content(attachment),
+        }
+        for attachment in attachments or []
+    ]
+
+
+def load_attachment_content(attachment):
+    """Retorna os bytes do anexo, lendo do spool quando ele traz apenas a referência."""
+    if 'ref' in attachment:
+        return AttachmentSpool().read(attachment['ref'])
+    return attachment.get('content')
@@ -0,0 +1,96 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryLogBuffer:
+    """
+    Buffer write-behind para EmailDeliveryLog.
+
+    Os registros ficam em memória e são gravados com bulk_create quando o
+    buffer atinge EMAIL_DELIVERY_LOG_BUFFER_SIZE ou a cada
+    EMAIL_DELIVERY_LOG_FLUSH_INTERVAL segundos (thread em segundo plano), e
+    também no encerramento do worker. Falhas de gravação são apenas logadas:
+    a auditoria nunca derruba um envio.
+    """
+
+    def __init__(self, max_size=None, flush_interval=None):
+        self.max_size = max_size or settings.EMAIL_DELIVERY_LOG_BUFFER_SIZE
+        self.flush_interval = flush_interval or settings.EMAIL_DELIVERY_LOG_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self._records = []
+        self._pid = None
+        self._last_flush = time.monotonic()
+
+    def _ensure_flusher(self):
+        """Inicia (uma vez por processo, inclusive após fork) a thread de flush periódico."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._records = []
+        threading.Thread(target=self._run, name='delivery-log-flusher', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+                connection.close()
+
+    def record(self, recipients, status, subject='', template_name='', provider='', error=''):
+        from services.models import EmailDeliveryLog
+
+        if not settings.EMAIL_DELIVERY_LOG_ENABLED:
+            return
+        now = timezone.now()
+        entries = [
+            EmailDeliveryLog(
+                recipient=recipient,
+                subject=(subject or '')[:255],
+                template_name=(template_name or '')[:255],
+                provider=(provider or '')[:100],
+                status=status,
+                error=str(error or ''),
+                created_at=now,
+            )
+            for recipient in recipients
+        ]
+        with self._lock:
+            self._ensure_flusher()
+            self._records.extend(entries)
+            should_flush = len(self._records) >= self.max_size
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        from services.models import EmailDeliveryLog
+
+        with self._lock:
+            records, self._records = self._records, []
+            self._last_flush = time.monotonic()
+        if not records:
+            return 0
+        try:
+            EmailDeliveryLog.objects.bulk_create(records, batch_size=self.max_size)
+        except Exception as e:
+            logger.error(f"[DELIVERY LOG] Falha ao gravar {len(records)} registro(s) de entrega: {e}")
+            return 0
+        return len(records)
+
+
+delivery_log = DeliveryLogBuffer()
+atexit.register(delivery_log.flush)
+
+
+@worker_process_shutdown.connect(weak=False)
+def _flush_on_shutdown(**kwargs):
+    delivery_log.flush()
@@ -1,16 +1,41 @@
+import functools
 import logging
+import time
 from django.conf import settings
+from django.db import transaction
 from django.template.loader import render_to_string
-from services.tasks.email_tasks import send_email_task
+from services.models import EmailOutbox
+from services.tasks.email_tasks import send_email_task, send_bulk_email_task
+from services.utils.emails.attachment_spool import spool_attachments
+from services.utils.emails import idempotency
+from core.celery import EMAIL_TRANSACTIONAL_QUEUE, EMAIL_BULK_QUEUE
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_QUEUES = {
+    'transactional': EMAIL_TRANSACTIONAL_QUEUE,
+    'bulk': EMAIL_BULK_QUEUE,
+}
+
 class EmailService:
     """
     Serviço de envio de e-mails via Celery, com logging profissional.
+
+    Com `outbox=True` (padrão: EMAIL_OUTBOX_ENABLED) o envio é gravado na
+    tabela EmailOutbox, dentro da transação corrente, e publicado no broker
+    depois pelo dispatcher (dispatch_email_outbox). Falhas ao gravar no
+    outbox propagam para que a transação do chamador seja revertida. Sem o
+    outbox, a publicação no broker espera o commit da transação corrente
+    (transaction.on_commit): um rollback não deixa e-mail para trás.
+
+    `priority` escolhe a fila: 'transactional' (OTP, avisos de conta) ou
+    'bulk' (campanhas). Por padrão send() usa 'transactional' e
+    send_many() usa 'bulk'.
     """
     def __init__(self, subject=None, to_email=None, template_name=None, context=None,
-                 from_email=None, cc=None, bcc=None, attachments=None):
+                 from_email=None, cc=None, bcc=None, attachments=None, outbox=None, priority=None):
+        if priority is not None and priority not in PRIORITY_QUEUES:
+            raise ValueError(f"Prioridade inválida: {priority}. Use uma de {list(PRIORITY_QUEUES)}.")
         self.subject = subject or "Sem Assunto"
         self.to_email = to_email if isinstance(to_email, list) else [to_email]
         self.template_name = template_name
@@ -18,7 +43,10 @@ class EmailService:
         self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
         self.cc = cc or []
         self.bcc = bcc or []
-        self.attachments = attachments or []
+        # Anexos viajam pelo broker apenas como referência ao spool em disco
+        self.attachments = spool_attachments(attachments or [])
+        self.outbox = settings.EMAIL_OUTBOX_ENABLED if outbox is None else outbox
+        self.priority = priority
 
     def _prepare_context(self, context):
         if not context:
@@ -28,23 +56,65 @@ class EmailService:
             for key, value in context.items()
         }
 
-    def send(self):
-        try:
-            send_email_task.delay(
-                self.subject,
-                self.to_email,
-                self.template_name,
-                self.context,
-                self.from_email,
-                self.cc,
-                self.bcc,
-                self.attachments
-            )
-            logger.info(
-                f"E-mail agendado com sucesso: para {self.to_email} usando template {self.template_name}.",
-                extra={"subject": self.subject, "context": self.context}
+    def _enqueue(self, task, args_list, default_priority, on_error=None):
+        """
+        Grava as tarefas no outbox ou agenda a publicação no broker para
+        depois do commit, conforme o modo. Falhas de publicação chegam a
+        `on_error(args, exc)`, já que acontecem fora da chamada.
+        """
+        queue = PRIORITY_QUEUES[self.priority or default_priority]
+        if self.outbox:
+            EmailOutbox.objects.bulk_create(
+                [EmailOutbox(task_name=task.name, payload=list(args), queue=queue) for args in args_list]
             )
+            return
+        for args in args_list:
+            transaction.on_commit(functools.partial(self._publish, task, args, queue, on_error))
+
+    @staticmethod
+    def _publish(task, args, queue, on_error):
+        try:
+            task.apply_async(args=args, queue=queue, headers={'enqueued_at': time.time()})
         except Exception as e:
+            if on_error is None:
+                raise
+            on_error(args, e)
+
+    def send(self, idempotency_key=None):
+        """
+        Agenda o envio. Com `idempotency_key`, envios repetidos do mesmo
+        template para os mesmos destinatários dentro de
+        EMAIL_IDEMPOTENCY_WINDOW são descartados. Retorna False quando o
+        envio foi descartado como duplicado.
+        """
+        if idempotency_key is not None and not idempotency.claim(
+            'enqueue', self.template_name, self.to_email, idempotency_key
+        ):
+            logger.info(f"E-mail duplicado descartado: para {self.to_email} usando template {self.template_name}.")
+            return False
+
+        args = (
+            self.subject,
+            self.to_email,
+            self.template_name,
+            self.context,
+            self.from_email,
+            self.cc,
+            self.bcc,
+            self.attachments,
+            idempotency_key
+        )
+        if self.outbox:
+            try:
+                self._enqueue(send_email_task, [args], 'transactional')
+            except Exception:
+                if idempotency_key is not None:
+                    idempotency.release('enqueue', self.template_name, self.to_email, idempotency_key)
+                raise
+            logger.info(f"E-mail gravado no outbox: para {self.to_email} usando template {self.template_name}.")
+            return True
+
+        def failed(args, e):
             logger.error(
                 f"Falha ao agendar envio de e-mail: {e}",
                 exc_info=True,
@@ -54,3 +124,50 @@ class EmailService:
                     "context": self.context
                 }
             )
+            if idempotency_key is not None:
+                idempotency.release('enqueue', self.template_name, self.to_email, idempotency_key)
+
+        self._enqueue(send_email_task, [args], 'transactional', on_error=failed)
+        logger.info(
+            f"E-mail agendado com sucesso: para {self.to_email} usando template {self.template_name}.",
+            extra={"subject": self.subject, "context": self.context}
+        )
+        return True
+
+    def send_many(self, recipients, per_recipient_context=None):
+        """
+        Agenda envio em lote: os destinatários são agrupados em blocos de
+        EMAIL_BULK_CHUNK_SIZE e cada bloco vira uma única tarefa/sessão SMTP.
+
+        `per_recipient_context` é um dict {email: contexto} com as variáveis
+        específicas de cada destinatário; `self.context` é compartilhado.
+        """
+        per_recipient_context = per_recipient_context or {}
+        payload = [
+            {"email": email, "context": self._prepare_context(per_recipient_context.get(email))}
+            for email in recipients
+        ]
+        chunk_size = settings.EMAIL_BULK_CHUNK_SIZE
+        task_args = [
+            (self.subject, payload[start:start + chunk_size], self.template_name,
+             self.context, self.from_email, self.attachments)
+            for start in range(0, len(payload), chunk_size)
+        ]
+
+        def failed(args, e):
+            logger.error(
+                f"Falha ao agendar lote de e-mails: {e}",
+                exc_info=True,
+                extra={
+                    "to_email": [recipient["email"] for recipient in args[1]],
+                    "template": self.template_name
+                }
+            )
+
+        self._enqueue(send_bulk_email_task, task_args, 'bulk', on_error=failed)
+
+        logger.info(
+            f"Envio em lote agendado: {len(payload)} destinatário(s) em blocos de {chunk_size} "
+            f"usando template {self.template_name}.",
+            extra={"subject": self.subject}
+        )
@@ -0,0 +1,68 @@
+import functools
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from core.tiered_cache import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def _warn_disabled():
+    logger.warning(
+        "[EMAIL IDEMPOTENCY] EMAIL_IDEMPOTENCY_CACHE_ALIAS vazio: envios com chave de idempotência "
+        "não são deduplicados."
+    )
+
+
+def _get_cache():
+    """
+    Cache das reservas (EMAIL_IDEMPOTENCY_CACHE_ALIAS). Precisa ser
+    compartilhado entre processos: um retry pego por outro worker ou uma
+    requisição repetida em outro processo web tem de ver a mesma reserva.
+    Alias vazio desliga a deduplicação.
+    """
+    alias = settings.EMAIL_IDEMPOTENCY_CACHE_ALIAS
+    if not alias:
+        _warn_disabled()
+        return None
+    cache = caches[alias]
+    if not is_shared_cache(cache):
+        raise ImproperlyConfigured(
+            f"EMAIL_IDEMPOTENCY_CACHE_ALIAS '{alias}' é local ao processo; use um cache compartilhado (Redis)."
+        )
+    return cache
+
+
+def _cache_key(stage, template_name, recipients, idempotency_key):
+    recipients = [recipients] if isinstance(recipients, str) else recipients
+    raw = f"{template_name}|{','.join(sorted(recipients))}|{idempotency_key}"
+    return f"email-idem:{stage}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+def claim(stage, template_name, recipients, idempotency_key):
+    """
+    Reserva (template, destinatários, chave) na janela EMAIL_IDEMPOTENCY_WINDOW.
+
+    Retorna False se a mesma combinação já foi reservada dentro da janela,
+    ou seja, o envio é duplicado e deve ser descartado. `stage` separa a
+    deduplicação no enfileiramento ('enqueue') da deduplicação na entrega
+    ('deliver'), que protege contra retries e reentregas do broker. Com a
+    deduplicação desligada, sempre retorna True.
+    """
+    cache = _get_cache()
+    if cache is None:
+        return True
+    key = _cache_key(stage, template_name, recipients, idempotency_key)
+    return cache.add(key, 1, timeout=settings.EMAIL_IDEMPOTENCY_WINDOW)
+
+
+def release(stage, template_name, recipients, idempotency_key):
+    """Libera a reserva (ex.: a entrega falhou e deve poder ser repetida)."""
+    cache = _get_cache()
+    if cache is not None:
+        cache.delete(_cache_key(stage, template_name, recipients, idempotency_key))
@@ -0,0 +1,43 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Janela deslizante de latências (ms) por nome (fila, provedor...), com percentis sob demanda."""
+
+    def __init__(self, window=1000, report_every=100, label='fila'):
+        self.window = window
+        self.label = label
+        self.report_every = report_every
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, latency_ms):
+        with self._lock:
+            samples = self._samples.setdefault(name, deque(maxlen=self.window))
+            samples.append(latency_ms)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            should_report = self._counts[name] % self.report_every == 0
+        if should_report:
+            stats = self.percentiles(name)
+            logger.info(
+                f"[EMAIL METRICS] {self.label}={name} amostras={stats['count']} "
+                f"p50={stats['p50']:.0f}ms p99={stats['p99']:.0f}ms max={stats['max']:.0f}ms"
+            )
+
+    def percentiles(self, name):
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return {'count': 0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+
+        def pick(q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+        return {'count': len(samples), 'p50': pick(0.50), 'p99': pick(0.99), 'max': samples[-1]}
+
+
+enqueue_to_send = LatencyTracker()
@@ -0,0 +1,224 @@
+import logging
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from services.utils.emails.smtp_pool import smtp_pool, RECONNECT_ERRORS
+from services.utils.emails.rate_limiter import rate_limiters, is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = {
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'mailgun': 'anymail.backends.mailgun.EmailBackend',  # requer pacote: django-anymail
+    'sendgrid': 'anymail.backends.sendgrid.EmailBackend',  # requer pacote: django-anymail
+}
+
+
+class ProviderConfig:
+    """Cópia imutável da configuração de um EmailProvider, usada sem tocar no banco."""
+    __slots__ = ('id', 'name', 'provider_type', 'default_sender', 'params', 'delivery_engine', 'max_rate_per_minute')
+
+    def __init__(self, id, name, provider_type, default_sender, params, delivery_engine='', max_rate_per_minute=None):
+        self.id = id
+        self.name = name
+        self.provider_type = provider_type
+        self.default_sender = default_sender
+        self.params = params
+        self.delivery_engine = delivery_engine
+        self.max_rate_per_minute = max_rate_per_minute
+
+    @property
+    def engine(self):
+        """Motor de entrega do provedor ou, se não definido, EMAIL_DELIVERY_ENGINE."""
+        return self.delivery_engine or settings.EMAIL_DELIVERY_ENGINE
+
+    @classmethod
+    def from_row(cls, row):
+        provider_type = row['provider_type']
+        params = {'backend': BACKENDS[provider_type], 'timeout': settings.EMAIL_PROVIDER_TIMEOUT}
+        if provider_type == 'smtp':
+            params.update({
+                'host': row['host'],
+                'port': row['port'],
+                'username': row['username'] or '',
+                'password': row['password'] or '',
+                'use_tls': row['use_tls'],
+                'use_ssl': row['use_ssl'],
+            })
+        else:
+            params['api_key'] = row['api_key']
+        return cls(row['id'], row['name'], provider_type, row['default_sender'], params,
+                   row['delivery_engine'], row['max_rate_per_minute'])
+
+    def __repr__(self):
+        return f"<ProviderConfig {self.name} ({self.provider_type})>"
+
+
+# Usado quando não há EmailProvider ativo: configurações EMAIL_* do settings.
+SETTINGS_PROVIDER = ProviderConfig(None, 'settings', 'smtp', None, {})
+
+# Atributo da mensagem com o remetente pedido pelo chamador, antes de qualquer provedor
+REQUESTED_FROM_ATTR = '_requested_from_email'
+
+
+def is_provider_error(exc):
+    """
+    Indica se a falha é do provedor (conexão, autenticação, resposta 4xx
+    temporária) e justifica ejetá-lo e tentar o próximo. Erros permanentes
+    da mensagem (destinatário inexistente, conteúdo recusado com 5xx) seriam
+    repetidos em todos os provedores e não ejetam nenhum.
+    """
+    if isinstance(exc, (smtplib.SMTPAuthenticationError, smtplib.SMTPHeloError)):
+        return True
+    if isinstance(exc, RECONNECT_ERRORS):
+        return True
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPException):
+        return False
+    # Erros de rede (timeout, DNS) e de backends HTTP: só 4xx de requisição inválida são da mensagem
+    status_code = getattr(exc, 'status_code', None)
+    return not (isinstance(status_code, int) and 400 <= status_code < 500 and status_code not in (401, 403, 429))
+
+
+class ProviderRouter:
+    """
+    Roteador de entrega baseado na tabela EmailProvider.
+
+    As configurações ativas ficam num snapshot em memória, invalidado pelos
+    sinais post_save/post_delete do modelo e renovado a cada
+    EMAIL_PROVIDER_CACHE_TTL segundos (para refletir alterações feitas por
+    outros processos). Provedores que falham ou respondem acima de
+    EMAIL_PROVIDER_SLOW_THRESHOLD são ejetados por EMAIL_PROVIDER_COOLDOWN
+    segundos e o envio segue para o próximo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = None
+        self._loaded_at = 0.0
+        self._ejected_until = {}
+
+    def invalidate(self):
+        self._providers = None
+
+    def _load(self):
+        from services.models import EmailProvider
+
+        rows = EmailProvider.objects.filter(
+            is_active=True, provider_type__in=BACKENDS
+        ).order_by('id').values(
+            'id', 'name', 'provider_type', 'default_sender', 'host', 'port',
+            'username', 'password', 'use_tls', 'use_ssl', 'api_key', 'delivery_engine',
+            'max_rate_per_minute'
+        )
+        providers = tuple(ProviderConfig.from_row(row) for row in rows)
+        logger.info(f"[EMAIL ROUTER] {len(providers)} provedor(es) ativo(s) carregado(s).")
+        return providers
+
+    def providers(self):
+        providers = self._providers
+        now = time.monotonic()
+        if providers is None or now - self._loaded_at > settings.EMAIL_PROVIDER_CACHE_TTL:
+            with self._lock:
+                if self._providers is None or now - self._loaded_at > settings.EMAIL_PROVIDER_CACHE_TTL:
+                    self._providers = self._load()
+                    self._loaded_at = now
+                providers = self._providers
+        return providers or (SETTINGS_PROVIDER,)
+
+    def candidates(self):
+        """Provedores saudáveis primeiro; os ejetados ficam no fim como último recurso."""
+        now = time.monotonic()
+        healthy, ejected = [], []
+        for provider in self.providers():
+            (ejected if self._ejected_until.get(provider.id, 0) > now else healthy).append(provider)
+        return healthy + ejected
+
+    def pick(self):
+        return self.candidates()[0]
+
+    def mark_failure(self, provider, reason):
+        self._ejected_until[provider.id] = time.monotonic() + settings.EMAIL_PROVIDER_COOLDOWN
+        logger.warning(f"[EMAIL ROUTER] Provedor {provider.name} ejetado por {settings.EMAIL_PROVIDER_COOLDOWN}s: {reason}")
+
+    def mark_success(self, provider, elapsed):
+        if elapsed > settings.EMAIL_PROVIDER_SLOW_THRESHOLD:
+            self.mark_failure(provider, f"resposta lenta ({elapsed:.2f}s)")
+        elif provider.id in self._ejected_until:
+            self._ejected_until.pop(provider.id, None)
+
+    @staticmethod
+    def prepare_messages(messages, provider):
+        """
+        Usa o remetente do provedor quando a mensagem pediu o remetente padrão.
+
+        O remetente original fica guardado na mensagem e é reaplicado a cada
+        provedor, para que no failover a mensagem não saia pelo provedor B
+        com o remetente do provedor A.
+        """
+        for message in messages:
+            if not hasattr(message, REQUESTED_FROM_ATTR):
+                setattr(message, REQUESTED_FROM_ATTR, message.from_email)
+            requested = getattr(message, REQUESTED_FROM_ATTR)
+            if provider.default_sender and requested == settings.DEFAULT_FROM_EMAIL:
+                message.from_email = provider.default_sender
+            else:
+                message.from_email = requested
+
+    @staticmethod
+    def deliver(messages, provider):
+        """
+        Envia pelo caminho síncrono, reaproveitando sessões do smtp_pool. O
+        motor assíncrono (provider.engine == 'async') fica para os lotes de
+        send_bulk_email_task: para mensagens avulsas, abrir um event loop e
+        uma sessão SMTP novos a cada envio sai mais caro que o pool.
+        """
+        limiter = rate_limiters.get(provider)
+        if limiter:
+            limiter.acquire(len(messages))
+        try:
+            if settings.EMAIL_POOL_ENABLED:
+                before_retry = (lambda: limiter.acquire(len(messages))) if limiter else None
+                sent = smtp_pool.send_messages(messages, before_retry=before_retry, **provider.params)
+            else:
+                sent = get_connection(fail_silently=False, **provider.params).send_messages(messages)
+        except Exception as e:
+            if limiter and is_throttle_error(e):
+                limiter.on_throttle()
+            raise
+        if limiter:
+            limiter.on_success(len(messages))
+        return sent
+
+    def send_messages(self, messages):
+        """
+        Entrega as mensagens pelo primeiro provedor disponível, com failover. Retorna o provedor usado.
+
+        Só falhas do provedor (is_provider_error) ejetam e passam ao próximo;
+        erros permanentes da mensagem são propagados na hora.
+        """
+        last_error = None
+        for provider in self.candidates():
+            self.prepare_messages(messages, provider)
+            start = time.monotonic()
+            try:
+                self.deliver(messages, provider)
+            except Exception as e:
+                if not is_provider_error(e):
+                    raise
+                last_error = e
+                self.mark_failure(provider, e)
+                continue
+            self.mark_success(provider, time.monotonic() - start)
+            return provider
+        raise last_error
+
+
+provider_router = ProviderRouter()
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+
+from services.utils.emails.metrics import LatencyTracker
+
+try:
+    import redis
+except ImportError:  # o limitador local é usado como substituto
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Respostas SMTP que indicam limitação de taxa pelo provedor
+THROTTLE_CODES = {421, 450, 451, 452, 454}
+
+rate_limit_wait = LatencyTracker(label='espera_rate_limit')
+
+
+def is_throttle_error(exc):
+    """Verifica se a exceção SMTP corresponde a uma resposta de throttling (4xx temporário)."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return any(code in THROTTLE_CODES for code, _ in exc.recipients.values())
+    return getattr(exc, 'smtp_code', None) in THROTTLE_CODES
+
+
+class LocalBucketStore:
+    """
+    Token buckets em memória do processo (substituto quando não há Redis).
+
+    Cada processo tem o próprio bucket; o registro divide o teto por
+    EMAIL_RATE_LIMIT_LOCAL_PROCESSES para que N processos somados não enviem
+    N vezes o limite do provedor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def take(self, key, default_rate, burst, tokens_needed):
+        """Consome tokens; retorna (segundos a aguardar — 0 se consumiu —, taxa atual)."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.setdefault(key, {'rate': default_rate, 'tokens': None, 'ts': now})
+            rate = state['rate']
+            capacity = max(1.0, rate * burst)
+            tokens = capacity if state['tokens'] is None else state['tokens']
+            tokens = min(capacity, tokens + (now - state['ts']) * rate)
+            wait = 0.0
+            if tokens >= tokens_needed:
+                tokens -= tokens_needed
+            else:
+                wait = (tokens_needed - tokens) / rate
+            state.update(tokens=tokens, ts=now)
+            return wait, rate
+
+    def adjust(self, key, default_rate, factor, add, min_rate, max_rate):
+        with self._lock:
+            state = self._state.setdefault(key, {'rate': default_rate, 'tokens': None, 'ts': time.monotonic()})
+            state['rate'] = min(max_rate, max(min_rate, state['rate'] * factor + add))
+            return state['rate']
+
+
+class RedisBucketStore:
+    """Token buckets no Redis, compartilhados por todos os workers que usam a mesma instância."""
+
+    TAKE_SCRIPT = """
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate')
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local rate = tonumber(state[3]) or tonumber(ARGV[1])
+    local capacity = math.max(1, rate * tonumber(ARGV[2]))
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    local needed = tonumber(ARGV[3])
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= needed then tokens = tokens - needed else wait = (needed - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'rate', rate)
+    redis.call('EXPIRE', KEYS[1], 3600)
+    return tostring(wait) .. ' ' .. tostring(rate)
+    """
+
+    ADJUST_SCRIPT = """
+    local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or tonumber(ARGV[1])
+    rate = rate * tonumber(ARGV[2]) + tonumber(ARGV[3])
+    rate = math.min(tonumber(ARGV[5]), math.max(tonumber(ARGV[4]), rate))
+    redis.call('HSET', KEYS[1], 'rate', rate)
+    redis.call('EXPIRE', KEYS[1], 3600)
+    return tostring(rate)
+    """
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+        self._take = self.client.register_script(self.TAKE_SCRIPT)
+        self._adjust = self.client.register_script(self.ADJUST_SCRIPT)
+
+    def take(self, key, default_rate, burst, tokens_needed):
+        wait, rate = self._take(keys=[key], args=[default_rate, burst, tokens_needed]).split()
+        return float(wait), float(rate)
+
+    def adjust(self, key, default_rate, factor, add, min_rate, max_rate):
+        return float(self._adjust(keys=[key], args=[default_rate, factor, add, min_rate, max_rate]))
+
+
+class ProviderRateLimiter:
+    """
+    Token bucket adaptativo (AIMD) para um provedor de e-mail.
+
+    A taxa começa no teto configurado, cai multiplicativamente
+    (EMAIL_RATE_LIMIT_DECREASE) a cada resposta de throttling e volta a subir
+    aditivamente com os envios bem-sucedidos, em cerca de
+    EMAIL_RATE_LIMIT_INCREASE × teto msg/s por segundo. A concorrência local
+    (sessões simultâneas do motor assíncrono) segue a mesma regra.
+    """
+
+    def __init__(self, key, ceiling, store):
+        self.key = key
+        self.ceiling = ceiling
+        self.min_rate = max(ceiling * settings.EMAIL_RATE_LIMIT_MIN_FRACTION, 0.01)
+        self.store = store
+        self.concurrency = float(settings.EMAIL_ASYNC_CONCURRENCY)
+        # Última taxa vista no bucket compartilhado (atualizada a cada consumo)
+        self.rate = ceiling
+
+    def _take(self, tokens):
+        try:
+            wait, self.rate = self.store.take(self.key, self.ceiling, settings.EMAIL_RATE_LIMIT_BURST_SECONDS, tokens)
+            return wait
+        except Exception as e:
+            # Falha no Redis não deve bloquear o envio
+            logger.warning(f"[RATE LIMIT] Falha ao consultar o bucket {self.key}: {e}")
+            return 0.0
+
+    def acquire(self, tokens=1):
+        """Bloqueia até haver tokens disponíveis; retorna o tempo de espera em segundos."""
+        start = time.monotonic()
+        wait = self._take(tokens)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self._take(tokens)
+        waited = time.monotonic() - start
+        rate_limit_wait.record(self.key, waited * 1000)
+        return waited
+
+    async def acquire_async(self, tokens=1):
+        start = time.monotonic()
+        wait = await asyncio.to_thread(self._take, tokens)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = await asyncio.to_thread(self._take, tokens)
+        waited = time.monotonic() - start
+        rate_limit_wait.record(self.key, waited * 1000)
+        return waited
+
+    def _adjust(self, factor, add):
+        try:
+            self.rate = self.store.adjust(self.key, self.ceiling, factor, add, self.min_rate, self.ceiling)
+        except Exception as e:
+            logger.warning(f"[RATE LIMIT] Falha ao ajustar o bucket {self.key}: {e}")
+
+    def on_success(self, count=1):
+        # Já no teto: nada a ajustar, evita uma ida extra ao Redis por envio
+        if self.rate < self.ceiling:
+            self._adjust(1.0, count * settings.EMAIL_RATE_LIMIT_INCREASE * self.ceiling / max(self.rate, self.min_rate))
+        self.concurrency = min(
+            float(settings.EMAIL_ASYNC_CONCURRENCY), self.concurrency + count / max(self.concurrency, 1.0)
+        )
+
+    def on_throttle(self):
+        self._adjust(settings.EMAIL_RATE_LIMIT_DECREASE, 0.0)
+        self.concurrency = max(1.0, self.concurrency * settings.EMAIL_RATE_LIMIT_DECREASE)
+        logger.warning(
+            f"[RATE LIMIT] Throttling em {self.key}: taxa reduzida para {self.rate:.2f} msg/s, "
+            f"concorrência {int(self.concurrency)}."
+        )
+
+    def stats(self):
+        """Taxa atual, teto, concorrência e percentis da espera na fila (ms)."""
+        return {
+            'key': self.key,
+            'rate': self.rate,
+            'ceiling': self.ceiling,
+            'concurrency': int(self.concurrency),
+            'wait_ms': rate_limit_wait.percentiles(self.key),
+        }
+
+
+class RateLimiterRegistry:
+    """Limitadores por provedor, criados sob demanda e reutilizados no processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters = {}
+        self._store = None
+
+    def _get_store(self):
+        if self._store is None:
+            url = settings.EMAIL_RATE_LIMIT_REDIS_URL
+            if url and redis is not None:
+                self._store = RedisBucketStore(url)
+            else:
+                if url:
+                    logger.warning("[RATE LIMIT] Pacote redis não instalado; usando limitador local.")
+                self._store = LocalBucketStore()
+        return self._store
+
+    def get(self, provider):
+        """Retorna o limitador do provedor ou None se ele não tiver limite configurado."""
+        per_minute = provider.max_rate_per_minute or settings.EMAIL_RATE_LIMIT_PER_MINUTE
+        if not per_minute:
+            return None
+        key = f"email-rate:{provider.id or 'settings'}"
+        store = self._get_store()
+        ceiling = per_minute / 60.0
+        if isinstance(store, LocalBucketStore):
+            ceiling /= max(settings.EMAIL_RATE_LIMIT_LOCAL_PROCESSES, 1)
+        limiter = self._limiters.get(key)
+        if limiter is None or limiter.ceiling != ceiling:
+            with self._lock:
+                limiter = ProviderRateLimiter(key, ceiling, store)
+                self._limiters[key] = limiter
+        return limiter
+
+    def stats(self):
+        """Estado dos limitadores deste processo; nos workers, consultado via `manage.py email_rate_stats`."""
+        return [limiter.stats() for limiter in self._limiters.values()]
+
+
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Erros que indicam conexão SMTP morta e justificam reconexão imediata. As
+# demais SMTPException (destinatário recusado, erro no DATA, 4xx do servidor)
+# dizem respeito à mensagem, não à sessão.
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError)
+
+
+class PooledConnection:
+    """Conexão de e-mail aberta e mantida viva entre tarefas."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    @property
+    def idle_for(self):
+        return time.monotonic() - self.last_used
+
+    def is_alive(self):
+        """Executa NOOP no servidor SMTP; backends sem socket são sempre considerados vivos."""
+        smtp = getattr(self.backend, 'connection', None)
+        if smtp is None or not hasattr(smtp, 'noop'):
+            return True
+        try:
+            status, _ = smtp.noop()
+        except (smtplib.SMTPException, OSError):
+            return False
+        return status == 250
+
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception:  # conexão já pode estar quebrada
+            pass
+
+
+class SMTPConnectionPool:
+    """
+    Pool de conexões SMTP por processo, indexado pelas configurações do provedor.
+
+    Cada worker Celery reutiliza sessões TLS já autenticadas entre tarefas,
+    validando-as com NOOP após períodos ociosos e descartando-as após o timeout.
+    """
+
+    def __init__(self, idle_timeout=None, health_check_interval=None, max_idle=None):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.EMAIL_POOL_IDLE_TIMEOUT
+        self.health_check_interval = (
+            health_check_interval if health_check_interval is not None
+            else settings.EMAIL_POOL_HEALTH_CHECK_INTERVAL
+        )
+        self.max_idle = max_idle if max_idle is not None else settings.EMAIL_POOL_MAX_IDLE
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _make_key(params):
+        return tuple(sorted(params.items()))
+
+    def _check_fork(self):
+        """Após fork, descarta conexões herdadas do processo pai sem fechá-las."""
+        if self._pid != os.getpid():
+            self._idle = {}
+            self._pid = os.getpid()
+
+    def _open(self, params):
+        backend = get_connection(fail_silently=False, **params)
+        backend.open()
+        logger.info(f"[SMTP POOL] Nova conexão aberta (pid={os.getpid()}, host={params.get('host', settings.EMAIL_HOST)}).")
+        return PooledConnection(backend)
+
+    def acquire(self, **params):
+        """Retorna uma conexão saudável para as configurações informadas."""
+        key = self._make_key(params)
+        with self._lock:
+            self._check_fork()
+            bucket = self._idle.get(key, [])
+            while bucket:
+                pooled = bucket.pop()
+                if pooled.idle_for > self.idle_timeout:
+                    pooled.close()
+                    continue
+                if pooled.idle_for > self.health_check_interval and not pooled.is_alive():
+                    logger.warning("[SMTP POOL] Conexão falhou no NOOP; reconectando.")
+                    pooled.close()
+                    continue
+                return pooled
+        return self._open(params)
+
+    def release(self, pooled, **params):
+        """Devolve a conexão ao pool ou a fecha se o pool estiver cheio."""
+        pooled.last_used = time.monotonic()
+        key = self._make_key(params)
+        with self._lock:
+            self._check_fork()
+            bucket = self._idle.setdefault(key, [])
+            if len(bucket) < self.max_idle:
+                bucket.append(pooled)
+                return
+        pooled.close()
+
+    @contextmanager
+    def connection(self, **params):
+        """
+        Empresta uma conexão. Se a sessão caiu ela é descartada; erros da
+        mensagem (destinatário recusado, DATA rejeitado) a devolvem ao pool.
+        """
+        pooled = self.acquire(**params)
+        try:
+            yield pooled.backend
+        except RECONNECT_ERRORS:
+            pooled.close()
+            raise
+        except Exception:
+            self.release(pooled, **params)
+            raise
+        self.release(pooled, **params)
+
+    def send_messages(self, messages, before_retry=None, **params):
+        """
+        Envia mensagens por uma conexão do pool, reconectando uma vez se a
+        sessão caiu. Erros permanentes da mensagem não são repetidos.
+
+        `before_retry` é chamado antes da nova tentativa; o roteador o usa
+        para consumir tokens do limitador de taxa também no reenvio (o
+        servidor pode ter derrubado a sessão justamente por excesso de envios).
+        """
+        try:
+            with self.connection(**params) as backend:
+                return backend.send_messages(messages)
+        except RECONNECT_ERRORS as e:
+            logger.warning(f"[SMTP POOL] Sessão SMTP perdida ({e}); tentando novamente com nova conexão.")
+            if before_retry is not None:
+                before_retry()
+            with self.connection(**params) as backend:
+                return backend.send_messages(messages)
+
+    def close_all(self):
+        with self._lock:
+            buckets, self._idle = self._idle, {}
+            inherited = self._pid != os.getpid()
+        if inherited:
+            return
+        for bucket in buckets.values():
+            for pooled in bucket:
+                pooled.close()
+
+
+smtp_pool = SMTPConnectionPool()
+atexit.register(smtp_pool.close_all)
+
+
+@worker_process_shutdown.connect(weak=False)
+def _close_pool_on_shutdown(**kwargs):
+    smtp_pool.close_all()
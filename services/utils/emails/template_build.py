@@ -0,0 +1,408 @@
+import hashlib
+import html
+import logging
+import os
+import re
+import threading
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.template import engines
+
+logger = logging.getLogger(__name__)
+
+EXTENDS_RE = re.compile(r"{%\s*extends\s+[\"']([^\"']+)[\"']\s*%}")
+LOAD_RE = re.compile(r"{%\s*load\s+[^%]+%}")
+BLOCK_TAG_RE = re.compile(r"{%\s*(block|endblock)(?:\s+(\w+))?\s*%}")
+BLOCK_SUPER_RE = re.compile(r"{{\s*block\.super\s*}}")
+STYLE_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+COMPOUND_RE = re.compile(r"(?P<tag>[a-zA-Z][a-zA-Z0-9-]*)?(?P<rest>(?:[.#][\w-]+)*)")
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+TEXT_BLOCK_TAGS = r"p|div|h[1-6]|tr|li|table|br|hr"
+# Muda quando a transformação muda, invalidando os builds já gravados em disco
+BUILD_FORMAT = 2
+PREFORMATTED_RE = re.compile(r"(<(?:pre|textarea)\b[^>]*>.*?</(?:pre|textarea)>)", re.S | re.I)
+BLOCK_SPACE_RE = re.compile(
+    r"\s*(</?(?:html|head|body|title|meta|link|style|table|thead|tbody|tfoot|tr|td|th|"
+    r"div|p|h[1-6]|ul|ol|li|br|hr|center)\b[^>]*>)\s*",
+    re.I
+)
+
+
+# --------------------------------------------------------------------------
+# Achatamento de herança ({% extends %} / {% block %})
+# --------------------------------------------------------------------------
+
+def _parse_blocks(source):
+    """Retorna {nome: conteúdo} de todos os blocos, em qualquer profundidade."""
+    blocks, stack = {}, []
+    for match in BLOCK_TAG_RE.finditer(source):
+        if match.group(1) == 'block':
+            stack.append((match.group(2), match.end()))
+        elif stack:
+            name, start = stack.pop()
+            blocks[name] = source[start:match.start()]
+    return blocks
+
+
+def _replace_blocks(source, overrides):
+    """Substitui cada bloco de nível superior pelo conteúdo efetivo, recursivamente."""
+    output, depth, cursor, current, content_start = [], 0, 0, None, 0
+    for match in BLOCK_TAG_RE.finditer(source):
+        if match.group(1) == 'block':
+            if depth == 0:
+                output.append(source[cursor:match.start()])
+                current, content_start = match.group(2), match.end()
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                content = overrides.get(current, source[content_start:match.start()])
+                output.append(_replace_blocks(content, overrides))
+                cursor = match.end()
+    output.append(source[cursor:])
+    return ''.join(output)
+
+
+class TemplateSource:
+    """Localiza e lê o arquivo-fonte de um template pelos loaders do Django."""
+
+    def __init__(self, name):
+        engine = engines['django'].engine
+        _, origin = engine.find_template(name)
+        self.name = name
+        self.path = origin.name
+        with open(self.path, encoding='utf-8') as f:
+            self.source = f.read()
+
+
+def flatten_template(name, overrides=None, chain=None):
+    """
+    Resolve a cadeia de herança do template num único fonte sem extends/block.
+
+    Retorna (fonte, caminhos), onde `caminhos` são os arquivos da cadeia,
+    usados para detectar alterações.
+    """
+    overrides = overrides or {}
+    chain = chain if chain is not None else []
+    template = TemplateSource(name)
+    chain.append(template.path)
+    own_blocks = _parse_blocks(template.source)
+
+    parent = EXTENDS_RE.search(template.source)
+    if not parent:
+        return _replace_blocks(template.source, overrides), chain
+
+    effective = dict(own_blocks)
+    for block_name, content in overrides.items():
+        if block_name in own_blocks:
+            content = BLOCK_SUPER_RE.sub(lambda _: own_blocks[block_name], content)
+        effective[block_name] = content
+
+    flattened, chain = flatten_template(parent.group(1), effective, chain)
+    loads = ''.join(LOAD_RE.findall(template.source))
+    return loads + flattened, chain
+
+
+# --------------------------------------------------------------------------
+# Inlining de CSS
+# --------------------------------------------------------------------------
+
+def _parse_compound(part):
+    match = COMPOUND_RE.fullmatch(part)
+    if not match or not part:
+        return None
+    rest = match.group('rest')
+    ids = re.findall(r"#([\w-]+)", rest)
+    return {
+        'tag': (match.group('tag') or '').lower() or None,
+        'id': ids[0] if ids else None,
+        'classes': set(re.findall(r"\.([\w-]+)", rest)),
+    }
+
+
+def _specificity(compounds):
+    return (
+        sum(1 for c in compounds if c['id']),
+        sum(len(c['classes']) for c in compounds),
+        sum(1 for c in compounds if c['tag']),
+    )
+
+
+def parse_css(css):
+    """
+    Separa o CSS em regras inlináveis (seletores simples e descendentes) e um
+    resíduo (@media, pseudo-classes etc.) que permanece num bloco <style>.
+    """
+    css = re.sub(r"/\*.*?\*/", '', css, flags=re.S)
+    rules, residual, cursor, order = [], [], 0, 0
+    while True:
+        start = css.find('{', cursor)
+        if start == -1:
+            break
+        depth, end = 1, start + 1
+        while end < len(css) and depth:
+            depth += {'{': 1, '}': -1}.get(css[end], 0)
+            end += 1
+        prelude, body = css[cursor:start].strip(), css[start + 1:end - 1].strip()
+        cursor = end
+
+        if prelude.startswith('@'):
+            residual.append(f"{prelude}{{{body}}}")
+            continue
+        declarations = [d.strip() for d in body.split(';') if d.strip()]
+        for selector in prelude.split(','):
+            selector = selector.strip()
+            compounds = [_parse_compound(part) for part in selector.split()]
+            if compounds and all(compounds):
+                rules.append((_specificity(compounds), order, compounds, declarations))
+                order += 1
+            else:
+                residual.append(f"{selector}{{{body}}}")
+    rules.sort(key=lambda rule: (rule[0], rule[1]))
+    return rules, ''.join(residual)
+
+
+def _compound_matches(compound, element):
+    tag, element_id, classes = element
+    return (
+        (compound['tag'] is None or compound['tag'] == tag)
+        and (compound['id'] is None or compound['id'] == element_id)
+        and compound['classes'] <= classes
+    )
+
+
+def _selector_matches(compounds, stack):
+    if not _compound_matches(compounds[-1], stack[-1]):
+        return False
+    ancestors = iter(reversed(stack[:-1]))
+    return all(any(_compound_matches(c, a) for a in ancestors) for c in reversed(compounds[:-1]))
+
+
+def _quote_attr(value):
+    if '{{' in value or '{%' in value:
+        # Não escapa sintaxe de template dentro de atributos
+        return f"'{value}'" if '"' in value else f'"{value}"'
+    return f'"{html.escape(value, quote=True)}"'
+
+
+class _CSSInliner(HTMLParser):
+    def __init__(self, rules):
+        super().__init__(convert_charrefs=False)
+        self.rules = rules
+        self.stack = []
+        self.output = []
+
+    def _start(self, tag, attrs, self_closing):
+        attributes = dict(attrs)
+        element = (tag, attributes.get('id'), set((attributes.get('class') or '').split()))
+        stack = self.stack + [element]
+        declarations = [
+            declaration
+            for _, _, compounds, rule_declarations in self.rules
+            if _selector_matches(compounds, stack)
+            for declaration in rule_declarations
+        ]
+        if not declarations:
+            self.output.append(self.get_starttag_text())
+        else:
+            if attributes.get('style'):
+                declarations.append(attributes['style'].strip().rstrip(';'))
+            attributes['style'] = '; '.join(declarations)
+            rendered = ''.join(
+                f" {key}" if value is None else f" {key}={_quote_attr(value)}"
+                for key, value in attributes.items()
+            )
+            self.output.append(f"<{tag}{rendered}{' /' if self_closing else ''}>")
+        if not self_closing and tag not in VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                del self.stack[index:]
+                break
+        self.output.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.output.append(data)
+
+    def handle_entityref(self, name):
+        self.output.append(f"&{name};")
+
+    def handle_charref(self, name):
+        self.output.append(f"&#{name};")
+
+    def handle_decl(self, decl):
+        self.output.append(f"<!{decl}>")
+
+    def handle_comment(self, data):
+        if data.strip().startswith('[if'):  # comentários condicionais do Outlook
+            self.output.append(f"<!--{data}-->")
+
+
+def inline_css(source):
+    """Aplica as regras dos blocos <style> como atributos style inline."""
+    css = ''.join(STYLE_RE.findall(source))
+    if not css:
+        return source
+    rules, residual = parse_css(css)
+    source = STYLE_RE.sub('', source)
+
+    inliner = _CSSInliner(rules)
+    inliner.feed(source)
+    inliner.close()
+    result = ''.join(inliner.output)
+
+    if residual:
+        style = f"<style>{residual}</style>"
+        if re.search(r"</head>", result, re.I):
+            result = re.sub(r"</head>", lambda _: style + '</head>', result, count=1, flags=re.I)
+        else:
+            result = style + result
+    return result
+
+
+# --------------------------------------------------------------------------
+# Minificação e parte texto
+# --------------------------------------------------------------------------
+
+def _minify_segment(source):
+    source = re.sub(r"<!--(?!\[if).*?-->", '', source, flags=re.S)
+    source = re.sub(r"\s+", ' ', source)
+    # Espaço junto a tags de bloco não aparece na renderização; entre inline (<b> <i>) é mantido
+    return BLOCK_SPACE_RE.sub(r"\1", source)
+
+
+def minify_html(source):
+    """
+    Colapsa espaços em branco num único espaço e remove comentários (exceto
+    os condicionais do Outlook). Conteúdo de <pre> e <textarea> fica intacto.
+    """
+    parts = PREFORMATTED_RE.split(source)
+    # split com um grupo de captura: índices ímpares são os blocos pré-formatados
+    return ''.join(
+        part if index % 2 else _minify_segment(part)
+        for index, part in enumerate(parts)
+    ).strip()
+
+
+def html_to_text(source):
+    """Deriva um template texto puro a partir do fonte HTML (preservando a sintaxe do Django)."""
+    text = re.sub(r"<(head|style|script)[^>]*>.*?</\1>", '', source, flags=re.S | re.I)
+    text = re.sub(
+        r"<a\s[^>]*href=[\"']([^\"']+)[\"'][^>]*>(.*?)</a>",
+        lambda m: f"{m.group(2)} ({m.group(1)})",
+        text, flags=re.S | re.I
+    )
+    text = re.sub(rf"</?(?:{TEXT_BLOCK_TAGS})\b[^>]*>", '\n', text, flags=re.I)
+    text = re.sub(r"<[^>]+>", '', text)
+    text = html.unescape(text)
+    lines = [re.sub(r"[ \t]+", ' ', line).strip() for line in text.splitlines()]
+    text = re.sub(r"\n{3,}", '\n\n', '\n'.join(lines)).strip()
+    return "{% autoescape off %}" + text + "{% endautoescape %}"
+
+
+# --------------------------------------------------------------------------
+# Build e cache
+# --------------------------------------------------------------------------
+
+class BuiltTemplate:
+    """Par de templates compilados (HTML inlinado/minificado e texto) de uma versão."""
+
+    def __init__(self, html_source, text_source):
+        engine = engines['django']
+        self.html = engine.from_string(html_source)
+        self.text = engine.from_string(text_source)
+
+    def render(self, context):
+        return self.html.render(context), self.text.render(context)
+
+
+class EmailTemplateBuilder:
+    """
+    Pré-compila templates de e-mail uma vez por versão.
+
+    A versão é o hash dos caminhos + mtimes de toda a cadeia de herança. O
+    resultado fica em disco (EMAIL_TEMPLATE_BUILD_DIR), compartilhado entre
+    processos e reinícios, e em memória no worker; por envio resta apenas a
+    substituição de variáveis. Os arquivos levam um prefixo por template, e
+    gravar uma versão nova apaga as anteriores do mesmo template.
+    """
+
+    def __init__(self, build_dir=None):
+        self.build_dir = build_dir or settings.EMAIL_TEMPLATE_BUILD_DIR
+        self._lock = threading.Lock()
+        self._memory = {}
+
+    @staticmethod
+    def _version(chain):
+        stamp = f"{BUILD_FORMAT}|" + '|'.join(f"{path}:{os.stat(path).st_mtime_ns}" for path in chain)
+        return hashlib.sha256(stamp.encode()).hexdigest()
+
+    @staticmethod
+    def _prefix(template_name):
+        return hashlib.sha256(template_name.encode()).hexdigest()[:16]
+
+    def _read_disk(self, stem):
+        base = os.path.join(self.build_dir, stem)
+        try:
+            with open(base + '.html', encoding='utf-8') as f_html, open(base + '.txt', encoding='utf-8') as f_text:
+                return f_html.read(), f_text.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, stem, html_source, text_source):
+        os.makedirs(self.build_dir, exist_ok=True)
+        base = os.path.join(self.build_dir, stem)
+        for suffix, content in (('.html', html_source), ('.txt', text_source)):
+            tmp_path = f"{base}{suffix}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, base + suffix)
+
+    def _prune(self, prefix, stem):
+        """Apaga as versões anteriores do template; temporários de gravações em curso ficam."""
+        for entry in os.listdir(self.build_dir):
+            if entry.startswith(prefix + '-') and not entry.startswith(stem + '.') and not entry.endswith('.tmp'):
+                try:
+                    os.remove(os.path.join(self.build_dir, entry))
+                except FileNotFoundError:
+                    pass
+
+    def build(self, template_name):
+        flattened, chain = flatten_template(template_name)
+        version = self._version(chain)
+        prefix = self._prefix(template_name)
+        stem = f"{prefix}-{version}"
+        sources = self._read_disk(stem)
+        if sources is None:
+            inlined = inline_css(flattened)
+            sources = (minify_html(inlined), html_to_text(inlined))
+            self._write_disk(stem, *sources)
+            self._prune(prefix, stem)
+            logger.info(f"[EMAIL BUILD] Template {template_name} compilado (versão {version[:12]}).")
+        return chain, version, BuiltTemplate(*sources)
+
+    def get(self, template_name):
+        cached = self._memory.get(template_name)
+        if cached is not None:
+            chain, version, built = cached
+            try:
+                if self._version(chain) == version:
+                    return built
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            cached = self.build(template_name)
+            self._memory[template_name] = cached
+        return cached[2]
+
+
+template_builder = EmailTemplateBuilder()
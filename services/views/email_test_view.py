@@ -19,12 +19,14 @@ def testar_template_email_api_view(request):
         to = data["to"]
         template_html = data["template_html"]
         context = data.get("context", {})
+        priority = data.get("priority", "bulk")
 
         email_service = EmailService(
             subject=subject,
             to_email=to,
             template_name=template_html,
-            context=context
+            context=context,
+            priority=priority
         )
         email_service.send()
 
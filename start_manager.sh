@@ -8,7 +8,20 @@ LOG_FILE="$LOG_DIR/manager.log"
 DJANGO_PORT=7000
 STATIC_DIR="$APP_DIR/static"
 
-CELERY_WORKER="celery -A core worker --loglevel=info --logfile=$LOG_DIR/celery_worker.log --detach"
+# Servidor ASGI: as views de autenticação são assíncronas e usam o hashing_pool (ver core/asgi.py)
+DJANGO_WORKERS="${DJANGO_WORKERS:-1}"
+DJANGO_PATTERN="uvicorn core.asgi:application --host 0.0.0.0 --port $DJANGO_PORT"
+DJANGO_SERVER="$DJANGO_PATTERN --workers $DJANGO_WORKERS"
+
+CELERY_WORKER="celery -A core worker -n default@%h -Q celery --loglevel=info --logfile=$LOG_DIR/celery_worker.log --detach"
+
+# Workers dedicados por fila de e-mail (concorrência e prefetch ajustáveis via ambiente)
+EMAIL_TRANSACTIONAL_CONCURRENCY="${EMAIL_TRANSACTIONAL_CONCURRENCY:-4}"
+EMAIL_TRANSACTIONAL_PREFETCH="${EMAIL_TRANSACTIONAL_PREFETCH:-1}"
+EMAIL_BULK_CONCURRENCY="${EMAIL_BULK_CONCURRENCY:-2}"
+EMAIL_BULK_PREFETCH="${EMAIL_BULK_PREFETCH:-4}"
+CELERY_WORKER_TRANSACTIONAL="celery -A core worker -n transactional@%h -Q email_transactional --concurrency=$EMAIL_TRANSACTIONAL_CONCURRENCY --prefetch-multiplier=$EMAIL_TRANSACTIONAL_PREFETCH --loglevel=info --logfile=$LOG_DIR/celery_worker_transactional.log --detach"
+CELERY_WORKER_BULK="celery -A core worker -n bulk@%h -Q email_bulk --concurrency=$EMAIL_BULK_CONCURRENCY --prefetch-multiplier=$EMAIL_BULK_PREFETCH --loglevel=info --logfile=$LOG_DIR/celery_worker_bulk.log --detach"
 CELERY_BEAT="celery -A core beat --loglevel=info --logfile=$LOG_DIR/celery_beat.log --detach"
 
 export DJANGO_SETTINGS_MODULE=core.settings
@@ -127,6 +140,22 @@ stop_process() {
     echo -e "${GREEN}$name parado com sucesso.${NC}"
 }
 
+start_worker() {
+    local pattern="$1"
+    local name="$2"
+    local cmd="$3"
+
+    if pgrep -f "$pattern" > /dev/null; then
+        echo "$name já está rodando."
+    else
+        $cmd
+        sleep 2
+        pgrep -f "$pattern" > /dev/null && \
+            echo -e "${GREEN}$name iniciado.${NC}" || \
+            { echo -e "${RED}Erro ao iniciar $name.${NC}"; exit 1; }
+    fi
+}
+
 start() {
     echo "Iniciando serviços..."
     cd "$APP_DIR" || { echo -e "${RED}Erro ao acessar $APP_DIR${NC}"; exit 1; }
@@ -136,25 +165,19 @@ start() {
     check_port
     prepare_static
 
-    if pgrep -f "python3 manage.py runserver 0.0.0.0:$DJANGO_PORT" > /dev/null; then
+    if pgrep -f "$DJANGO_PATTERN" > /dev/null; then
         echo "Django já está rodando na porta $DJANGO_PORT."
     else
-        nohup python3 manage.py runserver 0.0.0.0:$DJANGO_PORT >> "$LOG_FILE" 2>&1 &
+        nohup $DJANGO_SERVER >> "$LOG_FILE" 2>&1 &
         sleep 2
-        pgrep -f "python3 manage.py runserver 0.0.0.0:$DJANGO_PORT" > /dev/null && \
+        pgrep -f "$DJANGO_PATTERN" > /dev/null && \
             echo -e "${GREEN}Django iniciado na porta $DJANGO_PORT.${NC}" || \
             { echo -e "${RED}Erro ao iniciar Django. Verifique $LOG_FILE.${NC}"; exit 1; }
     fi
 
-    if pgrep -f "celery -A core worker" > /dev/null; then
-        echo "Celery Worker já está rodando."
-    else
-        $CELERY_WORKER
-        sleep 2
-        pgrep -f "celery -A core worker" > /dev/null && \
-            echo -e "${GREEN}Celery Worker iniciado.${NC}" || \
-            { echo -e "${RED}Erro ao iniciar Celery Worker.${NC}"; exit 1; }
-    fi
+    start_worker "celery -A core worker -n default@" "Celery Worker" "$CELERY_WORKER"
+    start_worker "celery -A core worker -n transactional@" "Celery Worker (e-mail transacional)" "$CELERY_WORKER_TRANSACTIONAL"
+    start_worker "celery -A core worker -n bulk@" "Celery Worker (e-mail em lote)" "$CELERY_WORKER_BULK"
 
     if pgrep -f "celery -A core beat" > /dev/null; then
         echo "Celery Beat já está rodando."
@@ -169,7 +192,7 @@ start() {
 
 stop() {
     echo "Parando serviços..."
-    stop_process "python3 manage.py runserver 0.0.0.0:$DJANGO_PORT" "Django"
+    stop_process "$DJANGO_PATTERN" "Django"
     stop_process "celery -A core worker" "Celery Worker"
     stop_process "celery -A core beat" "Celery Beat"
 
@@ -187,8 +210,10 @@ restart() {
 
 status() {
     echo "Status dos serviços:"
-    pgrep -f "python3 manage.py runserver 0.0.0.0:$DJANGO_PORT" > /dev/null && echo -e "${GREEN}Django: Rodando${NC}" || echo -e "${RED}Django: Parado${NC}"
-    pgrep -f "celery -A core worker" > /dev/null && echo -e "${GREEN}Celery Worker: Rodando${NC}" || echo -e "${RED}Celery Worker: Parado${NC}"
+    pgrep -f "$DJANGO_PATTERN" > /dev/null && echo -e "${GREEN}Django: Rodando${NC}" || echo -e "${RED}Django: Parado${NC}"
+    pgrep -f "celery -A core worker -n default@" > /dev/null && echo -e "${GREEN}Celery Worker: Rodando${NC}" || echo -e "${RED}Celery Worker: Parado${NC}"
+    pgrep -f "celery -A core worker -n transactional@" > /dev/null && echo -e "${GREEN}Celery Worker (e-mail transacional): Rodando${NC}" || echo -e "${RED}Celery Worker (e-mail transacional): Parado${NC}"
+    pgrep -f "celery -A core worker -n bulk@" > /dev/null && echo -e "${GREEN}Celery Worker (e-mail em lote): Rodando${NC}" || echo -e "${RED}Celery Worker (e-mail em lote): Parado${NC}"
     pgrep -f "celery -A core beat" > /dev/null && echo -e "${GREEN}Celery Beat: Rodando${NC}" || echo -e "${RED}Celery Beat: Parado${NC}"
     docker ps | grep veloma_redis > /dev/null && echo -e "${GREEN}Redis (Docker): Rodando${NC}" || echo -e "${RED}Redis (Docker): Parado${NC}"
     docker ps | grep veloma_flower > /dev/null && echo -e "${GREEN}Flower (Docker): Rodando${NC}" || echo -e "${RED}Flower (Docker): Parado${NC}"